@@ -1,92 +1,895 @@
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import copy
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import shlex
+import shutil
+import signal
 import subprocess
 import logging
-from typing import Tuple
+import tempfile
+import threading
+import time
+from typing import Tuple, List, Optional, Union, Dict, Any, BinaryIO, Callable, Iterator
 
 # Configure basic logging
 logger = logging.getLogger(__name__)
 
 class CalibreCLIError(Exception):
-    """Custom exception for errors related to Calibre CLI operations."""
+    """
+    Custom exception for errors related to Calibre CLI operations.
+
+    `stdout`/`stderr` may be given as the raw bytes of a `binary=True` run. They are
+    kept as given and only decoded the first time they are read, so wrappers never
+    decode output unless they fail, and handlers that only report `message` or
+    `returncode` never decode it at all.
+    """
     def __init__(self, message, stdout=None, stderr=None, returncode=None):
         super().__init__(message)
+        self.message = message
         self.stdout = stdout
         self.stderr = stderr
         self.returncode = returncode
 
+    @property
+    def stdout(self):
+        if isinstance(self._stdout, bytes):
+            self._stdout = _decode_output(self._stdout)
+        return self._stdout
+
+    @stdout.setter
+    def stdout(self, value):
+        self._stdout = value
+
+    @property
+    def stderr(self):
+        if isinstance(self._stderr, bytes):
+            self._stderr = _decode_output(self._stderr)
+        return self._stderr
+
+    @stderr.setter
+    def stderr(self, value):
+        self._stderr = value
+
     def __str__(self):
         return f"{super().__str__()} (returncode: {self.returncode})\nStderr: {self.stderr}\nStdout: {self.stdout}"
 
 
-def run_calibre_command(command: list[str], timeout: int = 60) -> Tuple[str, str, int]:
+class _LazyJoin:
+    """
+    Renders a command list as a shell-quoted string, but only when a log record using it
+    is actually emitted. Pass it as a %-style logging argument, not inside an f-string.
+    """
+    __slots__ = ('command',)
+
+    def __init__(self, command: List[str]):
+        self.command = command
+
+    def __str__(self) -> str:
+        return shlex.join(self.command)
+
+
+@functools.lru_cache(maxsize=32)
+def _resolve_executable(executable_name: str) -> str:
+    """
+    Resolves a Calibre tool name to an absolute path via `shutil.which`, once per tool.
+
+    Caching means PATH is searched once per tool for the lifetime of the process rather
+    than on every spawn, and a missing tool is reported before anything is forked.
+
+    Raises:
+        FileNotFoundError: If the executable cannot be found on PATH.
+    """
+    resolved = shutil.which(executable_name)
+    if resolved is None:
+        logger.error(f"{executable_name} command not found. Ensure Calibre is installed and in your PATH.")
+        raise FileNotFoundError(f"{executable_name} command not found. Ensure Calibre is installed and in your PATH.")
+    return resolved
+
+
+# Calibre tools fork helpers of their own (conversion workers, WebEngine renderers) that
+# survive a kill aimed only at the direct child. Starting every command as the leader of
+# a new process group lets a timeout take the whole tree down at once.
+if os.name == 'posix':
+    _NEW_PROCESS_GROUP_KWARGS: Dict[str, Any] = {'start_new_session': True}
+else:
+    _NEW_PROCESS_GROUP_KWARGS = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+
+# Keyword arguments shared by every spawn. They are kept to what CPython's cheap spawn
+# paths accept (vfork in _posixsubprocess on 3.10+, posix_spawn where eligible): an
+# absolute executable from _resolve_executable, no shell, no preexec_fn and no cwd or
+# env overrides, so the child inherits ours without Python copying either. A server
+# process with a large RSS then skips duplicating its page tables on every call; older
+# interpreters still fork, which is why the Docker image runs 3.11.
+_SPAWN_KWARGS: Dict[str, Any] = dict(close_fds=True, **_NEW_PROCESS_GROUP_KWARGS)
+
+
+def _check_argv(command) -> None:
+    """
+    Rejects anything but a non-empty argv list/tuple.
+
+    Commands are always exec'd directly, never through /bin/sh, so a single string
+    (e.g. a URL or a pre-joined command line) would be taken as the executable's name.
+    """
+    if isinstance(command, (str, bytes)) or not isinstance(command, (list, tuple)):
+        raise TypeError(f"Command must be a list of arguments, not {type(command).__name__}.")
+    if not command:
+        raise ValueError("Command list cannot be empty.")
+
+# Seconds a command gets to exit after SIGTERM before its group is SIGKILLed.
+_KILL_GRACE_PERIOD = 2.0
+
+
+def _signal_group(process, sig) -> None:
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass # The whole group has already exited
+
+
+def _kill_tree(process: subprocess.Popen) -> None:
+    """
+    Terminates a command started with `_NEW_PROCESS_GROUP_KWARGS` along with everything it
+    spawned: SIGTERM to the group, a short grace period, then SIGKILL to whatever is left.
+    The direct child is always reaped before returning.
+    """
+    if os.name != 'posix':
+        process.kill()
+        process.wait()
+        return
+
+    _signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(timeout=_KILL_GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        pass
+    # Also catches helpers that ignored SIGTERM after the leader itself exited.
+    _signal_group(process, signal.SIGKILL)
+    process.wait()
+
+
+async def _kill_tree_async(process: asyncio.subprocess.Process) -> None:
+    """Async counterpart of `_kill_tree` for processes from `create_subprocess_exec`."""
+    if os.name != 'posix':
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        return
+
+    _signal_group(process, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout=_KILL_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        pass
+    _signal_group(process, signal.SIGKILL)
+    await process.wait()
+
+
+# Upper bound on combined stdout+stderr for the verbose tools whose output is only
+# logging (ebook-convert progress, ebook-polish, web2disk). Anything beyond this is
+# pathological and is treated as a failure rather than being read into memory.
+# Callers opt in with `max_output=`; commands whose stdout *is* the result (e.g. a
+# `calibredb list` of a large library) are never capped.
+MAX_COMMAND_OUTPUT_BYTES = 16 * 1024 * 1024
+# How often (seconds) a running command is checked against the output cap.
+_OUTPUT_POLL_INTERVAL = 0.5
+
+
+def _spooled_size(spool) -> int:
+    """Bytes the child has written so far to one of the temporary output files."""
+    return os.fstat(spool.fileno()).st_size
+
+
+def _read_spool(spool, binary: bool = False) -> Union[str, bytes]:
+    spool.seek(0)
+    data = spool.read()
+    return data if binary else _decode_output(data)
+
+
+def _decode_output(data: Union[str, bytes]) -> str:
+    """Text form of a command's output: UTF-8 (invalid bytes replaced), stripped."""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    return data.strip()
+
+
+def run_calibre_command(
+    command: list[str], timeout: int = 60, binary: bool = False, max_output: Optional[int] = None
+) -> Tuple[Any, Any, int]:
     """
     Runs a generic Calibre CLI command using subprocess.
 
+    stdout and stderr are written straight into temporary files instead of OS pipes,
+    so a chatty tool can never block on a full pipe buffer while we wait for it to exit.
+    Output is only read back once the command has finished. If `max_output` is given and
+    the combined output grows past it, the command is killed.
+
+    The command is exec'd directly from its argv list (no shell), with the executable
+    resolved to an absolute path and only the keyword arguments in `_SPAWN_KWARGS`.
+    Don't add `shell=True`, `preexec_fn`, `cwd` or `env` here: each one either puts
+    /bin/sh in front of every call or forces CPython off its vfork/posix_spawn path
+    back onto a full fork of this process.
+
     Args:
         command: A list of strings representing the command and its arguments
                  (e.g., ['ebook-convert', 'input.txt', 'output.epub']).
         timeout: The timeout in seconds for the command execution.
+        binary: If True, stdout and stderr are returned as the raw bytes the tool wrote,
+                for callers that parse them directly (e.g. JSON). By default they are
+                decoded as UTF-8 and stripped.
+        max_output: Optional cap in bytes on combined stdout+stderr (typically
+                    `MAX_COMMAND_OUTPUT_BYTES`). None means no cap.
 
     Returns:
         A tuple containing (stdout, stderr, returncode) of the executed command.
 
     Raises:
+        TypeError: If `command` is a string rather than an argument list.
+        ValueError: If `command` is empty.
         FileNotFoundError: If the first element of the command (the Calibre executable) is not found.
-        CalibreCLIError: If the command times out or returns a non-zero exit code,
+        CalibreCLIError: If the command times out, exceeds the output cap,
                          or if any other subprocess-related error occurs.
     """
-    if not command:
-        raise ValueError("Command list cannot be empty.")
+    _check_argv(command)
 
     executable_name = command[0]
-    logger.info(f"Running Calibre command: {' '.join(command)}")
+    logger.info("Running Calibre command: %s", _LazyJoin(command))
+    resolved_command = [_resolve_executable(executable_name), *command[1:]]
 
     try:
-        process = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=False,  # We will check the return code manually
-            timeout=timeout
-        )
+        # tempfile.TemporaryFile rather than SpooledTemporaryFile: Popen needs a real
+        # file descriptor, and asking a spooled file for fileno() rolls it over to disk anyway.
+        with tempfile.TemporaryFile() as stdout_spool, tempfile.TemporaryFile() as stderr_spool:
+            # bufsize=-1 keeps Popen's streams fully buffered. Nothing here consumes output
+            # live (it is only read after the command exits), so unbuffered I/O would just
+            # mean more read/write syscalls for the same bytes.
+            process = subprocess.Popen(
+                resolved_command, stdout=stdout_spool, stderr=stderr_spool, bufsize=-1,
+                **_SPAWN_KWARGS
+            )
+
+            deadline = time.monotonic() + timeout
+            # Without a cap there is nothing to poll for: wait out the whole timeout.
+            poll_interval = _OUTPUT_POLL_INTERVAL if max_output is not None else timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    process.wait(timeout=max(0, min(poll_interval, remaining)))
+                    break
+                except subprocess.TimeoutExpired:
+                    if time.monotonic() >= deadline:
+                        _kill_tree(process)
+                        raise subprocess.TimeoutExpired(command, timeout)
+                    output_size = _spooled_size(stdout_spool) + _spooled_size(stderr_spool)
+                    if output_size > max_output:
+                        _kill_tree(process)
+                        logger.error(
+                            "%s output exceeded cap of %d bytes. Command: %s",
+                            executable_name, max_output, _LazyJoin(command)
+                        )
+                        raise CalibreCLIError(
+                            message=f"{executable_name} output exceeded cap of {max_output} bytes.",
+                            stderr=f"Killed after writing {output_size} bytes of output.",
+                            returncode=-3 # Using a custom return code for runaway output
+                        )
+
+            stdout = _read_spool(stdout_spool, binary)
+            stderr = _read_spool(stderr_spool, binary)
 
         if process.returncode != 0:
             # Log the error but let the caller decide if it's a CalibreCLIError based on context
             logger.warning(
-                f"{executable_name} command failed with exit code {process.returncode}."
-                f"\nCommand: {' '.join(command)}"
-                f"\nStderr: {process.stderr.strip()}"
-                f"\nStdout: {process.stdout.strip()}"
+                "%s command failed with exit code %s.\nCommand: %s\nStderr: %s\nStdout: %s",
+                executable_name, process.returncode, _LazyJoin(command), stderr, stdout
             )
-            # The decision to raise CalibreCLIError here or let the specific wrapper function
-            # interpret the non-zero exit code depends on how granular we want the error handling.
-            # For now, any non-zero return code from this generic helper will be an error.
-            # Specific wrappers can catch this and provide more context or handle expected non-zero exits.
-            # raise CalibreCLIError(
-            #     message=f"{executable_name} command failed.",
-            #     stdout=process.stdout.strip(),
-            #     stderr=process.stderr.strip(),
-            #     returncode=process.returncode
-            # )
-
-        return process.stdout.strip(), process.stderr.strip(), process.returncode
+            # Specific wrappers check the return code and raise CalibreCLIError with more
+            # context, or handle expected non-zero exits themselves.
+
+        return stdout, stderr, process.returncode
 
     except FileNotFoundError:
         logger.error(f"{executable_name} command not found. Ensure Calibre is installed and in your PATH.")
         raise FileNotFoundError(f"{executable_name} command not found. Ensure Calibre is installed and in your PATH.")
     except subprocess.TimeoutExpired:
-        logger.error(f"{executable_name} command timed out after {timeout} seconds. Command: {' '.join(command)}")
+        logger.error("%s command timed out after %s seconds. Command: %s", executable_name, timeout, _LazyJoin(command))
         raise CalibreCLIError(
             message=f"{executable_name} command timed out.",
             stderr=f"Timeout after {timeout} seconds.",
             returncode=-1 # Using a custom return code for timeout
         )
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while running {executable_name}: {e}. Command: {' '.join(command)}", exc_info=True)
+    except OSError as e:
+        # Spawn or temp-file failures (permissions, fd/process limits, full disk). Expected
+        # enough that the message is sufficient; no traceback is captured for them.
+        # Anything that is not an OSError is a bug and propagates untouched, to be logged
+        # once by whoever handles it.
+        logger.error(
+            "An OS error occurred while running %s: %s. Command: %s",
+            executable_name, e, _LazyJoin(command)
+        )
         raise CalibreCLIError(
             message=f"An unexpected error occurred while running {executable_name}: {str(e)}",
             returncode=-2 # Using a custom return code for other errors
         )
 
+
+def iter_calibre_command_lines(
+    command: List[str],
+    timeout: int = 60,
+    failure_message: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Runs a Calibre CLI command and yields its stdout one line at a time, as it is produced.
+
+    For commands whose output is parsed line by line: only the current line is held in
+    memory, never the whole output. stderr still goes to a temporary file and is only
+    read if the command fails. If the consumer stops early, the command is killed.
+
+    Args:
+        command: A list of strings representing the command and its arguments.
+        timeout: The timeout in seconds for the whole command, including the time the
+                 consumer spends between lines.
+        failure_message: Message of the CalibreCLIError raised for a non-zero exit status.
+                         Defaults to "<tool> command failed.".
+
+    Yields:
+        Lines of stdout (decoded as UTF-8, invalid bytes replaced), without line endings.
+
+    Raises:
+        FileNotFoundError: If the Calibre executable is not found.
+        CalibreCLIError: If the command times out, cannot be started, or exits non-zero.
+            Raised once the output has been consumed.
+    """
+    for line in _iter_command_output(command, timeout, failure_message, binary=False):
+        yield line.rstrip('\n')
+
+
+# Read size for `iter_calibre_command_chunks`.
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_calibre_command_chunks(
+    command: List[str],
+    timeout: int = 60,
+    failure_message: Optional[str] = None,
+) -> Iterator[bytes]:
+    """
+    Runs a Calibre CLI command and yields its raw stdout in chunks, as it is produced.
+
+    The binary counterpart of `iter_calibre_command_lines`, for output that is fed to an
+    incremental parser (e.g. a streaming JSON parser) instead of being collected whole.
+    Arguments, timeout and error behaviour are the same.
+
+    Yields:
+        Non-empty byte strings of at most 64 KiB each.
+    """
+    return _iter_command_output(command, timeout, failure_message, binary=True)
+
+
+def _iter_command_output(
+    command: List[str],
+    timeout: int,
+    failure_message: Optional[str],
+    binary: bool,
+) -> Iterator[Union[str, bytes]]:
+    _check_argv(command)
+
+    executable_name = command[0]
+    logger.info("Running Calibre command: %s", _LazyJoin(command))
+    resolved_command = [_resolve_executable(executable_name), *command[1:]]
+
+    with tempfile.TemporaryFile() as stderr_spool:
+        try:
+            text_kwargs = {} if binary else {'encoding': 'utf-8', 'errors': 'replace'}
+            process = subprocess.Popen(
+                resolved_command, stdout=subprocess.PIPE, stderr=stderr_spool,
+                **text_kwargs, **_SPAWN_KWARGS
+            )
+        except OSError as e:
+            logger.error(
+                "An OS error occurred while running %s: %s. Command: %s",
+                executable_name, e, _LazyJoin(command)
+            )
+            raise CalibreCLIError(
+                message=f"An unexpected error occurred while running {executable_name}: {str(e)}",
+                returncode=-2
+            )
+
+        # Reading blocks on the pipe, so the deadline is enforced from a timer thread.
+        timed_out = threading.Event()
+
+        def on_timeout() -> None:
+            timed_out.set()
+            _kill_tree(process)
+
+        timer = threading.Timer(timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            with process.stdout:
+                if binary:
+                    yield from iter(functools.partial(process.stdout.read1, _STREAM_CHUNK_SIZE), b'')
+                else:
+                    yield from process.stdout
+            process.wait()
+        finally:
+            timer.cancel()
+            if process.poll() is None: # The consumer stopped early (or raised)
+                _kill_tree(process)
+
+        if timed_out.is_set():
+            logger.error("%s command timed out after %s seconds. Command: %s", executable_name, timeout, _LazyJoin(command))
+            raise CalibreCLIError(
+                message=f"{executable_name} command timed out.",
+                stderr=f"Timeout after {timeout} seconds.",
+                returncode=-1
+            )
+        if process.returncode != 0:
+            stderr = _read_spool(stderr_spool)
+            logger.warning(
+                "%s command failed with exit code %s.\nCommand: %s\nStderr: %s",
+                executable_name, process.returncode, _LazyJoin(command), stderr
+            )
+            raise CalibreCLIError(
+                message=failure_message or f"{executable_name} command failed.",
+                stderr=stderr,
+                returncode=process.returncode
+            )
+
+
+# Shared pool for fanning out blocking Calibre commands. Threads are sufficient: each
+# worker spends its time waiting on a child process, which releases the GIL. The pool is
+# created once for the process and shut down at interpreter exit, not per request.
+# Async code (here and in crud) also hands its blocking work to this pool rather than
+# the event loop's default executor, so Calibre work has one bounded set of threads.
+_EXEC = concurrent.futures.ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1,
+    thread_name_prefix="calibre-cli",
+)
+atexit.register(_EXEC.shutdown)
+
+
+def run_calibre_commands_batch(
+    commands: List[List[str]],
+    timeout: int = 60,
+    return_exceptions: bool = False,
+    binary: bool = False,
+) -> List[Union[Tuple[Any, Any, int], BaseException]]:
+    """
+    Runs several Calibre commands concurrently on the shared worker pool.
+
+    Args:
+        commands: A list of commands, each in the form accepted by `run_calibre_command`.
+        timeout: Per-command timeout in seconds.
+        return_exceptions: If True, a command that raises has its exception placed in the
+                           result list instead of being raised (like `asyncio.gather`).
+        binary: Passed to `run_calibre_command` for every command.
+
+    Returns:
+        A list of (stdout, stderr, returncode) tuples in the same order as `commands`.
+
+    Raises:
+        FileNotFoundError, CalibreCLIError, ValueError: The first error raised by any command,
+            unless `return_exceptions` is True. All commands are allowed to finish first.
+    """
+    futures = {
+        _EXEC.submit(run_calibre_command, command, timeout, binary): index
+        for index, command in enumerate(commands)
+    }
+    results: List[Any] = [None] * len(commands)
+    first_error: Optional[BaseException] = None
+
+    for future in concurrent.futures.as_completed(futures):
+        index = futures[future]
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            results[index] = e
+            if first_error is None:
+                first_error = e
+
+    if first_error is not None and not return_exceptions:
+        raise first_error
+    return results
+
+
+async def run_calibre_command_async(command: list[str], timeout: int = 60, binary: bool = False) -> Tuple[Any, Any, int]:
+    """
+    Async counterpart of `run_calibre_command` built on `asyncio.create_subprocess_exec`.
+
+    The event loop keeps serving other requests while the Calibre tool runs, so
+    several invocations (conversions, metadata reads/fetches, ...) can overlap on
+    a single thread instead of each one blocking it for the full process lifetime.
+    If `enable_worker_pool` has been called, commands the pool handles are sent to
+    an already-running Calibre worker instead of a new process.
+
+    Args:
+        command: A list of strings representing the command and its arguments.
+        timeout: The timeout in seconds for the command execution.
+        binary: If True, stdout and stderr are returned as the raw bytes the tool wrote,
+                for callers that parse them directly (e.g. JSON). By default they are
+                decoded as UTF-8 and stripped.
+
+    Returns:
+        A tuple containing (stdout, stderr, returncode) of the executed command.
+
+    Raises:
+        TypeError: If `command` is a string rather than an argument list.
+        ValueError: If `command` is empty.
+        FileNotFoundError: If the first element of the command (the Calibre executable) is not found.
+        CalibreCLIError: If the command times out or any other subprocess-related error occurs.
+    """
+    _check_argv(command)
+
+    executable_name = command[0]
+    pool = _worker_pool
+    if pool is not None and pool.handles(command):
+        logger.info("Running Calibre command (worker): %s", _LazyJoin(command))
+        stdout, stderr, returncode = await pool.call(command, timeout=timeout)
+        if binary:
+            stdout, stderr = stdout.encode('utf-8'), stderr.encode('utf-8')
+        if returncode != 0:
+            logger.warning(
+                "%s command failed with exit code %s.\nCommand: %s\nStderr: %s\nStdout: %s",
+                executable_name, returncode, _LazyJoin(command), stderr, stdout
+            )
+        return stdout, stderr, returncode
+
+    logger.info("Running Calibre command (async): %s", _LazyJoin(command))
+    resolved_executable = _resolve_executable(executable_name)
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            resolved_executable, *command[1:],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **_SPAWN_KWARGS
+        )
+    except FileNotFoundError:
+        logger.error(f"{executable_name} command not found. Ensure Calibre is installed and in your PATH.")
+        raise FileNotFoundError(f"{executable_name} command not found. Ensure Calibre is installed and in your PATH.")
+    except OSError as e: # Same policy as run_calibre_command
+        logger.error(
+            "An OS error occurred while starting %s: %s. Command: %s",
+            executable_name, e, _LazyJoin(command)
+        )
+        raise CalibreCLIError(
+            message=f"An unexpected error occurred while running {executable_name}: {str(e)}",
+            returncode=-2
+        )
+
+    try:
+        stdout_bytes, stderr_bytes = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        # The child is still running; make sure neither it nor its helpers outlive the request.
+        await _kill_tree_async(process)
+        logger.error("%s command timed out after %s seconds. Command: %s", executable_name, timeout, _LazyJoin(command))
+        raise CalibreCLIError(
+            message=f"{executable_name} command timed out.",
+            stderr=f"Timeout after {timeout} seconds.",
+            returncode=-1
+        )
+
+    if binary:
+        stdout, stderr = stdout_bytes, stderr_bytes
+    else:
+        stdout, stderr = _decode_output(stdout_bytes), _decode_output(stderr_bytes)
+
+    if process.returncode != 0:
+        logger.warning(
+            "%s command failed with exit code %s.\nCommand: %s\nStderr: %s\nStdout: %s",
+            executable_name, process.returncode, _LazyJoin(command), stderr, stdout
+        )
+
+    return stdout, stderr, process.returncode
+
+
+class _WorkerGone(ConnectionError):
+    """A pool worker could not be sent a command because it has already exited."""
+
+
+# Script served by each `CalibreWorkerPool` interpreter; it ships next to this module.
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibre_worker.py')
+
+
+class CalibreWorkerPool:
+    """
+    A pool of long-lived `calibre-debug -e calibre_worker.py` interpreters.
+
+    Every Calibre CLI tool is a fresh Python interpreter that imports the calibre
+    package before doing any work, and for quick operations such as reading
+    metadata that startup dominates. A worker pays it once and then serves
+    commands over its stdin/stdout, one JSON line each way, by calling the tool's
+    entry point in-process. For calibredb it also keeps recently used libraries
+    open between commands (see `calibre_worker.OpenLibraries`).
+
+    `call()` has the same contract as `run_calibre_command_async`: it takes the argv
+    the real executable would get and returns (stdout, stderr, returncode). Once
+    installed with `enable_worker_pool`, `run_calibre_command_async` routes every
+    command in `TOOLS` here transparently.
+
+    Workers start lazily (or ahead of demand, with `warm`), at most `size` run at once, and a worker is replaced
+    after `max_calls_per_worker` commands to bound any state leaked by Calibre.
+    A worker left idle for `idle_timeout` seconds is stopped, giving back its memory
+    (and the libraries it holds open) until traffic picks up again.
+    A worker that times out or misbehaves is killed rather than reused. One found
+    dead before it received a command (its stdin pipe is broken) is replaced and the
+    command resent transparently.
+    """
+
+    # Tools the worker script can serve; see `calibre_worker.ENTRY_POINTS`.
+    TOOLS = frozenset({'calibredb', 'ebook-convert', 'ebook-meta', 'ebook-polish', 'fetch-ebook-metadata', 'calibre-debug'})
+
+    # Run by `warm` in each worker: most requests are calibredb commands, and importing
+    # its entry point pulls in the bulk of the calibre package.
+    WARM_UP_COMMAND = ('calibre-debug', '-c', 'import calibre.db.cli.main')
+
+    def __init__(self, size: int = 2, max_calls_per_worker: int = 500, idle_timeout: Optional[float] = 300.0):
+        if size < 1:
+            raise ValueError("Worker pool size must be at least 1.")
+        self.size = size
+        self.max_calls_per_worker = max_calls_per_worker
+        self.idle_timeout = idle_timeout
+        # Idle workers; a None slot is capacity for a worker that has not been started yet.
+        # Created on first use so that it binds to the running event loop.
+        self._idle: Optional[asyncio.Queue] = None
+        self._calls: Dict[Any, int] = {}
+        # worker -> loop time it went idle
+        self._idle_since: Dict[Any, float] = {}
+        self._retiring: set = set() # Retire tasks started from `_stop_idle`, kept alive until done
+        self._closed = False
+
+    def handles(self, command: List[str]) -> bool:
+        """Whether `command` can be served by a worker instead of a new process."""
+        if not command or command[0] not in self.TOOLS:
+            return False
+        if command[0] == 'calibre-debug':
+            # Only `calibre-debug -c <code>` runs in-process.
+            return len(command) == 3 and command[1] == '-c'
+        if '--to-stdout' in command:
+            # Replies carry stdout as UTF-8 text, which would mangle an exported book file.
+            return False
+        return True
+
+    async def call(self, command: List[str], timeout: int = 60) -> Tuple[str, str, int]:
+        """
+        Runs `command` on an idle worker, waiting for one if all are busy.
+
+        Raises:
+            FileNotFoundError: If 'calibre-debug' is not found.
+            CalibreCLIError: If the command times out (returncode -1) or the worker
+                             fails to answer (returncode -2).
+        """
+        if self._closed:
+            raise CalibreCLIError(message="Calibre worker pool is closed.", returncode=-2)
+        if not self.handles(command):
+            raise ValueError(f"Command cannot be run by a Calibre worker: {command[:1]}")
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(None)
+
+        executable_name = command[0]
+        process = await self._idle.get()
+        self._idle_since.pop(process, None)
+        healthy = False
+        try:
+            try:
+                for attempt in range(2):
+                    if process is None or process.returncode is not None:
+                        process = None
+                        process = await self._spawn()
+                    try:
+                        result = await asyncio.wait_for(self._exchange(process, command), timeout=timeout)
+                        break
+                    except _WorkerGone:
+                        if attempt:
+                            raise
+                        # It died while idle and never saw the command, so resending is safe.
+                        logger.warning("Calibre worker (pid %s) is gone; starting a new one.", process.pid)
+                        await self._retire(process, graceful=False)
+                        process = None
+            except asyncio.TimeoutError:
+                logger.error("%s command timed out after %s seconds in a worker. Command: %s",
+                             executable_name, timeout, _LazyJoin(command))
+                raise CalibreCLIError(
+                    message=f"{executable_name} command timed out.",
+                    stderr=f"Timeout after {timeout} seconds.",
+                    returncode=-1
+                )
+            except (ConnectionError, ValueError, KeyError) as e:
+                logger.error("Calibre worker failed while running %s: %s. Command: %s",
+                             executable_name, e, _LazyJoin(command))
+                raise CalibreCLIError(
+                    message=f"Calibre worker failed while running {executable_name}: {str(e)}",
+                    returncode=-2
+                )
+            healthy = True
+            self._calls[process] += 1
+            return result
+        finally:
+            if process is not None and (
+                not healthy or self._closed or self._calls[process] >= self.max_calls_per_worker
+            ):
+                await self._retire(process, graceful=healthy)
+                process = None
+            self._idle.put_nowait(process)
+            if process is not None and self.idle_timeout is not None:
+                loop = asyncio.get_running_loop()
+                self._idle_since[process] = loop.time()
+                loop.call_later(self.idle_timeout, self._stop_idle)
+
+    async def warm(self, count: Optional[int] = None, timeout: int = 120) -> int:
+        """
+        Starts up to `count` workers (default: `size`) ahead of demand and has each import
+        calibredb, so the first requests do not pay for Calibre's startup.
+
+        Returns:
+            How many workers are ready. Failures (e.g. Calibre not installed) are logged,
+            not raised: the pool still starts workers on demand.
+        """
+        count = min(self.size, count or self.size)
+        results = await asyncio.gather(
+            *(self.call(list(self.WARM_UP_COMMAND), timeout=timeout) for _ in range(count)),
+            return_exceptions=True,
+        )
+        ready = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning("Could not warm up a Calibre worker: %s", result)
+            elif result[2] != 0:
+                logger.warning("Calibre worker warm-up failed: %s", result[1])
+            else:
+                ready += 1
+        return ready
+
+    async def close(self) -> None:
+        """Stops idle workers; busy ones are stopped as soon as they finish."""
+        self._closed = True
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            process = self._idle.get_nowait()
+            if process is not None:
+                await self._retire(process)
+
+    def _stop_idle(self) -> None:
+        """Retires workers idle for `idle_timeout`, leaving their slots free for new ones."""
+        if self._closed:
+            return
+        deadline = asyncio.get_running_loop().time() - self.idle_timeout
+        slots = [self._idle.get_nowait() for _ in range(self._idle.qsize())]
+        for process in slots:
+            idle_since = self._idle_since.get(process)
+            if process is not None and idle_since is not None and idle_since <= deadline:
+                del self._idle_since[process]
+                logger.info("Stopping Calibre worker (pid %s) after %s idle seconds.", process.pid, self.idle_timeout)
+                task = asyncio.ensure_future(self._retire(process))
+                self._retiring.add(task)
+                task.add_done_callback(self._retiring.discard)
+                process = None
+            self._idle.put_nowait(process)
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        process = await asyncio.create_subprocess_exec(
+            _resolve_executable('calibre-debug'), '-e', _WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=_WORKER_READ_CHUNK,
+            **_SPAWN_KWARGS
+        )
+        self._calls[process] = 0
+        logger.info("Started Calibre worker (pid %s).", process.pid)
+        return process
+
+    async def _exchange(self, process: asyncio.subprocess.Process, command: List[str]) -> Tuple[str, str, int]:
+        try:
+            process.stdin.write(_json_dumps_line({'argv': list(command)}))
+            await process.stdin.drain()
+        except ConnectionError as e:
+            raise _WorkerGone(f"worker stdin is closed: {e}") from e
+        line = await _read_reply_line(process.stdout)
+        if not line:
+            raise ConnectionError(f"worker exited with code {process.returncode}")
+        reply = _json_loads(line)
+        return reply['stdout'].strip(), reply['stderr'].strip(), reply['returncode']
+
+    async def _retire(self, process: asyncio.subprocess.Process, graceful: bool = True) -> None:
+        self._calls.pop(process, None)
+        self._idle_since.pop(process, None)
+        if graceful and process.returncode is None:
+            # EOF on stdin ends the worker's read loop.
+            process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=_KILL_GRACE_PERIOD)
+                return
+            except asyncio.TimeoutError:
+                pass
+        if process.returncode is None:
+            await _kill_tree_async(process)
+
+
+# StreamReader buffer limit for worker replies. It only bounds how much is buffered at a
+# time: `_read_reply_line` reads past it, since a reply carries the command's whole
+# output (a `calibredb list` of a big library included).
+_WORKER_READ_CHUNK = 1024 * 1024
+
+
+async def _read_reply_line(stream: asyncio.StreamReader) -> bytes:
+    """`stream.readline()` without the StreamReader's line-length limit."""
+    chunks = []
+    while True:
+        try:
+            chunks.append(await stream.readuntil(b'\n'))
+        except asyncio.LimitOverrunError as e:
+            chunks.append(await stream.readexactly(e.consumed))
+            continue
+        except asyncio.IncompleteReadError as e:
+            chunks.append(e.partial)
+        return b''.join(chunks)
+
+
+# Installed by `enable_worker_pool`; consulted by `run_calibre_command_async`.
+_worker_pool: Optional[CalibreWorkerPool] = None
+
+
+def enable_worker_pool(
+    size: int = 2, max_calls_per_worker: int = 500, idle_timeout: Optional[float] = 300.0
+) -> CalibreWorkerPool:
+    """
+    Routes async conversion, polish, metadata and `calibredb` library commands through a
+    `CalibreWorkerPool` of `size` workers, each stopped after `idle_timeout` idle seconds
+    (None keeps them running).
+
+    Call from within the event loop that will use it (e.g. an application startup hook).
+    """
+    global _worker_pool
+    _worker_pool = CalibreWorkerPool(
+        size=size, max_calls_per_worker=max_calls_per_worker, idle_timeout=idle_timeout
+    )
+    return _worker_pool
+
+
+async def disable_worker_pool() -> None:
+    """Stops the installed worker pool, if any; commands go back to one process each."""
+    global _worker_pool
+    pool, _worker_pool = _worker_pool, None
+    if pool is not None:
+        await pool.close()
+
+
+def _run_smoke_tests(tests: List[Callable[[Callable[..., None]], None]]) -> None:
+    """
+    Runs independent `__main__` smoke tests concurrently and prints each report as it finishes.
+
+    Almost all of their time is spent waiting on Calibre subprocesses, so threads are
+    enough for the block to take as long as its slowest test rather than the sum of all
+    of them. Each test is called with a print-compatible `log` writing to its own buffer,
+    so concurrent reports are not interleaved line by line.
+    """
+    def run(test) -> str:
+        report = io.StringIO()
+        log = functools.partial(print, file=report)
+        try:
+            test(log)
+        except Exception as e:
+            log(f"Unexpected error in {test.__name__}: {e}")
+        return report.getvalue()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        futures = [executor.submit(run, test) for test in tests]
+        for future in concurrent.futures.as_completed(futures):
+            print(future.result(), end="")
+
+
 if __name__ == '__main__':
     # Example usage for testing run_calibre_command
     # This assumes 'calibre' or 'ebook-convert' (or other calibre tools) are in PATH
@@ -171,13 +974,146 @@ if __name__ == '__main__':
     print("Basic tests for run_calibre_command complete.")
 
 
+# --- JSON output parsing ---
+
+# orjson is optional; it decodes and encodes considerably faster than the standard library.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+
+def _json_dumps_line(obj: Any) -> bytes:
+    """Encodes `obj` as one line of UTF-8 JSON, newline included."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj).encode('utf-8') + b'\n'
+
+
+def _parse_json_output(stdout: Union[str, bytes], what: str, stderr: str = None, returncode: int = None) -> Any:
+    """
+    Parses JSON printed by a Calibre tool. Only the last non-empty line is decoded, so any
+    log lines the tool prints before its result are ignored.
+
+    `stdout` may be the raw bytes of a `binary=True` run; orjson parses those directly,
+    without first building a decoded copy of the whole output.
+
+    Raises:
+        CalibreCLIError: If the output is not valid JSON.
+    """
+    newline = b"\n" if isinstance(stdout, bytes) else "\n"
+    last_line = stdout.rstrip().rpartition(newline)[2]
+    try:
+        return _json_loads(last_line)
+    except ValueError as e: # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
+        raise CalibreCLIError(
+            message=f"Failed to parse JSON output for {what}: {e}",
+            stdout=_decode_output(stdout),
+            stderr=stderr,
+            returncode=returncode
+        )
+
+
+# --- OPF parsing ---
+
+# lxml is optional. It parses OPF noticeably faster than the standard library and
+# exposes the same iterparse API, so fall back to ElementTree when it is missing.
+try:
+    from lxml import etree as ET
+    _HAVE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _HAVE_LXML = False
+
+OPF_NAMESPACE = 'http://www.idpf.org/2007/opf'
+_OPF_METADATA_TAG = f'{{{OPF_NAMESPACE}}}metadata'
+
+
+def _iter_opf_metadata(opf_source: Union[bytes, str, BinaryIO]):
+    """
+    Streams an OPF document and yields its <metadata> element(s) as soon as each is parsed,
+    without building a DOM for the rest of the package (manifest, spine, guide).
+
+    `opf_source` is the raw document, a path to an OPF file or a binary file object.
+    Files are read incrementally by the parser, which detects the encoding from the
+    XML declaration, so they are never loaded or decoded as a whole first.
+    """
+    source = io.BytesIO(opf_source) if isinstance(opf_source, bytes) else opf_source
+    if _HAVE_LXML:
+        events = ET.iterparse(source, events=('end',), tag=_OPF_METADATA_TAG, remove_comments=True)
+    else:
+        events = (
+            (event, elem) for event, elem in ET.iterparse(source, events=('end',))
+            if elem.tag == _OPF_METADATA_TAG
+        )
+    for _event, elem in events:
+        yield elem
+
+
+def _opf_localname(element) -> str:
+    if _HAVE_LXML:
+        return ET.QName(element).localname
+    return element.tag.rpartition('}')[2] # '{namespace}title' -> 'title'
+
+
+def _parse_opf_to_dict(opf_source: Union[bytes, str, BinaryIO]) -> Dict[str, Any]:
+    """
+    Converts the <metadata> section of an OPF document into a flat dict keyed by
+    element name without namespace (e.g. 'title', 'creator', 'identifier').
+    Repeated elements (several creators, identifiers, ...) become lists.
+    Accepts the same sources as `_iter_opf_metadata`.
+
+    Raises:
+        ET.ParseError: If the OPF is not well-formed XML.
+    """
+    metadata_dict: Dict[str, Any] = {}
+    for metadata_node in _iter_opf_metadata(opf_source):
+        for child in metadata_node:
+            tag_name = _opf_localname(child)
+            text = child.text.strip() if child.text else child.text # Normalize once, here
+            if tag_name in metadata_dict:
+                existing = metadata_dict[tag_name]
+                if isinstance(existing, list):
+                    existing.append(text)
+                else:
+                    metadata_dict[tag_name] = [existing, text]
+            else:
+                metadata_dict[tag_name] = text
+        # Attributes (opf:role on creators, opf:scheme on identifiers, ...) are not kept.
+        metadata_node.clear() # Done with this subtree; release it
+    return metadata_dict
+
+
+# Command prefixes shared by every call of a wrapper. Each wrapper builds its argv in a
+# single list display from one of these instead of growing a list with extend/append.
+_EBOOK_CONVERT_CMD = ('ebook-convert',)
+_EBOOK_META_CMD = ('ebook-meta',)
+_EBOOK_POLISH_CMD = ('ebook-polish',)
+_FETCH_EBOOK_METADATA_CMD = ('fetch-ebook-metadata',)
+_WEB2DISK_CMD = ('web2disk',)
+_LRF2LRS_CMD = ('lrf2lrs',)
+_LRS2LRF_CMD = ('lrs2lrf',)
+_CALIBRE_SMTP_CMD = ('calibre-smtp',)
+_EBOOK_EDIT_CHECK_CMD = ('ebook-edit', '--check-book')
+
+
 # --- Wrapper Functions ---
+#
+# Each wrapper is split into a command builder and a result handler so that the
+# blocking version (via `run_calibre_command`) and the `*_async` version (via
+# `run_calibre_command_async`) share exactly the same argument and error logic.
 
+@functools.lru_cache(maxsize=1)
 def get_calibre_version() -> str:
     """
     Gets the installed Calibre version.
     Runs `calibre --version`.
 
+    The installed version cannot change while the server is running, so the result is
+    cached after the first successful call (failures are not cached and will be retried).
+
     Returns:
         The Calibre version string.
 
@@ -187,7 +1123,56 @@ def get_calibre_version() -> str:
     """
     command = ['calibre', '--version']
     stdout, stderr, returncode = run_calibre_command(command)
+    return _parse_calibre_version(stdout, stderr, returncode)
 
+
+# Cache for the async variant. The lock is created lazily so it binds to the running
+# event loop rather than whichever loop (if any) existed at import time.
+_version_cache: Optional[str] = None
+_version_lock: Optional[asyncio.Lock] = None
+
+
+async def get_calibre_version_async() -> str:
+    """
+    Async variant of `get_calibre_version`.
+    Concurrent first callers share a single `calibre --version` run.
+    """
+    global _version_cache, _version_lock
+    if _version_cache is not None:
+        return _version_cache
+
+    if _version_lock is None:
+        _version_lock = asyncio.Lock()
+    async with _version_lock:
+        if _version_cache is None:
+            command = ['calibre', '--version']
+            stdout, stderr, returncode = await run_calibre_command_async(command)
+            _version_cache = _parse_calibre_version(stdout, stderr, returncode)
+    return _version_cache
+
+
+@functools.lru_cache(maxsize=1)
+def get_calibre_version_info() -> Tuple[int, ...]:
+    """
+    Gets the installed Calibre version as a tuple of ints, e.g. (6, 27, 0),
+    suitable for feature checks like `get_calibre_version_info() >= (5, 0)`.
+
+    Raises:
+        CalibreCLIError: If the version cannot be determined or parsed.
+        FileNotFoundError: If 'calibre' executable is not found.
+    """
+    return _parse_version_info(get_calibre_version())
+
+
+def _parse_version_info(version: str) -> Tuple[int, ...]:
+    match = re.match(r'\d+(?:\.\d+)*', version)
+    if not match:
+        raise CalibreCLIError(f"Could not parse Calibre version from '{version}'.")
+    return tuple(int(part) for part in match.group(0).split('.'))
+
+
+def _parse_calibre_version(stdout: str, stderr: str, returncode: int) -> str:
+    """Validates `calibre --version` output and extracts the version string."""
     if returncode != 0:
         raise CalibreCLIError(
             message="Failed to get Calibre version.",
@@ -230,15 +1215,107 @@ def ebook_convert(
         CalibreCLIError: If ebook-convert fails.
         FileNotFoundError: If 'ebook-convert' executable or input_file is not found.
     """
+    command = _build_ebook_convert_command(input_file, output_file, options)
+    # Only the return code matters on success; output is decoded only if CalibreCLIError is raised.
+    stdout, stderr, returncode = run_calibre_command(
+        command, timeout=300, binary=True, max_output=MAX_COMMAND_OUTPUT_BYTES
+    ) # Conversion can take time
+    return _handle_ebook_convert_result(input_file, output_file, stdout, stderr, returncode)
+
+
+async def ebook_convert_async(
+    input_file: str,
+    output_file: str,
+    options: Optional[List[str]] = None
+) -> str:
+    """Async variant of `ebook_convert`."""
+    command = _build_ebook_convert_command(input_file, output_file, options)
+    stdout, stderr, returncode = await run_calibre_command_async(command, timeout=300, binary=True)
+    return _handle_ebook_convert_result(input_file, output_file, stdout, stderr, returncode)
+
+
+async def ebook_convert_many(
+    conversions: List[Tuple[str, str, Optional[List[str]]]],
+    max_concurrency: Optional[int] = None,
+    return_exceptions: bool = False
+) -> List[Union[str, BaseException]]:
+    """
+    Runs several independent `ebook-convert` jobs concurrently.
+
+    Each conversion is a separate process, so running them side by side keeps every
+    core busy instead of converting a library one book at a time.
+
+    Args:
+        conversions: (input_file, output_file, options) tuples, as for `ebook_convert`.
+        max_concurrency: Maximum number of conversions running at once.
+                         Defaults to the number of CPUs.
+        return_exceptions: If True, a failed conversion's exception is placed in the
+                           result list instead of being raised.
+
+    Returns:
+        The output file paths, in the same order as `conversions`.
+
+    Raises:
+        CalibreCLIError, FileNotFoundError: The first failure, unless `return_exceptions` is True.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or os.cpu_count() or 1)
+
+    async def convert_one(input_file: str, output_file: str, options: Optional[List[str]]) -> str:
+        async with semaphore:
+            return await ebook_convert_async(input_file, output_file, options)
+
+    return await asyncio.gather(
+        *(convert_one(*conversion) for conversion in conversions),
+        return_exceptions=return_exceptions
+    )
+
+
+def batch_ebook_convert(
+    conversions: List[Tuple[str, str, Optional[List[str]]]],
+    return_exceptions: bool = False
+) -> List[Union[str, BaseException]]:
+    """
+    Blocking counterpart of `ebook_convert_many` for callers without an event loop.
+
+    The conversions run concurrently on the shared command pool (see
+    `run_calibre_commands_batch`), which caps them at the number of CPUs.
+
+    Args:
+        conversions: (input_file, output_file, options) tuples, as for `ebook_convert`.
+        return_exceptions: If True, a failed conversion's exception is placed in the
+                           result list instead of being raised.
+
+    Returns:
+        The output file paths, in the same order as `conversions`.
+
+    Raises:
+        CalibreCLIError, FileNotFoundError: The first failure, unless `return_exceptions` is True.
+    """
+    # Missing inputs are reported before anything is started.
+    commands = [_build_ebook_convert_command(*conversion) for conversion in conversions]
+    results: List[Union[str, BaseException]] = []
+    for (input_file, output_file, _options), outcome in zip(
+        conversions, run_calibre_commands_batch(commands, timeout=300, return_exceptions=True, binary=True)
+    ):
+        try:
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results.append(_handle_ebook_convert_result(input_file, output_file, *outcome))
+        except (CalibreCLIError, FileNotFoundError) as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+
+def _build_ebook_convert_command(input_file: str, output_file: str, options: Optional[List[str]]) -> List[str]:
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found: {input_file}")
 
-    command = ['ebook-convert', input_file, output_file]
-    if options:
-        command.extend(options)
+    return [*_EBOOK_CONVERT_CMD, input_file, output_file, *(options or ())]
 
-    stdout, stderr, returncode = run_calibre_command(command, timeout=300) # Conversion can take time
 
+def _handle_ebook_convert_result(input_file: str, output_file: str, stdout: bytes, stderr: bytes, returncode: int) -> str:
     if returncode != 0:
         # ebook-convert might output useful error messages to stdout or stderr
         raise CalibreCLIError(
@@ -260,6 +1337,28 @@ def ebook_convert(
     logger.info(f"ebook-convert successful: {input_file} -> {output_file}")
     return output_file
 
+# Run through `calibre-debug -c` by `get_ebook_metadata(as_json=True)`, prefixed with a
+# `path = '...'` line. Calibre reads the metadata and prints it as one line of JSON, which
+# avoids writing an OPF file only to read it back and parse it as XML. Kept as straight-line
+# code (no functions or comprehensions) because calibre-debug exec()s it inside a function.
+_EBOOK_METADATA_JSON_SCRIPT = """
+import json, os, sys
+from calibre.ebooks.metadata.meta import get_metadata
+with open(path, 'rb') as stream:
+    mi = get_metadata(stream, os.path.splitext(path)[1][1:].lower(), force_read_metadata=True)
+out = {}
+for field in ('title', 'authors', 'author_sort', 'publisher', 'pubdate', 'tags', 'series',
+              'series_index', 'rating', 'identifiers', 'languages', 'comments', 'uuid'):
+    value = getattr(mi, field, None)
+    if value is None or value == [] or value == {}:
+        continue
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    out[field] = value
+sys.stdout.write('\\n' + json.dumps(out) + '\\n')
+"""
+
+
 def get_ebook_metadata(
     ebook_file_path: str,
     output_opf_file: Optional[str] = None,
@@ -273,104 +1372,211 @@ def get_ebook_metadata(
         ebook_file_path: Path to the e-book file.
         output_opf_file: Optional. Path to save metadata as an OPF file.
                          If provided, the OPF content is written to this file.
-        as_json: If True, attempts to parse the OPF output into a JSON-like dictionary.
-                 `output_opf_file` is ignored if `as_json` is True (uses temp OPF).
+        as_json: If True, returns the metadata as a dictionary. Calibre serializes it directly
+                 (via `calibre-debug -c`), so no OPF file is involved.
+                 `output_opf_file` is ignored if `as_json` is True.
+                 Results are cached in memory by the file's contents.
 
     Returns:
-        If `as_json` is True, returns a dictionary of metadata.
+        If `as_json` is True, returns a dictionary of metadata keyed by Calibre field name
+        (title, authors, publisher, pubdate, tags, series, identifiers, languages, ...).
         If `output_opf_file` is provided and `as_json` is False, returns the path to the OPF file.
-        Otherwise (neither `output_opf_file` nor `as_json`), returns the raw OPF content as a string.
+        Otherwise (neither `output_opf_file` nor `as_json`), returns the stdout of `ebook-meta`.
 
 
     Raises:
         CalibreCLIError: If ebook-meta fails.
         FileNotFoundError: If 'ebook-meta' executable or ebook_file_path is not found.
     """
+    command = _build_get_ebook_metadata_command(ebook_file_path, output_opf_file, as_json)
+    cache_key = _metadata_cache_key(ebook_file_path, as_json)
+    cached = _metadata_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    stdout, stderr, returncode = run_calibre_command(command, binary=as_json)
+    result = _handle_get_ebook_metadata_result(
+        ebook_file_path, output_opf_file, as_json, stdout, stderr, returncode
+    )
+    _metadata_cache.put(cache_key, result)
+    return result
+
+
+async def get_ebook_metadata_async(
+    ebook_file_path: str,
+    output_opf_file: Optional[str] = None,
+    as_json: bool = False,
+) -> Union[str, Dict[str, Any]]:
+    """Async variant of `get_ebook_metadata`."""
+    command = _build_get_ebook_metadata_command(ebook_file_path, output_opf_file, as_json)
+    # Hashing reads the whole book; keep that off the event loop.
+    cache_key = await asyncio.get_running_loop().run_in_executor(
+        _EXEC, _metadata_cache_key, ebook_file_path, as_json
+    )
+    cached = _metadata_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    stdout, stderr, returncode = await run_calibre_command_async(command, binary=as_json)
+    result = _handle_get_ebook_metadata_result(
+        ebook_file_path, output_opf_file, as_json, stdout, stderr, returncode
+    )
+    _metadata_cache.put(cache_key, result)
+    return result
+
+
+class _LRUCache:
+    """
+    Small thread-safe LRU map for caching parsed command results in-process.
+
+    Values are deep-copied on the way in and out, because callers may modify what they
+    get back. A key of None means "not cacheable": `get` misses and `put` does nothing.
+    With `ttl` (seconds), entries also expire that long after they were stored, for
+    results that can change behind our back.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expiry time on the monotonic clock, or None; value)
+        self._entries: "collections.OrderedDict[Any, Tuple[Optional[float], Any]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key: Any, value: Any) -> None:
+        if key is None:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def update_values(self, update: Callable[[Any, Any], Any]) -> None:
+        """
+        Replaces every value with `update(key, value)`, or drops the entry if that is None.
+
+        `update` runs under the cache's lock and is given the stored value itself, not a
+        copy, so it may modify it in place; anything it adds must not be shared with callers.
+        Entries keep their LRU position and expiry time.
+        """
+        with self._lock:
+            for key, (expires_at, value) in list(self._entries.items()):
+                new_value = update(key, value)
+                if new_value is None:
+                    del self._entries[key]
+                else:
+                    self._entries[key] = (expires_at, new_value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _file_digest(path: str) -> Optional[str]:
+    """BLAKE2b digest of a file's contents, read in fixed-size chunks into one reused buffer."""
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(_HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                digest.update(view[:n])
+    except OSError:
+        return None # Not cacheable; let the command report the problem
+    return digest.hexdigest()
+
+
+# Process-local LRU of `get_ebook_metadata(as_json=True)` results keyed by the digest of
+# the book's contents and its extension, which picks the metadata reader (the same bytes
+# read as .epub and as .txt give different results). Uploads land at a fresh path every
+# time, so the rest of the path can't be part of the key; the metadata itself never
+# mentions it. Any write to the book, including
+# `set_ebook_metadata`, changes the key, so a stale entry is never returned; it just ages
+# out of the LRU.
+_METADATA_CACHE_SIZE = 256
+_metadata_cache = _LRUCache(_METADATA_CACHE_SIZE)
+
+
+def _metadata_cache_key(ebook_file_path: str, as_json: bool) -> Optional[Tuple[str, str, bool]]:
+    """`_metadata_cache` key for a read, or None if its result is not cached."""
+    if not as_json:
+        return None
+    digest = _file_digest(ebook_file_path)
+    if digest is None:
+        return None
+    return digest, os.path.splitext(ebook_file_path)[1].lower(), as_json
+
+
+def _build_get_ebook_metadata_command(
+    ebook_file_path: str,
+    output_opf_file: Optional[str],
+    as_json: bool,
+) -> List[str]:
     if not os.path.exists(ebook_file_path):
         raise FileNotFoundError(f"E-book file not found: {ebook_file_path}")
 
-    temp_opf_created = False
-    if as_json and not output_opf_file:
-        # Create a temporary OPF file for --to-opf if as_json is requested
-        # because ebook-meta doesn't directly output JSON.
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".opf", mode="w+") as tmp_opf:
-            output_opf_file = tmp_opf.name
-            temp_opf_created = True
-
-    command = ['ebook-meta', ebook_file_path]
-    if output_opf_file:
-        command.extend(['--to-opf', output_opf_file])
+    if as_json:
+        script = f"path = {ebook_file_path!r}\n" + _EBOOK_METADATA_JSON_SCRIPT
+        return ['calibre-debug', '-c', script]
 
-    # If neither output_opf_file is given nor as_json is true, ebook-meta prints to stdout.
+    # If output_opf_file is not given, ebook-meta prints the metadata to stdout.
     # If output_opf_file is given, it prints nothing to stdout.
+    if output_opf_file:
+        return [*_EBOOK_META_CMD, ebook_file_path, '--to-opf', output_opf_file]
+    return [*_EBOOK_META_CMD, ebook_file_path]
 
-    stdout, stderr, returncode = run_calibre_command(command)
 
+def _handle_get_ebook_metadata_result(
+    ebook_file_path: str,
+    output_opf_file: Optional[str],
+    as_json: bool,
+    stdout: Union[str, bytes],
+    stderr: Union[str, bytes],
+    returncode: int,
+) -> Union[str, Dict[str, Any]]:
+    if as_json:
+        # The JSON run is binary so stdout can go to the parser undecoded; stderr is only
+        # ever shown to people.
+        stderr = _decode_output(stderr)
     if returncode != 0:
-        if temp_opf_created and os.path.exists(output_opf_file):
-            os.remove(output_opf_file)
+        tool = 'calibre-debug' if as_json else 'ebook-meta'
         raise CalibreCLIError(
-            message=f"ebook-meta failed to read metadata from {ebook_file_path}.",
-            stdout=stdout,
+            message=f"{tool} failed to read metadata from {ebook_file_path}.",
+            stdout=_decode_output(stdout),
             stderr=stderr,
             returncode=returncode
         )
 
-    try:
-        if as_json:
-            if not output_opf_file: # Should have been created if as_json was true
-                raise CalibreCLIError("Internal error: OPF file path missing for JSON conversion.")
-
-            if not os.path.exists(output_opf_file) or os.path.getsize(output_opf_file) == 0:
-                 raise CalibreCLIError(
-                    message=f"ebook-meta ran but OPF file {output_opf_file} was not created or is empty.",
-                    stdout=stdout, stderr=stderr, returncode=returncode
-                )
-
-            with open(output_opf_file, 'r', encoding='utf-8') as f:
-                opf_content = f.read()
-
-            # Basic OPF to JSON parsing (can be made more robust)
-            # This requires an XML parser. Python's built-in xml.etree.ElementTree is good.
-            import xml.etree.ElementTree as ET
-            metadata_dict = {}
-            try:
-                root = ET.fromstring(opf_content)
-                # Namespace handling is important for OPF files
-                ns = {
-                    'opf': 'http://www.idpf.org/ २०07/opf',
-                    'dc': 'http://purl.org/dc/elements/1.1/'
-                }
-                metadata_node = root.find('opf:metadata', ns)
-                if metadata_node is not None:
-                    for child in metadata_node:
-                        tag_name = child.tag.split('}')[-1] # Remove namespace
-                        if tag_name in metadata_dict:
-                            if not isinstance(metadata_dict[tag_name], list):
-                                metadata_dict[tag_name] = [metadata_dict[tag_name]]
-                            metadata_dict[tag_name].append(child.text)
-                        else:
-                            metadata_dict[tag_name] = child.text
-                    # Handle attributes like scheme for identifiers, role for creators, etc.
-                    # For simplicity, this basic parser might miss some nuances.
-                return metadata_dict
-            except ET.ParseError as e:
-                raise CalibreCLIError(f"Failed to parse OPF content from {ebook_file_path}: {e}", stdout=opf_content)
-
-        elif output_opf_file:
-            if not os.path.exists(output_opf_file):
-                 raise CalibreCLIError(
-                    message=f"ebook-meta command ran but OPF file {output_opf_file} was not created.",
-                    stdout=stdout, stderr=stderr, returncode=returncode
-                )
-            return output_opf_file # Return path to the OPF file
-        else:
-            # If no output_opf_file and not as_json, ebook-meta prints OPF to stdout
-            return stdout # Return raw OPF content from stdout
-    finally:
-        if temp_opf_created and os.path.exists(output_opf_file):
-            os.remove(output_opf_file)
+    if as_json:
+        return _parse_json_output(stdout, f"metadata of {ebook_file_path}", stderr, returncode)
+    elif output_opf_file:
+        if not os.path.exists(output_opf_file):
+             raise CalibreCLIError(
+                message=f"ebook-meta command ran but OPF file {output_opf_file} was not created.",
+                stdout=stdout, stderr=stderr, returncode=returncode
+            )
+        return output_opf_file # Return path to the OPF file
+    else:
+        return stdout
 
 
 def set_ebook_metadata(
@@ -393,16 +1599,32 @@ def set_ebook_metadata(
         CalibreCLIError: If ebook-meta fails.
         FileNotFoundError: If 'ebook-meta' executable or ebook_file_path is not found.
     """
+    command = _build_set_ebook_metadata_command(ebook_file_path, metadata_options)
+    stdout, stderr, returncode = run_calibre_command(command)
+    return _handle_set_ebook_metadata_result(ebook_file_path, stdout, stderr, returncode)
+
+
+async def set_ebook_metadata_async(
+    ebook_file_path: str,
+    metadata_options: List[str]
+) -> str:
+    """Async variant of `set_ebook_metadata`."""
+    command = _build_set_ebook_metadata_command(ebook_file_path, metadata_options)
+    stdout, stderr, returncode = await run_calibre_command_async(command)
+    return _handle_set_ebook_metadata_result(ebook_file_path, stdout, stderr, returncode)
+
+
+def _build_set_ebook_metadata_command(ebook_file_path: str, metadata_options: List[str]) -> List[str]:
     if not os.path.exists(ebook_file_path):
         raise FileNotFoundError(f"E-book file not found: {ebook_file_path}")
 
     if not metadata_options:
         raise ValueError("metadata_options cannot be empty.")
 
-    command = ['ebook-meta', ebook_file_path] + metadata_options
+    return ['ebook-meta', ebook_file_path] + metadata_options
 
-    stdout, stderr, returncode = run_calibre_command(command)
 
+def _handle_set_ebook_metadata_result(ebook_file_path: str, stdout: str, stderr: str, returncode: int) -> str:
     if returncode != 0:
         raise CalibreCLIError(
             message=f"ebook-meta failed to set metadata for {ebook_file_path}.",
@@ -421,7 +1643,9 @@ def ebook_polish(
     ebook_file_path: str,
     output_file_path: Optional[str] = None, # If None, polishes in-place (if supported by format)
     options: Optional[List[str]] = None,
-    polish_in_place_if_possible: bool = True # Default behavior of ebook-polish
+    polish_in_place_if_possible: bool = True, # Default behavior of ebook-polish
+    *,
+    input_stat: Optional[os.stat_result] = None,
 ) -> str:
     """
     Polishes an e-book file using `ebook-polish`.
@@ -440,6 +1664,9 @@ def ebook_polish(
                                      ebook-polish to modify the input file directly.
                                      If False and output_file_path is None, this function might raise
                                      an error as ebook-polish needs an output destination.
+        input_stat: Optional `os.stat_result` for the input file, e.g. from `os.DirEntry.stat()`
+                    while scanning a directory. Passing it says the file is known to exist,
+                    so the existence check is skipped.
 
     Returns:
         Path to the polished e-book file. If polished in-place, this is ebook_file_path.
@@ -450,32 +1677,66 @@ def ebook_polish(
         FileNotFoundError: If 'ebook-polish' executable or ebook_file_path is not found.
         ValueError: If arguments are inconsistent (e.g., no output path when in-place is disallowed).
     """
-    if not os.path.exists(ebook_file_path):
-        raise FileNotFoundError(f"E-book file not found: {ebook_file_path}")
+    command, actual_output_path = _build_ebook_polish_command(
+        ebook_file_path, output_file_path, options, polish_in_place_if_possible, input_stat
+    )
+    stdout, stderr, returncode = run_calibre_command(
+        command, timeout=300, binary=True, max_output=MAX_COMMAND_OUTPUT_BYTES
+    ) # Polishing can take time
+    return _handle_ebook_polish_result(ebook_file_path, actual_output_path, stdout, stderr, returncode)
+
+
+async def ebook_polish_async(
+    ebook_file_path: str,
+    output_file_path: Optional[str] = None,
+    options: Optional[List[str]] = None,
+    polish_in_place_if_possible: bool = True,
+    *,
+    input_stat: Optional[os.stat_result] = None,
+) -> str:
+    """Async variant of `ebook_polish`."""
+    command, actual_output_path = _build_ebook_polish_command(
+        ebook_file_path, output_file_path, options, polish_in_place_if_possible, input_stat
+    )
+    stdout, stderr, returncode = await run_calibre_command_async(command, timeout=300, binary=True)
+    return _handle_ebook_polish_result(ebook_file_path, actual_output_path, stdout, stderr, returncode)
 
-    command = ['ebook-polish']
 
-    actual_output_path = ebook_file_path # Assume in-place polish initially
+def _build_ebook_polish_command(
+    ebook_file_path: str,
+    output_file_path: Optional[str],
+    options: Optional[List[str]],
+    polish_in_place_if_possible: bool,
+    input_stat: Optional[os.stat_result] = None,
+) -> Tuple[List[str], str]:
+    """Returns (command, actual_output_path) for an ebook-polish run."""
+    if input_stat is None and not os.path.exists(ebook_file_path):
+        raise FileNotFoundError(f"E-book file not found: {ebook_file_path}")
 
     if output_file_path:
-        command.extend([ebook_file_path, output_file_path])
+        command = [*_EBOOK_POLISH_CMD, ebook_file_path, output_file_path, *(options or ())]
         actual_output_path = output_file_path
     elif polish_in_place_if_possible:
         # If output_file_path is None and polish_in_place_if_possible is True,
         # ebook-polish expects the input file path as the first argument, and it will modify it.
-        command.append(ebook_file_path)
-        # The output path is implicitly the input path.
+        command = [*_EBOOK_POLISH_CMD, ebook_file_path, *(options or ())]
+        actual_output_path = ebook_file_path # The output path is implicitly the input path.
     else: # output_file_path is None AND polish_in_place_if_possible is False
         # This is problematic. ebook-polish needs an output if not in-place.
         # The CLI usually takes <input_file> <output_file> if not in-place.
         # For safety, let's require an output_file_path if not polishing in-place.
         raise ValueError("output_file_path must be provided if polish_in_place_if_possible is False.")
 
-    if options:
-        command.extend(options)
+    return command, actual_output_path
 
-    stdout, stderr, returncode = run_calibre_command(command, timeout=300) # Polishing can take time
 
+def _handle_ebook_polish_result(
+    ebook_file_path: str,
+    actual_output_path: str,
+    stdout: bytes,
+    stderr: bytes,
+    returncode: int,
+) -> str:
     if returncode != 0:
         raise CalibreCLIError(
             message=f"ebook-polish failed for {ebook_file_path}.",
@@ -516,8 +1777,8 @@ def fetch_ebook_metadata(
         ids: Dictionary of external identifiers (e.g., {'goodreads': '12345'}).
         output_opf_file: Optional. Path to save metadata as an OPF file.
         timeout_seconds: Timeout for the fetch operation.
-        as_json: If True, attempts to parse the OPF output into a JSON-like dictionary.
-                 `output_opf_file` is used as a temporary location if not provided.
+        as_json: If True, parses the OPF printed by the tool into a JSON-like dictionary
+                 in memory. `output_opf_file` is ignored if `as_json` is True.
 
     Returns:
         If `as_json` is True, returns a dictionary of metadata.
@@ -529,105 +1790,189 @@ def fetch_ebook_metadata(
         FileNotFoundError: If 'fetch-ebook-metadata' executable is not found.
         ValueError: If no search criteria (title, authors, isbn, ids) are provided.
     """
+    command = _build_fetch_ebook_metadata_command(title, authors, isbn, ids, timeout_seconds)
+    stdout, stderr, returncode = run_calibre_command(command, timeout=timeout_seconds + 10) # Add buffer to timeout
+    return _handle_fetch_ebook_metadata_result(output_opf_file, as_json, stdout, stderr, returncode)
+
+
+async def fetch_ebook_metadata_async(
+    title: Optional[str] = None,
+    authors: Optional[str] = None,
+    isbn: Optional[str] = None,
+    ids: Optional[Dict[str, str]] = None,
+    output_opf_file: Optional[str] = None,
+    timeout_seconds: int = 60,
+    as_json: bool = False,
+) -> Union[str, Dict[str, Any]]:
+    """Async variant of `fetch_ebook_metadata`."""
+    command = _build_fetch_ebook_metadata_command(title, authors, isbn, ids, timeout_seconds)
+    stdout, stderr, returncode = await run_calibre_command_async(command, timeout=timeout_seconds + 10)
+    return _handle_fetch_ebook_metadata_result(output_opf_file, as_json, stdout, stderr, returncode)
+
+
+# Metadata sources answer bursts of lookups with "429 Too Many Requests", or just stop
+# responding in time. Unlike "No metadata found", those failures are worth another try.
+_RATE_LIMITED_RE = re.compile(r"\b429\b|Too Many Requests|rate.?limit", re.IGNORECASE)
+
+
+def _is_retryable_fetch_error(error: CalibreCLIError) -> bool:
+    return error.returncode == -1 or bool(_RATE_LIMITED_RE.search(error.stderr or ""))
+
+
+async def fetch_ebook_metadata_many(
+    queries: List[Dict[str, Any]],
+    max_concurrency: int = 8,
+    retries: int = 2,
+    backoff_seconds: float = 1.0,
+    return_exceptions: bool = False
+) -> List[Union[str, Dict[str, Any], BaseException]]:
+    """
+    Runs several `fetch-ebook-metadata` lookups concurrently.
+
+    Lookups are network-bound, so running them side by side turns a bulk import's
+    metadata pass from minutes into seconds. Concurrency is capped to stay within what
+    the online sources tolerate, and a lookup that times out or is rate limited is
+    retried with exponential backoff (`backoff_seconds`, doubling each time), without
+    holding a concurrency slot while it waits.
+
+    Args:
+        queries: Keyword arguments for `fetch_ebook_metadata`, one dict per lookup
+                 (e.g. {"title": "The Hobbit", "as_json": True}).
+        max_concurrency: Maximum number of lookups running at once.
+        retries: How many times a timed-out or rate-limited lookup is retried.
+        backoff_seconds: Delay before the first retry.
+        return_exceptions: If True, a failed lookup's exception is placed in the
+                           result list instead of being raised.
+
+    Returns:
+        The results of `fetch_ebook_metadata`, in the same order as `queries`.
+
+    Raises:
+        CalibreCLIError, FileNotFoundError, ValueError: The first failure, unless
+            `return_exceptions` is True.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_one(query: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    return await fetch_ebook_metadata_async(**query)
+            except CalibreCLIError as e:
+                if attempt == retries or not _is_retryable_fetch_error(e):
+                    raise
+            await asyncio.sleep(backoff_seconds * 2 ** attempt)
+
+    return await asyncio.gather(
+        *(fetch_one(query) for query in queries),
+        return_exceptions=return_exceptions
+    )
+
+
+def batch_fetch_ebook_metadata(
+    queries: List[Dict[str, Any]],
+    max_concurrency: int = 8,
+    retries: int = 2,
+    backoff_seconds: float = 1.0,
+    return_exceptions: bool = False
+) -> List[Union[str, Dict[str, Any], BaseException]]:
+    """
+    Synchronous counterpart of `fetch_ebook_metadata_many`, for callers without an event loop.
+
+    The lookups run on up to `max_concurrency` threads, each blocking on its own
+    `fetch-ebook-metadata` process. Arguments and results are as for
+    `fetch_ebook_metadata_many`.
+    """
+    def fetch_one(query: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        for attempt in range(retries + 1):
+            try:
+                return fetch_ebook_metadata(**query)
+            except CalibreCLIError as e:
+                if attempt == retries or not _is_retryable_fetch_error(e):
+                    raise
+            time.sleep(backoff_seconds * 2 ** attempt)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(queries))), thread_name_prefix="calibre-fetch"
+    ) as executor:
+        futures = [executor.submit(fetch_one, query) for query in queries]
+    # Leaving the `with` block waited for every lookup.
+    results: List[Any] = []
+    for future in futures:
+        error = future.exception()
+        if error is not None and not return_exceptions:
+            raise error
+        results.append(error if error is not None else future.result())
+    return results
+
+
+def _build_fetch_ebook_metadata_command(
+    title: Optional[str],
+    authors: Optional[str],
+    isbn: Optional[str],
+    ids: Optional[Dict[str, str]],
+    timeout_seconds: int,
+) -> List[str]:
     if not (title or authors or isbn or ids):
         raise ValueError("At least one of title, authors, isbn, or ids must be provided for fetching metadata.")
 
-    command = ['fetch-ebook-metadata']
-    if title:
-        command.extend(['--title', title])
-    if authors:
+    return [
+        *_FETCH_EBOOK_METADATA_CMD,
+        *(('--title', title) if title else ()),
         # fetch-ebook-metadata takes authors one by one with -a or --authors
         # If multiple authors, split and add them.
-        for author in authors.split(','):
-            command.extend(['--authors', author.strip()])
-    if isbn:
-        command.extend(['--isbn', isbn])
-    if ids:
-        for site, site_id in ids.items():
-            command.extend(['--identifier', f"{site}:{site_id}"])
-
-    command.extend(['--timeout', str(timeout_seconds)])
-
-    temp_opf_for_json = None
-    actual_opf_target = output_opf_file
-
-    if as_json and not output_opf_file:
-        import tempfile
-        # Create a temporary OPF file for --opf if as_json is requested
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".opf", mode="w+") as tmp_opf:
-            temp_opf_for_json = tmp_opf.name
-            actual_opf_target = temp_opf_for_json
+        *(arg for author in (authors.split(',') if authors else ()) for arg in ('--authors', author.strip())),
+        *(('--isbn', isbn) if isbn else ()),
+        *(arg for site, site_id in (ids or {}).items() for arg in ('--identifier', f"{site}:{site_id}")),
+        '--timeout', str(timeout_seconds),
+        # --opf is a flag: the result is printed to stdout as OPF instead of human readable text.
+        # Everything below works from that stdout, so no temporary file is needed.
+        '--opf',
+    ]
 
-    if actual_opf_target:
-        command.extend(['--opf', actual_opf_target])
 
-    # If no actual_opf_target, output is to stdout.
+# fetch-ebook-metadata's report when no source had a match; it exits non-zero with this.
+_NO_METADATA_RE = re.compile(r"No metadata found")
 
-    stdout, stderr, returncode = run_calibre_command(command, timeout=timeout_seconds + 10) # Add buffer to timeout
 
-    try:
-        if returncode != 0:
-            # fetch-ebook-metadata can return non-zero if metadata not found.
-            # stderr often contains "No metadata found" or similar.
-            # We should treat "No metadata found" as a specific case, not necessarily a hard error.
-            if "No metadata found" in stderr or "No metadata found" in stdout:
-                 raise CalibreCLIError(
-                    message="No metadata found for the given criteria.",
-                    stdout=stdout, stderr=stderr, returncode=returncode
-                )
-            raise CalibreCLIError(
-                message="fetch-ebook-metadata command failed.",
+def _handle_fetch_ebook_metadata_result(
+    output_opf_file: Optional[str],
+    as_json: bool,
+    stdout: str,
+    stderr: str,
+    returncode: int,
+) -> Union[str, Dict[str, Any]]:
+    if returncode != 0:
+        # fetch-ebook-metadata can return non-zero if metadata not found.
+        # stderr often contains "No metadata found" or similar.
+        # We should treat "No metadata found" as a specific case, not necessarily a hard error.
+        if _NO_METADATA_RE.search(stderr) or _NO_METADATA_RE.search(stdout):
+             raise CalibreCLIError(
+                message="No metadata found for the given criteria.",
                 stdout=stdout, stderr=stderr, returncode=returncode
             )
+        raise CalibreCLIError(
+            message="fetch-ebook-metadata command failed.",
+            stdout=stdout, stderr=stderr, returncode=returncode
+        )
 
-        if as_json:
-            if not actual_opf_target:
-                raise CalibreCLIError("Internal error: OPF file path missing for JSON conversion.")
-            if not os.path.exists(actual_opf_target) or os.path.getsize(actual_opf_target) == 0:
-                raise CalibreCLIError(
-                    message=f"fetch-ebook-metadata ran but OPF file {actual_opf_target} was not created or is empty.",
-                    stdout=stdout, stderr=stderr, returncode=returncode
-                )
-
-            with open(actual_opf_target, 'r', encoding='utf-8') as f:
-                opf_content = f.read()
+    if not stdout.strip(): # Should not happen if returncode is 0
+        raise CalibreCLIError(
+            message="fetch-ebook-metadata returned success but no OPF content in stdout.",
+            stdout=stdout, stderr=stderr, returncode=returncode
+        )
 
-            import xml.etree.ElementTree as ET
-            metadata_dict = {}
-            try:
-                root = ET.fromstring(opf_content)
-                ns = {'opf': 'http://www.idpf.org/ २०07/opf', 'dc': 'http://purl.org/dc/elements/1.1/'}
-                metadata_node = root.find('opf:metadata', ns)
-                if metadata_node is not None:
-                    for child in metadata_node:
-                        tag_name = child.tag.split('}')[-1]
-                        if tag_name in metadata_dict:
-                            if not isinstance(metadata_dict[tag_name], list):
-                                metadata_dict[tag_name] = [metadata_dict[tag_name]]
-                            metadata_dict[tag_name].append(child.text)
-                        else:
-                            metadata_dict[tag_name] = child.text
-                return metadata_dict
-            except ET.ParseError as e:
-                raise CalibreCLIError(f"Failed to parse OPF content from fetched metadata: {e}", stdout=opf_content)
-
-        elif output_opf_file: # and not as_json
-            if not os.path.exists(output_opf_file):
-                 raise CalibreCLIError(
-                    message=f"fetch-ebook-metadata ran but OPF file {output_opf_file} was not created.",
-                    stdout=stdout, stderr=stderr, returncode=returncode
-                )
-            return output_opf_file
-        else: # Not as_json and no output_opf_file, so OPF is in stdout
-            if not stdout.strip(): # Should not happen if returncode is 0
-                raise CalibreCLIError(
-                    message="fetch-ebook-metadata returned success but no OPF content in stdout.",
-                    stdout=stdout, stderr=stderr, returncode=returncode
-                )
-            return stdout
-    finally:
-        if temp_opf_for_json and os.path.exists(temp_opf_for_json):
-            os.remove(temp_opf_for_json)
+    if as_json:
+        try:
+            return _parse_opf_to_dict(stdout.encode('utf-8'))
+        except ET.ParseError as e:
+            raise CalibreCLIError(f"Failed to parse OPF content from fetched metadata: {e}", stdout=stdout)
+    elif output_opf_file:
+        with open(output_opf_file, 'w', encoding='utf-8') as f:
+            f.write(stdout)
+        return output_opf_file
+    else:
+        return stdout
 
 
 def web2disk(
@@ -655,16 +2000,32 @@ def web2disk(
         FileNotFoundError: If 'web2disk' executable is not found.
         ValueError: If output_recipe_file does not end with '.recipe'.
     """
-    if not output_recipe_file.endswith(".recipe"):
+    command = _build_web2disk_command(url, output_recipe_file, options)
+    stdout, stderr, returncode = run_calibre_command(
+        command, timeout=300, binary=True, max_output=MAX_COMMAND_OUTPUT_BYTES
+    ) # Downloading can take time
+    return _handle_web2disk_result(url, output_recipe_file, stdout, stderr, returncode)
+
+
+async def web2disk_async(
+    url: str,
+    output_recipe_file: str,
+    options: Optional[List[str]] = None
+) -> str:
+    """Async variant of `web2disk`."""
+    command = _build_web2disk_command(url, output_recipe_file, options)
+    stdout, stderr, returncode = await run_calibre_command_async(command, timeout=300, binary=True)
+    return _handle_web2disk_result(url, output_recipe_file, stdout, stderr, returncode)
+
+
+def _build_web2disk_command(url: str, output_recipe_file: str, options: Optional[List[str]]) -> List[str]:
+    if os.path.splitext(output_recipe_file)[1].lower() != ".recipe":
         raise ValueError("output_recipe_file must end with '.recipe'")
 
-    command = ['web2disk']
-    if options:
-        command.extend(options)
-    command.extend([url, output_recipe_file])
+    return [*_WEB2DISK_CMD, *(options or ()), url, output_recipe_file]
 
-    stdout, stderr, returncode = run_calibre_command(command, timeout=300) # Downloading can take time
 
+def _handle_web2disk_result(url: str, output_recipe_file: str, stdout: bytes, stderr: bytes, returncode: int) -> str:
     if returncode != 0:
         raise CalibreCLIError(
             message=f"web2disk failed for URL {url}.",
@@ -673,7 +2034,12 @@ def web2disk(
             returncode=returncode
         )
 
-    if not os.path.exists(output_recipe_file) or os.path.getsize(output_recipe_file) == 0:
+    # One stat() answers both "was it created?" and "is it empty?".
+    try:
+        recipe_size = os.stat(output_recipe_file).st_size
+    except FileNotFoundError:
+        recipe_size = 0
+    if recipe_size == 0:
         raise CalibreCLIError(
             message=f"web2disk completed but recipe file {output_recipe_file} was not created or is empty.",
             stdout=stdout,
@@ -685,30 +2051,12 @@ def web2disk(
     return output_recipe_file
 
 
-# --- Imports needed for the new functions ---
-import os
-from typing import List, Optional, Union, Dict, Any
-# Remove tempfile if it's only used in the __main__ part of the original file
-# import tempfile # Used in get_ebook_metadata and fetch_ebook_metadata
-
-# Make sure the logger is available if not already defined at the top
-# import logging
-# logger = logging.getLogger(__name__) # Assuming it's already configured
-
 # Example usages for new functions (can be expanded for testing)
 if __name__ == '__main__':
     # ... (keep existing run_calibre_command tests) ...
 
     print("\n--- Testing Wrapper Functions ---")
 
-    # Test get_calibre_version
-    print("\nTest: Get Calibre Version")
-    try:
-        version = get_calibre_version()
-        print(f"Calibre Version: {version}")
-    except Exception as e:
-        print(f"Error getting version: {e}")
-
     # Note: For functions like ebook_convert, ebook_meta, ebook_polish, fetch_ebook_metadata, web2disk,
     # comprehensive tests would require:
     # 1. Sample input files (e.g., test.epub, test.txt).
@@ -717,109 +2065,82 @@ if __name__ == '__main__':
     # 4. Cleanup of any generated files.
     # These are more like integration tests.
     # For now, we'll include placeholder calls to demonstrate structure.
+    # The tests below are independent of each other, so they run concurrently. They share one
+    # scratch directory (`scratch_dir`, set up before they run) holding a single dummy input
+    # text file (`dummy_input`); each test writes its outputs there under its own names.
 
-    # Example: ebook_convert (requires dummy files)
-    # Create dummy input file for ebook_convert test
-    if not os.path.exists("dummy_input.txt"):
-        with open("dummy_input.txt", "w") as f:
-            f.write("This is a test file for ebook-convert.")
+    def _test_get_calibre_version(log):
+        log("\nTest: Get Calibre Version")
+        try:
+            version = get_calibre_version()
+            log(f"Calibre Version: {version}")
+        except Exception as e:
+            log(f"Error getting version: {e}")
 
-    print("\nTest: ebook-convert (dummy_input.txt to dummy_output.epub)")
-    try:
-        output_path = ebook_convert("dummy_input.txt", "dummy_output.epub", options=["--authors", "Test Author"])
-        print(f"ebook-convert successful. Output: {output_path}")
-        if os.path.exists("dummy_output.epub"):
-             print("dummy_output.epub created.")
-             # os.remove("dummy_output.epub") # Clean up
-    except FileNotFoundError as e:
-        print(f"File not found (ebook-convert or input): {e}")
-    except CalibreCLIError as e:
-        print(f"ebook-convert error: {e}")
-    finally:
-        if os.path.exists("dummy_input.txt"):
-            os.remove("dummy_input.txt")
-        if os.path.exists("dummy_output.epub"): # Ensure cleanup even on error after creation
-            os.remove("dummy_output.epub")
-
-
-    # Example: get_ebook_metadata (requires a dummy epub)
-    # We'd need a minimal valid epub file for a real test.
-    # For now, this will likely fail if dummy_output.epub wasn't created or is invalid.
-    print("\nTest: get_ebook_metadata (on dummy_output.epub, if it exists and is valid)")
-    if os.path.exists("dummy_output.epub"): # Recreate for this test if needed
-        # This is not ideal, ebook_convert test should be self-contained
-        pass
-    else:
-        # Quick way to get an EPUB for testing if ebook-convert above didn't run or failed
-        # ebook_convert("dummy_input.txt", "dummy_output.epub") # This creates dependency
-        print("Skipping get_ebook_metadata test as dummy_output.epub not available.")
+    def _test_convert_and_get_metadata(log):
+        # Example: ebook_convert
+        log("\nTest: ebook-convert (dummy_input.txt to dummy_output.epub)")
+        converted_epub = None
+        try:
+            output_path = ebook_convert(dummy_input, os.path.join(scratch_dir, "dummy_output.epub"), options=["--authors", "Test Author"])
+            log(f"ebook-convert successful. Output: {output_path}")
+            converted_epub = output_path # ebook_convert has already checked that it exists
+        except FileNotFoundError as e:
+            log(f"File not found (ebook-convert or input): {e}")
+        except CalibreCLIError as e:
+            log(f"ebook-convert error: {e}")
 
-    if os.path.exists("dummy_output.epub"): # Check again
+        # Example: get_ebook_metadata (on the EPUB converted above)
+        log("\nTest: get_ebook_metadata (on dummy_output.epub, if it was created)")
+        if converted_epub is None:
+            log("Skipping get_ebook_metadata test as dummy_output.epub not available.")
+            return
         try:
             # Test get metadata as JSON
-            metadata_json = get_ebook_metadata("dummy_output.epub", as_json=True)
-            print(f"Metadata (JSON) for dummy_output.epub: {metadata_json}")
+            metadata_json = get_ebook_metadata(converted_epub, as_json=True)
+            log(f"Metadata (JSON) for dummy_output.epub: {metadata_json}")
 
             # Test get metadata as OPF file
-            opf_file = get_ebook_metadata("dummy_output.epub", output_opf_file="dummy_meta.opf")
-            print(f"Metadata saved to OPF: {opf_file}")
-            if os.path.exists(opf_file):
-                # with open(opf_file, "r") as f: print(f.read()) # Print OPF content
-                os.remove(opf_file) # Clean up
+            opf_file = get_ebook_metadata(converted_epub, output_opf_file=os.path.join(scratch_dir, "dummy_meta.opf"))
+            log(f"Metadata saved to OPF: {opf_file}")
 
         except FileNotFoundError as e:
-            print(f"File not found during get_ebook_metadata test: {e}")
+            log(f"File not found during get_ebook_metadata test: {e}")
         except CalibreCLIError as e:
-            print(f"get_ebook_metadata error: {e}")
-        finally:
-            if os.path.exists("dummy_output.epub"): # Clean up the epub used for this test
-                 # os.remove("dummy_output.epub") # Let ebook_convert test handle its own cleanup
-                 pass
-
-    # Example: set_ebook_metadata (requires a dummy epub that can be modified)
-    # Create a fresh dummy epub for this test to avoid interference
-    print("\nTest: set_ebook_metadata")
-    temp_epub_for_set_meta = "temp_set_meta.epub"
-    if not os.path.exists("dummy_input.txt"): # Should have been cleaned up
-        with open("dummy_input.txt", "w") as f: f.write("Content for setting metadata.")
-    try:
-        ebook_convert("dummy_input.txt", temp_epub_for_set_meta)
-        if os.path.exists(temp_epub_for_set_meta):
-            print(f"Created {temp_epub_for_set_meta} for set_ebook_metadata test.")
+            log(f"get_ebook_metadata error: {e}")
+
+    def _test_set_ebook_metadata(log):
+        # Example: set_ebook_metadata (requires a dummy epub that can be modified)
+        log("\nTest: set_ebook_metadata")
+        temp_epub_for_set_meta = os.path.join(scratch_dir, "temp_set_meta.epub")
+        try:
+            ebook_convert(dummy_input, temp_epub_for_set_meta) # Raises unless the EPUB was created
+            log(f"Created {temp_epub_for_set_meta} for set_ebook_metadata test.")
             result = set_ebook_metadata(temp_epub_for_set_meta, ["--title", "My Test Title From Pytest"])
-            print(f"set_ebook_metadata result: {result}")
+            log(f"set_ebook_metadata result: {result}")
 
             # Verify change (optional, by reading metadata back)
             meta_after_set = get_ebook_metadata(temp_epub_for_set_meta, as_json=True)
-            print(f"Metadata after set: {meta_after_set}")
+            log(f"Metadata after set: {meta_after_set}")
             if meta_after_set.get('title') == "My Test Title From Pytest":
-                print("Title successfully updated.")
+                log("Title successfully updated.")
             else:
-                print("Title update verification failed or title not found in parsed metadata.")
+                log("Title update verification failed or title not found in parsed metadata.")
 
-    except Exception as e:
-        print(f"Error during set_ebook_metadata test: {e}")
-    finally:
-        if os.path.exists("dummy_input.txt"): os.remove("dummy_input.txt")
-        if os.path.exists(temp_epub_for_set_meta): os.remove(temp_epub_for_set_meta)
-
-
-    # Example: ebook_polish (requires a dummy epub)
-    print("\nTest: ebook_polish")
-    temp_epub_for_polish = "temp_polish_me.epub"
-    polished_output = "temp_polished.epub"
-    if not os.path.exists("dummy_input.txt"):
-        with open("dummy_input.txt", "w") as f: f.write("Content for polishing.")
-    try:
-        ebook_convert("dummy_input.txt", temp_epub_for_polish) # Create a source epub
-        if os.path.exists(temp_epub_for_polish):
-            print(f"Created {temp_epub_for_polish} for ebook_polish test.")
+        except Exception as e:
+            log(f"Error during set_ebook_metadata test: {e}")
+
+    def _test_ebook_polish(log):
+        # Example: ebook_polish (requires a dummy epub)
+        log("\nTest: ebook_polish")
+        temp_epub_for_polish = os.path.join(scratch_dir, "temp_polish_me.epub")
+        polished_output = os.path.join(scratch_dir, "temp_polished.epub")
+        try:
+            ebook_convert(dummy_input, temp_epub_for_polish) # Create a source epub
+            log(f"Created {temp_epub_for_polish} for ebook_polish test.")
             # Polish with an output file
             result_path = ebook_polish(temp_epub_for_polish, output_file_path=polished_output, options=["--subset-fonts"])
-            print(f"ebook_polish (to new file) successful. Output: {result_path}")
-            if os.path.exists(polished_output):
-                print(f"{polished_output} created.")
-                os.remove(polished_output)
+            log(f"ebook_polish (to new file) successful. Output: {result_path}")
 
             # Polish in-place (be careful with this, test on a copy)
             # For safety, let's copy first then polish in place
@@ -828,77 +2149,83 @@ if __name__ == '__main__':
             # print(f"ebook_polish (in-place) successful. Output: {result_inplace}")
             # if os.path.exists("temp_polish_inplace_copy.epub"): os.remove("temp_polish_inplace_copy.epub")
 
-    except Exception as e:
-        print(f"Error during ebook_polish test: {e}")
-    finally:
-        if os.path.exists("dummy_input.txt"): os.remove("dummy_input.txt")
-        if os.path.exists(temp_epub_for_polish): os.remove(temp_epub_for_polish)
-        if os.path.exists(polished_output): os.remove(polished_output) # Ensure cleanup
-
-    # Example: fetch_ebook_metadata (requires network access)
-    print("\nTest: fetch_ebook_metadata (for 'The Hobbit' by 'Tolkien')")
-    try:
-        # Test as JSON
-        metadata = fetch_ebook_metadata(title="The Hobbit", authors="J.R.R. Tolkien", as_json=True, timeout_seconds=20)
-        print(f"Fetched metadata (JSON): {metadata.get('title', 'N/A Title')} by {metadata.get('creator', 'N/A Author')}")
-
-        # Test as OPF file
-        opf_output_path = "fetched_hobbit.opf"
-        opf_path = fetch_ebook_metadata(title="The Hobbit", authors="J.R.R. Tolkien", output_opf_file=opf_output_path, timeout_seconds=20)
-        print(f"Fetched metadata saved to OPF: {opf_path}")
-        if os.path.exists(opf_path):
-            # with open(opf_path, "r") as f: print(f.read())
-            os.remove(opf_path)
+        except Exception as e:
+            log(f"Error during ebook_polish test: {e}")
 
-    except CalibreCLIError as e:
-        if "No metadata found" in str(e):
-            print(f"fetch_ebook_metadata: {e.args[0]}")
-        else:
-            print(f"fetch_ebook_metadata CalibreCLIError: {e}")
-    except FileNotFoundError:
-        print("fetch-ebook-metadata tool not found.")
-    except Exception as e: # Catch other potential errors like network issues if not wrapped by CalibreCLIError
-        print(f"fetch_ebook_metadata error (possibly network): {e}")
+    def _test_fetch_ebook_metadata(log):
+        # Example: fetch_ebook_metadata (requires network access)
+        log("\nTest: fetch_ebook_metadata (for 'The Hobbit' by 'Tolkien')")
+        try:
+            # Test as JSON
+            metadata = fetch_ebook_metadata(title="The Hobbit", authors="J.R.R. Tolkien", as_json=True, timeout_seconds=20)
+            log(f"Fetched metadata (JSON): {metadata.get('title', 'N/A Title')} by {metadata.get('creator', 'N/A Author')}")
 
+            # Test as OPF file
+            opf_output_path = os.path.join(scratch_dir, "fetched_hobbit.opf")
+            opf_path = fetch_ebook_metadata(title="The Hobbit", authors="J.R.R. Tolkien", output_opf_file=opf_output_path, timeout_seconds=20)
+            log(f"Fetched metadata saved to OPF: {opf_path}")
 
-    # Example: web2disk (requires network access and a valid URL)
-    print("\nTest: web2disk (generates a .recipe file for a URL)")
-    recipe_file = "example_site.recipe"
-    try:
-        # Using a simple, stable page for testing.
-        # Make sure this URL is accessible during tests.
-        # Example: use a known public domain text page if available.
-        # For this test, let's use a wikipedia page.
-        # Note: Complex JavaScript-heavy sites might not work well or be slow.
-        generated_recipe = web2disk("https://en.wikipedia.org/wiki/EPUB", recipe_file, options=["--max-articles-per-feed", "1"])
-        print(f"web2disk successful. Recipe at: {generated_recipe}")
-        if os.path.exists(generated_recipe):
-            print(f"Recipe file '{generated_recipe}' created. Size: {os.path.getsize(generated_recipe)} bytes.")
+        except CalibreCLIError as e:
+            if _NO_METADATA_RE.search(e.message): # Not str(e), which also formats stdout/stderr
+                log(f"fetch_ebook_metadata: {e.args[0]}")
+            else:
+                log(f"fetch_ebook_metadata CalibreCLIError: {e}")
+        except FileNotFoundError:
+            log("fetch-ebook-metadata tool not found.")
+        except Exception as e: # Catch other potential errors like network issues if not wrapped by CalibreCLIError
+            log(f"fetch_ebook_metadata error (possibly network): {e}")
+
+    def _test_web2disk(log):
+        # Example: web2disk (requires network access and a valid URL)
+        log("\nTest: web2disk (generates a .recipe file for a URL)")
+        recipe_file = os.path.join(scratch_dir, "example_site.recipe")
+        try:
+            # Using a simple, stable page for testing.
+            # Make sure this URL is accessible during tests.
+            # Example: use a known public domain text page if available.
+            # For this test, let's use a wikipedia page.
+            # Note: Complex JavaScript-heavy sites might not work well or be slow.
+            generated_recipe = web2disk("https://en.wikipedia.org/wiki/EPUB", recipe_file, options=["--max-articles-per-feed", "1"])
+            log(f"web2disk successful. Recipe at: {generated_recipe}")
+            # web2disk has already checked that the recipe exists and is not empty.
             # You could try to convert this recipe with ebook-convert as a further test:
             # ebook_convert(generated_recipe, "wiki_epub_from_recipe.epub")
-            os.remove(generated_recipe) # Clean up
-    except CalibreCLIError as e:
-        print(f"web2disk error: {e}")
-    except FileNotFoundError:
-        print("web2disk tool not found.")
-    except ValueError as e:
-        print(f"web2disk ValueError: {e}")
-    except Exception as e:
-        print(f"web2disk error (possibly network or URL content): {e}")
-    finally:
-        if os.path.exists(recipe_file): # Ensure cleanup
-            os.remove(recipe_file)
+        except CalibreCLIError as e:
+            log(f"web2disk error: {e}")
+        except FileNotFoundError:
+            log("web2disk tool not found.")
+        except ValueError as e:
+            log(f"web2disk ValueError: {e}")
+        except Exception as e:
+            log(f"web2disk error (possibly network or URL content): {e}")
+
+    # Everything the tests write is removed with the directory.
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        dummy_input = os.path.join(scratch_dir, "dummy_input.txt")
+        with open(dummy_input, "w") as f:
+            f.write("This is a test file for ebook-convert.")
+        _run_smoke_tests([
+            _test_get_calibre_version,
+            _test_convert_and_get_metadata,
+            _test_set_ebook_metadata,
+            _test_ebook_polish,
+            _test_fetch_ebook_metadata,
+            _test_web2disk,
+        ])
 
     print("\nWrapper function basic tests complete.")
 
 
-def lrf2lrs(input_lrf_file: str, output_lrs_file: str) -> str:
+def lrf2lrs(input_lrf_file: str, output_lrs_file: str, *, input_stat: Optional[os.stat_result] = None) -> str:
     """
     Converts an LRF e-book file to an LRS file using `lrf2lrs`.
 
     Args:
         input_lrf_file: Path to the input LRF file.
         output_lrs_file: Path for the converted output LRS file.
+        input_stat: Optional `os.stat_result` for the input file, e.g. from `os.DirEntry.stat()`
+                    while scanning a directory. Passing it says the file is known to exist,
+                    so the existence check is skipped.
 
     Returns:
         The path to the output_lrs_file if conversion is successful.
@@ -907,39 +2234,28 @@ def lrf2lrs(input_lrf_file: str, output_lrs_file: str) -> str:
         CalibreCLIError: If lrf2lrs fails.
         FileNotFoundError: If 'lrf2lrs' executable or input_lrf_file is not found.
     """
-    if not os.path.exists(input_lrf_file):
-        raise FileNotFoundError(f"Input LRF file not found: {input_lrf_file}")
-
-    command = ['lrf2lrs', input_lrf_file, output_lrs_file]
-    stdout, stderr, returncode = run_calibre_command(command, timeout=120)
-
-    if returncode != 0:
-        raise CalibreCLIError(
-            message=f"lrf2lrs failed for {input_lrf_file} to {output_lrs_file}.",
-            stdout=stdout,
-            stderr=stderr,
-            returncode=returncode
-        )
+    command = _build_lrf_command(_LRF2LRS_CMD, "LRF", input_lrf_file, output_lrs_file, input_stat)
+    stdout, stderr, returncode = run_calibre_command(command, timeout=120, binary=True)
+    return _handle_lrf_result('lrf2lrs', input_lrf_file, output_lrs_file, stdout, stderr, returncode)
 
-    if not os.path.exists(output_lrs_file):
-        raise CalibreCLIError(
-            message=f"lrf2lrs completed but output file {output_lrs_file} was not created.",
-            stdout=stdout,
-            stderr=stderr,
-            returncode=returncode
-        )
 
-    logger.info(f"lrf2lrs successful: {input_lrf_file} -> {output_lrs_file}")
-    return output_lrs_file
+async def lrf2lrs_async(input_lrf_file: str, output_lrs_file: str, *, input_stat: Optional[os.stat_result] = None) -> str:
+    """Async variant of `lrf2lrs`."""
+    command = _build_lrf_command(_LRF2LRS_CMD, "LRF", input_lrf_file, output_lrs_file, input_stat)
+    stdout, stderr, returncode = await run_calibre_command_async(command, timeout=120, binary=True)
+    return _handle_lrf_result('lrf2lrs', input_lrf_file, output_lrs_file, stdout, stderr, returncode)
 
 
-def lrs2lrf(input_lrs_file: str, output_lrf_file: str) -> str:
+def lrs2lrf(input_lrs_file: str, output_lrf_file: str, *, input_stat: Optional[os.stat_result] = None) -> str:
     """
     Converts an LRS e-book file to an LRF file using `lrs2lrf`.
 
     Args:
         input_lrs_file: Path to the input LRS file.
         output_lrf_file: Path for the converted output LRF file.
+        input_stat: Optional `os.stat_result` for the input file, e.g. from `os.DirEntry.stat()`
+                    while scanning a directory. Passing it says the file is known to exist,
+                    so the existence check is skipped.
 
     Returns:
         The path to the output_lrf_file if conversion is successful.
@@ -948,34 +2264,57 @@ def lrs2lrf(input_lrs_file: str, output_lrf_file: str) -> str:
         CalibreCLIError: If lrs2lrf fails.
         FileNotFoundError: If 'lrs2lrf' executable or input_lrs_file is not found.
     """
-    if not os.path.exists(input_lrs_file):
-        raise FileNotFoundError(f"Input LRS file not found: {input_lrs_file}")
+    command = _build_lrf_command(_LRS2LRF_CMD, "LRS", input_lrs_file, output_lrf_file, input_stat)
+    stdout, stderr, returncode = run_calibre_command(command, timeout=120, binary=True)
+    return _handle_lrf_result('lrs2lrf', input_lrs_file, output_lrf_file, stdout, stderr, returncode)
 
-    command = ['lrs2lrf', input_lrs_file, output_lrf_file]
-    stdout, stderr, returncode = run_calibre_command(command, timeout=120)
 
+async def lrs2lrf_async(input_lrs_file: str, output_lrf_file: str, *, input_stat: Optional[os.stat_result] = None) -> str:
+    """Async variant of `lrs2lrf`."""
+    command = _build_lrf_command(_LRS2LRF_CMD, "LRS", input_lrs_file, output_lrf_file, input_stat)
+    stdout, stderr, returncode = await run_calibre_command_async(command, timeout=120, binary=True)
+    return _handle_lrf_result('lrs2lrf', input_lrs_file, output_lrf_file, stdout, stderr, returncode)
+
+
+def _build_lrf_command(
+    prefix: Tuple[str, ...],
+    input_kind: str,
+    input_file: str,
+    output_file: str,
+    input_stat: Optional[os.stat_result] = None,
+) -> List[str]:
+    # Shared by lrf2lrs and lrs2lrf, which take the same `<input> <output>` arguments.
+    if input_stat is None and not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input {input_kind} file not found: {input_file}")
+    return [*prefix, input_file, output_file]
+
+
+def _handle_lrf_result(tool: str, input_file: str, output_file: str, stdout: bytes, stderr: bytes, returncode: int) -> str:
     if returncode != 0:
         raise CalibreCLIError(
-            message=f"lrs2lrf failed for {input_lrs_file} to {output_lrf_file}.",
+            message=f"{tool} failed for {input_file} to {output_file}.",
             stdout=stdout,
             stderr=stderr,
             returncode=returncode
         )
 
-    if not os.path.exists(output_lrf_file):
+    if not os.path.exists(output_file):
         raise CalibreCLIError(
-            message=f"lrs2lrf completed but output file {output_lrf_file} was not created.",
+            message=f"{tool} completed but output file {output_file} was not created.",
             stdout=stdout,
             stderr=stderr,
             returncode=returncode
         )
 
-    logger.info(f"lrs2lrf successful: {input_lrs_file} -> {output_lrf_file}")
-    return output_lrf_file
+    logger.info(f"{tool} successful: {input_file} -> {output_file}")
+    return output_file
 
 
 # --- calibre-customize wrappers ---
 
+# "Plugin Name (1.2.3) by Author", where the version and author parts are optional.
+_PLUGIN_HEADER_RE = re.compile(r'^(?P<name>[^(]+?)\s*(?:\((?P<version>[^)]*)\))?(?:\s+by\s+(?P<author>.+?))?\s*$')
+
 def list_calibre_plugins() -> Dict[str, Any]:
     """
     Lists installed Calibre plugins using `calibre-customize --list-plugins`.
@@ -990,17 +2329,9 @@ def list_calibre_plugins() -> Dict[str, Any]:
         FileNotFoundError: If 'calibre-customize' executable is not found.
     """
     command = ['calibre-customize', '--list-plugins']
-    stdout, stderr, returncode = run_calibre_command(command)
-
-    if returncode != 0:
-        raise CalibreCLIError(
-            message="Failed to list Calibre plugins.",
-            stdout=stdout,
-            stderr=stderr,
-            returncode=returncode
-        )
+    # Parsed as the lines arrive; the full listing is never held in memory.
+    lines = iter_calibre_command_lines(command, failure_message="Failed to list Calibre plugins.")
 
-    plugins = {}
     # Output is like:
     # Plugin Name 1 (version 1.2.3) by Author Name
     #   Description of plugin 1
@@ -1008,51 +2339,47 @@ def list_calibre_plugins() -> Dict[str, Any]:
     # Plugin Name 2 (version 0.1.0) by Another Author
     #   Description of plugin 2
     #
-    # This parsing is very basic and might need adjustment based on exact output format variations.
-    current_plugin_name = None
-    for line in stdout.splitlines():
-        line = line.strip()
-        if not line:
+    # Headers are the non-indented lines; indented lines describe the plugin above them.
+    # Each plugin's dict is built once, complete, when the next header (or the end of the
+    # output) shows that its description is over.
+    plugins: Dict[str, Dict[str, Any]] = {}
+    current: Optional[Tuple[str, Optional[str], Optional[str]]] = None # (name, version, author)
+    description_lines: List[str] = []
+
+    def finish_current() -> None:
+        name, version, author = current
+        plugins[name] = {
+            'name': name,
+            'version': version,
+            'author': author,
+            'description': "\n".join(description_lines) or None,
+        }
+
+    saw_output = False
+    for line in lines:
+        if not line.strip():
             continue
-
-        # Regex to capture "Plugin Name (version X.Y.Z) by Author"
-        # More robust parsing might be needed if format varies.
-        # Example: "Action Chains (1.0.0) by calibre"
-        # Example: "Adobe Adept Remove (0.1.0) by None" (Author can be None)
-        # Example: "Annotations (1.18.0) by David Forrester"
-        # Version and Author might be optional or have different formats.
-        # A simpler approach: if line doesn't start with whitespace, it's a new plugin header.
-
-        if not line.startswith(' '): # Assuming plugin headers are not indented
-            parts = line.split('(')
-            plugin_name_full = parts[0].strip()
-            current_plugin_name = plugin_name_full
-            plugins[current_plugin_name] = {'name': plugin_name_full, 'version': None, 'author': None, 'description_parts': []}
-
-            if len(parts) > 1:
-                version_author_part = parts[1].split(')')
-                if len(version_author_part) > 0:
-                    plugins[current_plugin_name]['version'] = version_author_part[0].strip()
-                if " by " in version_author_part[1]:
-                     plugins[current_plugin_name]['author'] = version_author_part[1].split(" by ")[1].strip()
-
-        elif current_plugin_name and line: # Indented line, part of current plugin's description
-            plugins[current_plugin_name]['description_parts'].append(line)
-
-    # Consolidate description parts
-    for name, details in plugins.items():
-        if 'description_parts' in details:
-            plugins[name]['description'] = "\n".join(details['description_parts']).strip()
-            del plugins[name]['description_parts']
-            if not plugins[name]['description']: # remove if empty after join
-                del plugins[name]['description']
-
-
-    if not plugins and stdout.strip(): # Parsing failed but there was output
-        logger.warning(f"Could not parse plugin list from calibre-customize output, but got output:\n{stdout}")
+        saw_output = True
+        if not line[0].isspace():
+            if current is not None:
+                finish_current()
+            match = _PLUGIN_HEADER_RE.match(line)
+            if match:
+                author = match['author']
+                current = (match['name'], match['version'], None if author == 'None' else author) # "by None": no author given
+            else:
+                current = (line.strip(), None, None)
+            description_lines = []
+        elif current is not None: # Indented line, part of the current plugin's description
+            description_lines.append(line.strip())
+    if current is not None:
+        finish_current()
+
+    if not plugins and saw_output: # Parsing failed but there was output
+        logger.warning("Could not parse plugin list from calibre-customize output, although it printed something.")
         # Optionally, return raw output or raise a more specific parsing error.
         # For now, returning empty dict if parsing yields nothing.
-    elif not plugins and not stdout.strip(): # No output, no plugins.
+    elif not plugins: # No output, no plugins.
         logger.info("No plugins listed by calibre-customize.")
 
 
@@ -1101,92 +2428,89 @@ def run_calibre_debug_test_build(timeout: int = 180) -> str:
 if __name__ == '__main__':
     # ... (keep existing run_calibre_command tests and other wrapper tests) ...
 
-    print("\n--- Testing LRF/LRS Conversion Functions ---")
+    print("\n--- Testing LRF/LRS Conversion and Calibre Customize/Debug Functions ---")
     # These tests require dummy LRF and LRS files, which are not standard text files.
     # Creating valid dummy LRF/LRS for automated testing is complex without specific tools.
     # So, these will likely fail if the tools are called without valid input files.
     # We'll mostly test if the command wrapper can be called.
+    # The tests are independent and run concurrently; --test-build is by far the slowest,
+    # so the others finish while it runs. Their dummy inputs and outputs live in one
+    # scratch directory (`scratch_dir`, set up before they run).
 
-    print("\nTest: lrf2lrs (dummy_input.lrf to dummy_output.lrs)")
-    # Create a dummy empty file, lrf2lrs will fail but tests our wrapper's error handling
-    if not os.path.exists("dummy_input.lrf"):
-        open("dummy_input.lrf", "w").close()
-    try:
-        output_path = lrf2lrs("dummy_input.lrf", "dummy_output.lrs")
-        print(f"lrf2lrs successful (unexpected for empty file). Output: {output_path}")
-        if os.path.exists("dummy_output.lrs"): os.remove("dummy_output.lrs")
-    except FileNotFoundError as e:
-        print(f"File not found (lrf2lrs or input): {e}")
-    except CalibreCLIError as e:
-        print(f"lrf2lrs error (expected for empty/invalid file): Code {e.returncode}, Stderr: {e.stderr[:100]}...")
-    finally:
-        if os.path.exists("dummy_input.lrf"): os.remove("dummy_input.lrf")
-        if os.path.exists("dummy_output.lrs"): os.remove("dummy_output.lrs")
-
-
-    print("\nTest: lrs2lrf (dummy_input.lrs to dummy_output.lrf)")
-    if not os.path.exists("dummy_input.lrs"):
-        open("dummy_input.lrs", "w").close()
-    try:
-        output_path = lrs2lrf("dummy_input.lrs", "dummy_output.lrf")
-        print(f"lrs2lrf successful (unexpected for empty file). Output: {output_path}")
-        if os.path.exists("dummy_output.lrf"): os.remove("dummy_output.lrf")
-    except FileNotFoundError as e:
-        print(f"File not found (lrs2lrf or input): {e}")
-    except CalibreCLIError as e:
-        print(f"lrs2lrf error (expected for empty/invalid file): Code {e.returncode}, Stderr: {e.stderr[:100]}...")
-    finally:
-        if os.path.exists("dummy_input.lrs"): os.remove("dummy_input.lrs")
-        if os.path.exists("dummy_output.lrf"): os.remove("dummy_output.lrf")
-
-    print("\n--- Testing Calibre Customize and Debug Functions ---")
+    def _test_lrf2lrs(log):
+        log("\nTest: lrf2lrs (dummy_input.lrf to dummy_output.lrs)")
+        # The dummy input is an empty file: lrf2lrs will fail but it tests our wrapper's error handling
+        try:
+            output_path = lrf2lrs(os.path.join(scratch_dir, "dummy_input.lrf"), os.path.join(scratch_dir, "dummy_output.lrs"))
+            log(f"lrf2lrs successful (unexpected for empty file). Output: {output_path}")
+        except FileNotFoundError as e:
+            log(f"File not found (lrf2lrs or input): {e}")
+        except CalibreCLIError as e:
+            log(f"lrf2lrs error (expected for empty/invalid file): Code {e.returncode}, Stderr: {e.stderr[:100]}...")
 
-    print("\nTest: list_calibre_plugins")
-    try:
-        plugins = list_calibre_plugins()
-        if plugins:
-            print(f"Found {len(plugins)} plugins. First few:")
-            for i, (name, details) in enumerate(plugins.items()):
-                if i < 3: # Print details for a few plugins
-                    print(f"  Plugin: {name}, Version: {details.get('version', 'N/A')}, Author: {details.get('author', 'N/A')}")
-                    # print(f"    Desc: {details.get('description', '')[:60]}...")
-                else:
-                    break
-        else:
-            print("No plugins found or parsing failed.")
-    except FileNotFoundError:
-        print("calibre-customize tool not found.")
-    except CalibreCLIError as e:
-        print(f"list_calibre_plugins error: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred while listing plugins: {e}")
+    def _test_lrs2lrf(log):
+        log("\nTest: lrs2lrf (dummy_input.lrs to dummy_output.lrf)")
+        try:
+            output_path = lrs2lrf(os.path.join(scratch_dir, "dummy_input.lrs"), os.path.join(scratch_dir, "dummy_output.lrf"))
+            log(f"lrs2lrf successful (unexpected for empty file). Output: {output_path}")
+        except FileNotFoundError as e:
+            log(f"File not found (lrs2lrf or input): {e}")
+        except CalibreCLIError as e:
+            log(f"lrs2lrf error (expected for empty/invalid file): Code {e.returncode}, Stderr: {e.stderr[:100]}...")
 
+    def _test_list_calibre_plugins(log):
+        log("\nTest: list_calibre_plugins")
+        try:
+            plugins = list_calibre_plugins()
+            if plugins:
+                log(f"Found {len(plugins)} plugins. First few:")
+                for i, (name, details) in enumerate(plugins.items()):
+                    if i < 3: # Print details for a few plugins
+                        log(f"  Plugin: {name}, Version: {details.get('version', 'N/A')}, Author: {details.get('author', 'N/A')}")
+                        # log(f"    Desc: {details.get('description', '')[:60]}...")
+                    else:
+                        break
+            else:
+                log("No plugins found or parsing failed.")
+        except FileNotFoundError:
+            log("calibre-customize tool not found.")
+        except CalibreCLIError as e:
+            log(f"list_calibre_plugins error: {e}")
+        except Exception as e:
+            log(f"An unexpected error occurred while listing plugins: {e}")
 
-    print("\nTest: run_calibre_debug_test_build")
-    # This test can take a long time.
-    # Add a flag to skip long tests if needed for quick runs.
-    SKIP_LONG_TESTS = os.getenv("SKIP_LONG_TESTS", "false").lower() == "true"
-    if SKIP_LONG_TESTS:
-        print("Skipping run_calibre_debug_test_build as SKIP_LONG_TESTS is true.")
-    else:
-        print("Running --test-build (this may take a few minutes)...")
+    def _test_run_calibre_debug_test_build(log):
+        log("\nTest: run_calibre_debug_test_build")
+        log("Running --test-build (this may take a few minutes)...")
         try:
             output = run_calibre_debug_test_build(timeout=240) # Increased timeout
-            print(f"calibre-debug --test-build output (last 200 chars):\n...{output[-200:]}")
+            log(f"calibre-debug --test-build output (last 200 chars):\n...{output[-200:]}")
             if "All tests passed" in output:
-                print("Test build reported success.")
+                log("Test build reported success.")
             else:
-                print("Test build did not explicitly report 'All tests passed'. Review output.")
+                log("Test build did not explicitly report 'All tests passed'. Review output.")
         except FileNotFoundError:
-            print("calibre-debug tool not found.")
+            log("calibre-debug tool not found.")
         except CalibreCLIError as e:
             if "timed out" in str(e):
-                 print(f"calibre-debug --test-build timed out: {e}")
+                 log(f"calibre-debug --test-build timed out: {e}")
             else:
-                 print(f"calibre-debug --test-build error: {e}")
+                 log(f"calibre-debug --test-build error: {e}")
         except Exception as e:
-            print(f"An unexpected error occurred during --test-build: {e}")
+            log(f"An unexpected error occurred during --test-build: {e}")
 
+    smoke_tests = [_test_lrf2lrs, _test_lrs2lrf, _test_list_calibre_plugins]
+    # --test-build can take a long time.
+    # Add a flag to skip long tests if needed for quick runs.
+    SKIP_LONG_TESTS = os.getenv("SKIP_LONG_TESTS", "false").lower() == "true"
+    if SKIP_LONG_TESTS:
+        print("Skipping run_calibre_debug_test_build as SKIP_LONG_TESTS is true.")
+    else:
+        smoke_tests.append(_test_run_calibre_debug_test_build)
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        for dummy_name in ("dummy_input.lrf", "dummy_input.lrs"):
+            open(os.path.join(scratch_dir, dummy_name), "w").close()
+        _run_smoke_tests(smoke_tests)
 
     print("\nAll wrapper function basic tests complete.")
 
@@ -1197,10 +2521,10 @@ def send_email_with_calibre_smtp(
     recipient_email: str,
     subject: str,
     body: str,
-    attachment_path: Optional[str] = None,
     # SMTP server configuration - these would ideally come from secure config
     smtp_server: str, # e.g., "smtp.example.com"
     smtp_port: int,   # e.g., 587
+    attachment_path: Optional[str] = None,
     smtp_username: Optional[str] = None,
     smtp_password: Optional[str] = None, # Sensitive!
     smtp_encryption: str = 'tls', # 'tls', 'ssl', or 'none'
@@ -1216,9 +2540,9 @@ def send_email_with_calibre_smtp(
         recipient_email: Email address of the recipient.
         subject: Subject of the email.
         body: Body content of the email.
-        attachment_path: Optional path to a file to attach.
         smtp_server: SMTP server hostname or IP.
         smtp_port: SMTP server port.
+        attachment_path: Optional path to a file to attach.
         smtp_username: Username for SMTP authentication.
         smtp_password: Password for SMTP authentication (highly sensitive).
         smtp_encryption: Encryption method ('tls', 'ssl', 'none').
@@ -1239,37 +2563,24 @@ def send_email_with_calibre_smtp(
                          as calibre-smtp itself reports the error.
     """
     command = [
-        'calibre-smtp',
-        '--attachment', attachment_path if attachment_path else "", # Must provide, even if empty
+        *_CALIBRE_SMTP_CMD,
+        # calibre-smtp expects --attachment to be omitted entirely or to carry a value.
+        *(('--attachment', attachment_path) if attachment_path else ()),
         '--encryption-method', smtp_encryption,
         '--port', str(smtp_port),
         '--relay', smtp_server,
         '--subject', subject,
-    ]
-
-    if smtp_username:
-        command.extend(['--username', smtp_username])
-    if smtp_password:
+        *(('--username', smtp_username) if smtp_username else ()),
         # WARNING: Passing passwords on the command line is a security risk.
         # calibre-smtp might have more secure ways (e.g. config files, stdin)
         # but the CLI docs show this option. Use with extreme caution.
         # Consider environment variables or other secure configurations if possible.
-        command.extend(['--password', smtp_password])
-
-    if sender_email:
-        command.extend(['--from-addr', sender_email]) # Calibre calls this --from-addr
-    if reply_to_email:
-        command.extend(['--reply-to', reply_to_email])
-
-    # The recipient and body are positional arguments at the end
-    command.extend([recipient_email, body])
-
-    # Remove empty attachment argument if not used, as calibre-smtp expects it to be omitted or have a value
-    if not attachment_path and '--attachment' in command:
-        att_index = command.index('--attachment')
-        command.pop(att_index + 1) # remove the empty string value
-        command.pop(att_index)     # remove the --attachment flag itself
-
+        *(('--password', smtp_password) if smtp_password else ()),
+        *(('--from-addr', sender_email) if sender_email else ()), # Calibre calls this --from-addr
+        *(('--reply-to', reply_to_email) if reply_to_email else ()),
+        # The recipient and body are positional arguments at the end
+        recipient_email, body,
+    ]
 
     stdout, stderr, returncode = run_calibre_command(command, timeout=timeout)
 
@@ -1299,15 +2610,22 @@ def send_email_with_calibre_smtp(
 def check_ebook_errors(
     ebook_file_path: str,
     output_format: str = "text", # "text" or "json"
-    timeout: int = 180
+    timeout: int = 180,
+    *,
+    input_stat: Optional[os.stat_result] = None,
 ) -> Union[str, Dict[str, Any]]:
     """
     Checks an e-book (EPUB or AZW3) for errors using `ebook-edit --check-book`.
+    Reports are cached in memory by the book's contents, so checking an unchanged book
+    again returns the earlier report without re-running the check.
 
     Args:
         ebook_file_path: Path to the e-book file (EPUB or AZW3).
         output_format: Desired output format for the error report ('text' or 'json').
         timeout: Command timeout in seconds.
+        input_stat: Optional `os.stat_result` for the input file, e.g. from `os.DirEntry.stat()`
+                    while scanning a directory. Passing it says the file is known to exist,
+                    so the existence check is skipped.
 
     Returns:
         If output_format is 'json', returns a dictionary parsed from the JSON output.
@@ -1320,32 +2638,119 @@ def check_ebook_errors(
         FileNotFoundError: If 'ebook-edit' executable or ebook_file_path is not found.
         ValueError: If an unsupported output_format is specified.
     """
-    if not os.path.exists(ebook_file_path):
+    command = _build_check_ebook_errors_command(ebook_file_path, output_format, input_stat)
+    cache_key = _check_book_cache_key(ebook_file_path, output_format)
+    cached = _check_book_cache.get(cache_key)
+    if cached is not None:
+        return _relocate_check_report(*cached, ebook_file_path)
+    # ebook-edit --check-book can be slow for large or complex books.
+    # A JSON report is parsed straight from the bytes the tool wrote, never decoded to str.
+    stdout, stderr, returncode = run_calibre_command(command, timeout=timeout, binary=output_format == "json")
+    report = _handle_check_ebook_errors_result(ebook_file_path, output_format, stdout, stderr, returncode)
+    _check_book_cache.put(cache_key, (ebook_file_path, report))
+    return report
+
+
+async def check_ebook_errors_async(
+    ebook_file_path: str,
+    output_format: str = "text",
+    timeout: int = 180,
+    *,
+    input_stat: Optional[os.stat_result] = None,
+) -> Union[str, Dict[str, Any]]:
+    """Async variant of `check_ebook_errors`."""
+    command = _build_check_ebook_errors_command(ebook_file_path, output_format, input_stat)
+    # Hashing reads the whole book; keep that off the event loop.
+    cache_key = await asyncio.get_running_loop().run_in_executor(
+        _EXEC, _check_book_cache_key, ebook_file_path, output_format
+    )
+    cached = _check_book_cache.get(cache_key)
+    if cached is not None:
+        return _relocate_check_report(*cached, ebook_file_path)
+    stdout, stderr, returncode = await run_calibre_command_async(
+        command, timeout=timeout, binary=output_format == "json"
+    )
+    report = _handle_check_ebook_errors_result(ebook_file_path, output_format, stdout, stderr, returncode)
+    _check_book_cache.put(cache_key, (ebook_file_path, report))
+    return report
+
+
+# Process-local LRU of `check_ebook_errors` reports keyed by (output format, digest of the
+# file's contents), each stored with the path it was made for. A check can take tens of
+# seconds on a large book and is typically re-run while fixing one, usually re-uploaded to
+# a new temporary path; keying on the contents means the same book hits wherever it lands.
+# The report names the book by its path, so a hit has that path rewritten to the new one.
+_CHECK_BOOK_CACHE_SIZE = 64
+_check_book_cache = _LRUCache(_CHECK_BOOK_CACHE_SIZE)
+
+
+def _check_book_cache_key(ebook_file_path: str, output_format: str) -> Optional[Tuple[str, str]]:
+    content_digest = _file_digest(ebook_file_path)
+    if content_digest is None:
+        return None
+    return output_format, content_digest
+
+
+def _relocate_check_report(cached_path: str, report: Any, ebook_file_path: str) -> Any:
+    """Rewrites a cached report made for `cached_path` to name `ebook_file_path` instead."""
+    if cached_path == ebook_file_path:
+        return report
+    # ebook-edit may print either the path it was given or its absolute form.
+    replacements = {
+        os.path.abspath(cached_path): os.path.abspath(ebook_file_path),
+        cached_path: ebook_file_path,
+    }
+    pattern = re.compile('|'.join(map(re.escape, sorted(replacements, key=len, reverse=True))))
+
+    def relocate(value: Any) -> Any:
+        if isinstance(value, str):
+            return pattern.sub(lambda m: replacements[m.group(0)], value)
+        if isinstance(value, dict):
+            return {relocate(k): relocate(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [relocate(v) for v in value]
+        return value
+
+    return relocate(report)
+
+
+def _build_check_ebook_errors_command(
+    ebook_file_path: str,
+    output_format: str,
+    input_stat: Optional[os.stat_result] = None,
+) -> List[str]:
+    if input_stat is None and not os.path.exists(ebook_file_path):
         raise FileNotFoundError(f"E-book file not found: {ebook_file_path}")
     if output_format not in ["text", "json"]:
         raise ValueError("output_format must be 'text' or 'json'.")
 
-    command = ['ebook-edit', '--check-book']
-    if output_format == "json":
-        command.append('--output-format=json')
-
-    command.append(ebook_file_path)
+    return [
+        *_EBOOK_EDIT_CHECK_CMD,
+        *(('--output-format=json',) if output_format == "json" else ()),
+        ebook_file_path,
+    ]
 
-    # ebook-edit --check-book can be slow for large or complex books.
-    stdout, stderr, returncode = run_calibre_command(command, timeout=timeout)
 
+def _handle_check_ebook_errors_result(
+    ebook_file_path: str,
+    output_format: str,
+    stdout: Union[str, bytes],
+    stderr: Union[str, bytes],
+    returncode: int,
+) -> Union[str, Dict[str, Any]]:
+    # In JSON mode the output arrives as raw bytes; text is only needed for error reports.
     if returncode != 0:
         # ebook-edit --check-book returns 0 even if errors are found.
         # A non-zero return code usually indicates a more fundamental issue with the command or file.
         raise CalibreCLIError(
             message=f"ebook-edit --check-book command failed for {ebook_file_path}.",
-            stdout=stdout,
-            stderr=stderr,
+            stdout=_decode_output(stdout),
+            stderr=_decode_output(stderr),
             returncode=returncode
         )
 
     if output_format == "json":
-        if not stdout.strip():
+        if not stdout or stdout.isspace(): # isspace() scans in place; strip() would copy
             # If JSON output is empty, it might mean no errors or an issue.
             # The tool usually outputs at least `{"path_to_ebook": []}` for no errors.
             logger.warning(f"ebook-edit --check-book with JSON output returned empty stdout for {ebook_file_path}.")
@@ -1356,13 +2761,13 @@ def check_ebook_errors(
             # Example (no errors): {"/path/to/book.epub": []}
             # Example (with errors): {"/path/to/book.epub": [{"level": "error", "msg": "...", ...}]}
             # The key is the book path, value is a list of error objects.
-            json_output = json.loads(stdout)
+            json_output = _json_loads(stdout) # orjson (if installed) and json both accept bytes
             return json_output
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             raise CalibreCLIError(
                 message=f"Failed to parse JSON output from ebook-edit --check-book for {ebook_file_path}: {e}",
-                stdout=stdout,
-                stderr=stderr, # stderr might contain clues if the tool itself errored before JSON output
+                stdout=_decode_output(stdout),
+                stderr=_decode_output(stderr), # stderr might contain clues if the tool itself errored before JSON output
                 returncode=returncode
             )
     else: # text output
@@ -1371,10 +2776,6 @@ def check_ebook_errors(
         return stdout
 
 
-# --- Imports needed for json.loads ---
-import json
-
-
 if __name__ == '__main__':
     # ... (keep existing tests) ...
 
@@ -1415,18 +2816,18 @@ if __name__ == '__main__':
     # ebook-edit --check-book test
     # Requires a valid EPUB or AZW3 file. We can try to use one created by ebook-convert.
     print("\nTest: check_ebook_errors (on a dummy EPUB)")
-    check_book_epub_path = "check_me.epub"
-    # Create a simple text file first
-    if not os.path.exists("dummy_for_check.txt"):
-        with open("dummy_for_check.txt", "w") as f:
+    with tempfile.TemporaryDirectory() as scratch_dir: # Holds every file this test creates
+        check_book_epub_path = os.path.join(scratch_dir, "check_me.epub")
+        dummy_for_check = os.path.join(scratch_dir, "dummy_for_check.txt")
+        # Create a simple text file first
+        with open(dummy_for_check, "w") as f:
             f.write("This is content for an EPUB to be checked.")
 
-    try:
-        # Convert text to EPUB for the test
-        ebook_convert("dummy_for_check.txt", check_book_epub_path, options=["--title", "Book For Checking"])
-        print(f"Created '{check_book_epub_path}' for check_ebook_errors test.")
+        try:
+            # Convert text to EPUB for the test
+            ebook_convert(dummy_for_check, check_book_epub_path, options=["--title", "Book For Checking"])
+            print(f"Created '{check_book_epub_path}' for check_ebook_errors test.")
 
-        if os.path.exists(check_book_epub_path):
             # Test with JSON output
             print(f"Checking '{check_book_epub_path}' with JSON output...")
             json_report = check_ebook_errors(check_book_epub_path, output_format="json", timeout=120)
@@ -1447,18 +2848,13 @@ if __name__ == '__main__':
             if "No errors or warnings found" in text_report:
                 print("  No errors found in text report.")
 
-    except FileNotFoundError as e:
-        print(f"File not found (ebook-edit, ebook-convert, or input file): {e}")
-    except CalibreCLIError as e:
-        print(f"CalibreCLIError during check_ebook_errors test: {e}")
-    except ValueError as e:
-        print(f"ValueError during check_ebook_errors test: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred during check_ebook_errors test: {e}")
-    finally:
-        if os.path.exists("dummy_for_check.txt"):
-            os.remove("dummy_for_check.txt")
-        if os.path.exists(check_book_epub_path):
-            os.remove(check_book_epub_path)
+        except FileNotFoundError as e:
+            print(f"File not found (ebook-edit, ebook-convert, or input file): {e}")
+        except CalibreCLIError as e:
+            print(f"CalibreCLIError during check_ebook_errors test: {e}")
+        except ValueError as e:
+            print(f"ValueError during check_ebook_errors test: {e}")
+        except Exception as e:
+            print(f"An unexpected error occurred during check_ebook_errors test: {e}")
 
     print("\nAll wrapper function basic tests complete (including new ones).")
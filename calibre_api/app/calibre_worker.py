@@ -0,0 +1,205 @@
+"""
+Long-lived Calibre worker used by `calibre_cli.CalibreWorkerPool`.
+
+It runs under Calibre's own interpreter via `calibre-debug -e calibre_worker.py`,
+so the calibre package is imported once per worker instead of once per command.
+The API itself only imports it for `_metadata_mtime`, which stamps `crud`'s cached
+listings; nothing here imports calibre at module level.
+
+Protocol (one JSON object per line):
+    request:  {"argv": ["ebook-meta", "/path/book.epub", "--title", "X"]}
+    response: {"stdout": "...", "stderr": "...", "returncode": 0}
+
+argv[0] names the CLI tool to emulate. It is dispatched to that tool's Calibre
+entry point, with stdout/stderr captured and SystemExit mapped to a return code,
+so callers see the same (stdout, stderr, returncode) as from the real executable.
+
+calibredb requests also reuse library databases the worker has already opened
+(see `OpenLibraries`), instead of reading metadata.db from scratch every time.
+"""
+import collections
+import importlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+
+# CLI tool name -> (module, function) of the Calibre entry point it wraps.
+# Keep in sync with `calibre_cli.CalibreWorkerPool.TOOLS`.
+ENTRY_POINTS = {
+    'calibredb': ('calibre.db.cli.main', 'main'),
+    'ebook-convert': ('calibre.ebooks.conversion.cli', 'main'),
+    'ebook-meta': ('calibre.ebooks.metadata.cli', 'main'),
+    'ebook-polish': ('calibre.ebooks.oeb.polish.main', 'main'),
+    'fetch-ebook-metadata': ('calibre.ebooks.metadata.sources.cli', 'main'),
+}
+
+
+class OpenLibraries:
+    """
+    Calibre library databases kept open between calibredb requests, keyed by path.
+
+    Opening a library reads all of metadata.db into memory, which dominates quick
+    calibredb commands. An open database does not see writes made by other processes
+    (the GUI, another worker), so the metadata.db mtime is recorded after each request
+    and a library whose file has changed since is reopened. Libraries idle for
+    `idle_timeout` seconds are closed, as are the least recently used ones beyond
+    `maxsize`.
+    """
+
+    def __init__(self, maxsize=4, idle_timeout=300.0, opener=None):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._opener = opener
+        # library path -> [db, metadata.db mtime when last synced, last used]
+        self._entries = collections.OrderedDict()
+
+    def get(self, library_path):
+        now = time.monotonic()
+        self._close_idle(now)
+        key = os.path.abspath(library_path)
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[1] != _metadata_mtime(key):
+            _close(entry[0])
+            entry = None
+        if entry is None:
+            entry = [self._open(key), _metadata_mtime(key), now]
+        entry[2] = now
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            _close(self._entries.popitem(last=False)[1][0])
+        return entry[0]
+
+    def sync(self):
+        """Records the current metadata.db mtimes; call after each request."""
+        for key, entry in self._entries.items():
+            entry[1] = _metadata_mtime(key)
+
+    def _open(self, library_path):
+        if self._opener is not None:
+            return self._opener(library_path)
+        from calibre.db.legacy import LibraryDatabase
+        return LibraryDatabase(library_path).new_api
+
+    def _close_idle(self, now):
+        for key in [k for k, e in self._entries.items() if now - e[2] >= self.idle_timeout]:
+            _close(self._entries.pop(key)[0])
+
+
+def _metadata_mtime(library_path):
+    try:
+        return os.stat(os.path.join(library_path, 'metadata.db')).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _close(db):
+    try:
+        db.close()
+    except Exception:
+        traceback.print_exc()
+
+
+open_libraries = OpenLibraries()
+_library_cache_installed = False
+
+
+def _install_library_cache():
+    """Makes calibredb's DBCtx take local libraries from `open_libraries`."""
+    global _library_cache_installed
+    _library_cache_installed = True
+    from calibre.db.cli.main import DBCtx
+    original = getattr(DBCtx, 'db', None)
+    if not isinstance(original, property):
+        return # Unknown Calibre version: leave calibredb opening libraries itself
+
+    def db(self):
+        library_path = getattr(self, 'library_path', None)
+        if getattr(self, 'is_remote', False) or not library_path:
+            return original.fget(self)
+        return open_libraries.get(library_path)
+
+    DBCtx.db = property(db)
+    DBCtx.shelfstone_library_cache = True # Checked by crud's set_metadata batch script
+
+
+def _exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    sys.stderr.write(f"{exc.code}\n")
+    return 1
+
+
+def _run(argv):
+    tool = argv[0]
+    if tool == 'calibre-debug':
+        # Only the `calibre-debug -c <code>` form is served by the worker.
+        if len(argv) != 3 or argv[1] != '-c':
+            raise ValueError(f"Unsupported calibre-debug invocation: {argv[1:]}")
+        exec(compile(argv[2], '<calibre-debug -c>', 'exec'), {'__name__': '__main__'})
+        return 0
+    if tool not in ENTRY_POINTS:
+        raise ValueError(f"Unsupported tool: {tool}")
+    module_name, function_name = ENTRY_POINTS[tool]
+    entry_point = getattr(importlib.import_module(module_name), function_name)
+    if tool == 'calibredb' and not _library_cache_installed:
+        _install_library_cache()
+    # Called without arguments: some entry points default to `args=sys.argv` (bound when
+    # their module was imported), others read `sys.argv[1:]`. handle() updates sys.argv
+    # in place, so both see this request's argv.
+    try:
+        result = entry_point()
+    finally:
+        if tool == 'calibredb':
+            open_libraries.sync()
+    return result if isinstance(result, int) else 0
+
+
+def handle(request):
+    """Runs one request and returns the response dict. Never raises."""
+    argv = request['argv']
+    stdout_buffer, stderr_buffer = io.BytesIO(), io.BytesIO()
+    saved = sys.stdin, sys.stdout, sys.stderr, list(sys.argv)
+    sys.stdin = open(os.devnull)
+    sys.stdout = io.TextIOWrapper(stdout_buffer, encoding='utf-8', errors='replace', write_through=True)
+    sys.stderr = io.TextIOWrapper(stderr_buffer, encoding='utf-8', errors='replace', write_through=True)
+    sys.argv[:] = argv
+    try:
+        try:
+            returncode = _run(argv)
+        except SystemExit as e:
+            returncode = _exit_code(e)
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        return {
+            'stdout': stdout_buffer.getvalue().decode('utf-8', errors='replace'),
+            'stderr': stderr_buffer.getvalue().decode('utf-8', errors='replace'),
+            'returncode': returncode,
+        }
+    finally:
+        sys.stdin.close()
+        sys.stdin, sys.stdout, sys.stderr, sys.argv[:] = saved
+
+
+def serve():
+    # The protocol owns the original stdout. Anything else that writes to fd 1
+    # (C extensions, child processes) is pointed at stderr so it cannot corrupt a reply.
+    protocol_out = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    os.dup2(2, 1)
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        response = handle(json.loads(line))
+        protocol_out.write(json.dumps(response) + '\n')
+        protocol_out.flush()
+
+
+if __name__ == '__main__':
+    serve()
@@ -1,9 +1,27 @@
+import asyncio
+import contextlib
+import copy
 import json
 import os
-from typing import List, Dict, Optional, Any
-
+import re
+import sqlite3
+import subprocess
+import threading
+import unicodedata
+import weakref
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Optional, Any, Callable, Iterator, Tuple, Union
+
+from . import calibre_worker
 # Use the centralized CalibreCLIError and run_calibre_command
-from .calibre_cli import CalibreCLIError, run_calibre_command
+from .calibre_cli import (
+    CalibreCLIError, _EXEC, _LRUCache, _json_loads, _resolve_executable, iter_calibre_command_chunks,
+    run_calibre_command, run_calibre_command_async,
+)
+
+if TYPE_CHECKING:
+    from .models import SetMetadataRequest
 # We can make CalibredbError a specialized version of CalibreCLIError or just use CalibreCLIError directly.
 # For now, let's define it as a subclass to maintain specificity if desired,
 # but it could also be an alias or replaced by CalibreCLIError.
@@ -17,36 +35,712 @@ class CalibredbError(CalibreCLIError):
         super().__init__(message, stdout=stdout, stderr=stderr, returncode=returncode)
 
 
-def list_books(library_path: Optional[str] = None, search_query: Optional[str] = None) -> List[Dict[str, Any]]:
+# pysimdjson is optional; on the multi-megabyte output of `calibredb list --fields all`
+# it parses several times faster than the standard library.
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# ijson is optional; without it `iter_books` parses the whole listing at once.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# calibredb never runs inside the API process itself, even where Calibre is importable:
+# it prints its results to sys.stdout, which is shared by every thread here, and a
+# command running on a thread could be neither timed out nor killed. Commands skip a new
+# interpreter per call through the worker pool instead (`calibre_cli.enable_worker_pool`),
+# whose Calibre workers run calibredb in-process and keep each library open between calls.
+
+# At most this many async calibredb commands run against one library at a time. Further
+# requests wait their turn instead of piling concurrent opens onto metadata.db.
+_MAX_CONCURRENT_COMMANDS_PER_LIBRARY = 4
+
+# event loop -> library path -> semaphore. Semaphores belong to the loop they are used
+# on, so each loop (e.g. one per `asyncio.run` call) gets its own set.
+_library_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Optional[str], asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+# Listings at least this large (in bytes) are parsed on a worker thread by the async
+# functions, so a big library does not stall the event loop; smaller ones are parsed
+# inline, where the thread hop would cost more than the parse.
+_ASYNC_PARSE_INLINE_LIMIT = 256 * 1024
+
+
+def _library_semaphore(library_path: Optional[str]) -> asyncio.Semaphore:
+    semaphores = _library_semaphores.setdefault(asyncio.get_running_loop(), {})
+    key = os.path.abspath(library_path) if library_path else None
+    semaphore = semaphores.get(key)
+    if semaphore is None:
+        semaphore = semaphores[key] = asyncio.Semaphore(_MAX_CONCURRENT_COMMANDS_PER_LIBRARY)
+    return semaphore
+
+
+async def _run_calibredb_async(
+    cmd: List[str], timeout: int, library_path: Optional[str], binary: bool = False
+) -> Tuple[Any, Any, int]:
+    """`run_calibre_command_async` for calibredb commands.
+
+    Commands for the same library share a `_library_semaphore`.
+    """
+    async with _library_semaphore(library_path):
+        return await run_calibre_command_async(cmd, timeout=timeout, binary=binary)
+
+
+# Process-local cache of `list_books` results keyed by
+# (library_path, search_query, fields, limit). Each value is (stamp, books), the stamp
+# being the library's metadata.db mtime before it was listed: an entry whose stamp no
+# longer matches is a miss, so changes made outside the API (e.g. in the Calibre GUI)
+# show up on the next call. Writes made through this module update it in place where
+# they can (see `_evict_removed_books`, `_patch_cached_books`) and drop the listings
+# they cannot account for, including any listing that was not current just before the
+# write. The TTL covers the default library, which has no path to stat.
+_BOOK_LIST_CACHE_SIZE = 128
+_BOOK_LIST_CACHE_TTL = 30.0
+_book_list_cache = _LRUCache(_BOOK_LIST_CACHE_SIZE, ttl=_BOOK_LIST_CACHE_TTL)
+
+
+# Fields `list_books` returns when the caller does not choose: enough for a book list
+# view. `--fields all` makes calibredb print every column, comments included, which is
+# often several times the output to transfer and parse.
+DEFAULT_BOOK_FIELDS = ("title", "authors", "tags", "series", "series_index", "pubdate", "rating")
+
+# Fields `calibredb list --fields` accepts, besides "all" and custom columns ("*name").
+# The book id is always included and is not one of them. Unknown names are rejected
+# before calibredb is started, as a ValueError rather than a calibredb failure.
+LISTABLE_BOOK_FIELDS = frozenset({
+    "author_sort", "authors", "comments", "cover", "formats", "identifiers", "isbn", "languages",
+    "last_modified", "pubdate", "publisher", "rating", "series", "series_index", "size", "tags",
+    "timestamp", "title", "uuid",
+})
+
+
+def _book_list_cache_key(
+    library_path: Optional[str], search_query: Optional[str], fields: Optional[List[str]], limit: Optional[int]
+) -> Tuple[str, str, Optional[Tuple[str, ...]], Optional[int]]:
+    return (library_path or "", search_query or "", tuple(fields) if fields else None, limit)
+
+
+# `list_books_async` fetches in progress, per event loop, keyed by (cache key, stamp):
+# requests arriving together for a listing that is not cached yet wait for the one
+# calibredb run (or metadata.db query) instead of each starting their own.
+_inflight_listings: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, asyncio.Future]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _library_stamp(library_path: Optional[str]) -> Optional[int]:
+    return calibre_worker._metadata_mtime(library_path) if library_path else None
+
+
+def _get_cached_books(cache_key: Tuple, stamp: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+    cached = _book_list_cache.get(cache_key)
+    if cached is None or cached[0] != stamp:
+        return None
+    return cached[1]
+
+
+# Listing fields a set_metadata write can be copied into as-is: the values the
+# SetMetadataRequest carries are what `calibredb list --for-machine` shows.
+_PATCHABLE_LISTING_FIELDS = {"title", "authors", "tags", "series", "series_index", "publisher", "comments"}
+# Listing fields that change along with a set_metadata field. Every write also bumps
+# last_modified.
+_DERIVED_LISTING_FIELDS = {"authors": ("author_sort",), "isbn": ("identifiers",)}
+
+
+def _restamp(entry: Tuple[Optional[int], Any], before: Optional[int], after: Optional[int]) -> bool:
+    """Whether a cached listing was current when our write started (or already shows it).
+
+    `before` is the library stamp taken just before the write, `after` the one taken after
+    it. A listing with any other stamp missed some change made by someone else in
+    between, and patching it and stamping it `after` would pass that off as current.
+    """
+    return entry[0] == before or entry[0] == after
+
+
+def _evict_removed_books(library_path: Optional[str], book_ids: List[int], before: Optional[int]) -> None:
+    """Takes removed books out of the cached listings of their library.
+
+    `before` is the library stamp taken before the removal.
+    """
+    removed = set(book_ids)
+    library_key = library_path or ""
+    stamp = _library_stamp(library_path) # Our own write moved it
+
+    def update(key, entry):
+        if key[0] != library_key:
+            return entry
+        if not _restamp(entry, before, stamp):
+            return None
+        books = entry[1]
+        kept = [book for book in books if book.get("id") not in removed]
+        if len(kept) != len(books) and key[3] is not None:
+            return None # A limited listing would now pull in a book we don't have
+        return stamp, kept
+
+    _book_list_cache.update_values(update)
+
+
+def _patch_cached_books(
+    library_path: Optional[str], book_id: int, metadata: 'SetMetadataRequest', before: Optional[int]
+) -> None:
+    """Copies a successful set_metadata write into the cached listings of its library.
+
+    `before` is the library stamp taken before the write. Search results are dropped,
+    since the book may now match a search differently, as are listings showing a field
+    whose new value can't be derived from the request.
+    """
+    changes = {
+        field: list(value) if isinstance(value, list) else value
+        for field, value in _metadata_values(metadata)
+    }
+    affected = {"last_modified", *changes}
+    for field in changes:
+        affected.update(_DERIVED_LISTING_FIELDS.get(field, ()))
+    library_key = library_path or ""
+    stamp = _library_stamp(library_path) # Our own write moved it
+
+    def update(key, entry):
+        if key[0] != library_key:
+            return entry
+        shown = key[2] or DEFAULT_BOOK_FIELDS
+        if not _restamp(entry, before, stamp):
+            return None
+        if key[1] or "all" in shown or not affected.isdisjoint(set(shown) - _PATCHABLE_LISTING_FIELDS):
+            return None
+        books = entry[1]
+        for book in books:
+            if book.get("id") == book_id:
+                book.update((field, value) for field, value in changes.items() if field in shown)
+        return stamp, books
+
+    _book_list_cache.update_values(update)
+
+
+def _parse_books_json(data: bytes) -> List[Dict[str, Any]]:
+    if simdjson is not None:
+        # A fresh parser per call: a simdjson.Parser only holds one live document.
+        return simdjson.Parser().parse(data).as_list()
+    return _json_loads(data)
+
+
+# --- Read-only listing straight from metadata.db ---
+#
+# A listing of a library at a known path is a plain read of its SQLite database, so it
+# is served by querying metadata.db directly, in the same shape as
+# `calibredb list --for-machine` (books by descending id; ISO 8601 dates). Searches
+# made only of `location:value` terms on title, authors, tags, series or publisher
+# are translated to SQL too (see `_sqlite_search_filter`). Other searches, the default
+# library, and fields that need Calibre itself (formats, cover, size, custom columns)
+# still go through calibredb, as does any SQLite error.
+
+# Columns of the books table, by field name.
+_SQLITE_BOOK_COLUMNS = {"title", "author_sort", "series_index", "uuid"}
+_SQLITE_DATE_COLUMNS = {"pubdate", "timestamp", "last_modified"}
+# Many-valued fields: (link table, link column, value table, value column, order by).
+_SQLITE_MULTI_FIELDS = {
+    "authors": ("books_authors_link", "author", "authors", "name", "l.id"),
+    "tags": ("books_tags_link", "tag", "tags", "name", "l.id"),
+    "languages": ("books_languages_link", "lang_code", "languages", "lang_code", "l.item_order"),
+}
+# Single-valued fields: (link table, link column, value table, value column).
+_SQLITE_SINGLE_FIELDS = {
+    "series": ("books_series_link", "series", "series", "name"),
+    "publisher": ("books_publishers_link", "publisher", "publishers", "name"),
+    "rating": ("books_ratings_link", "rating", "ratings", "rating"),
+}
+_SQLITE_LIST_FIELDS = (
+    _SQLITE_BOOK_COLUMNS | _SQLITE_DATE_COLUMNS | set(_SQLITE_MULTI_FIELDS) | set(_SQLITE_SINGLE_FIELDS)
+    | {"comments", "identifiers", "isbn"}
+)
+
+# Search locations answered without calibredb, keyed by listing field: (link table,
+# link column, value table, value column) in metadata.db, or None for the title.
+_SQLITE_SEARCH_LOCATIONS = {
+    "title": None,
+    "authors": ("books_authors_link", "author", "authors", "name"),
+    "tags": ("books_tags_link", "tag", "tags", "name"),
+    "series": ("books_series_link", "series", "series", "name"),
+    "publisher": ("books_publishers_link", "publisher", "publishers", "name"),
+}
+# Other names Calibre accepts for those locations.
+_SEARCH_LOCATION_ALIASES = {"author": "authors", "tag": "tags"}
+# One `location:value` or `location:=value` term; the value may be double-quoted.
+_SQLITE_SEARCH_TERM_RE = re.compile(r'\s*(\w+):(=?)(?:"([^"\\]+)"|([^\s"()]+))\s*')
+# Values that mean something special to Calibre's search language (regular expressions,
+# tag hierarchies, relational or empty/non-empty tests), which only calibredb can apply.
+_SQLITE_SEARCH_SPECIAL_RE = re.compile(r"^[~^.#=<>!]|^(?:true|false|yes|no|empty)$", re.IGNORECASE)
+
+# sqlite3 connections may only be used by the thread that opened them.
+_ro_connections = threading.local()
+
+
+def _search_fold(text: str) -> str:
+    """Case- and accent-insensitive form of `text`, as Calibre compares searches."""
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)).casefold()
+
+
+def _sqlite_search_match(value: Optional[str], folded_query: str, exact: int) -> bool:
+    if value is None:
+        return False
+    folded = _search_fold(value)
+    return folded == folded_query if exact else folded_query in folded
+
+
+def _parse_simple_search(search_query: str) -> Optional[List[Tuple[str, str, int]]]:
+    """Splits a search into (listing field, folded value, exact) terms, or returns None.
+
+    Only searches made of `location:value` terms on `_SQLITE_SEARCH_LOCATIONS`, all of
+    which must match, are understood. A term matches when the field contains the value
+    (or equals it, for `location:=value`), ignoring case and accents.
+    """
+    terms = []
+    pos = 0
+    while pos < len(search_query):
+        match = _SQLITE_SEARCH_TERM_RE.match(search_query, pos)
+        if match is None:
+            return None
+        location, exact, quoted, bare = match.groups()
+        value = quoted if quoted is not None else bare
+        location = location.lower()
+        location = _SEARCH_LOCATION_ALIASES.get(location, location)
+        if location not in _SQLITE_SEARCH_LOCATIONS or _SQLITE_SEARCH_SPECIAL_RE.search(value):
+            return None
+        terms.append((location, _search_fold(value), 1 if exact else 0))
+        pos = match.end()
+    return terms or None
+
+
+def _sqlite_search_filter(search_query: str) -> Optional[Tuple[str, List[Any]]]:
+    """Translates a search into a WHERE clause on `books b`, or returns None if it can't."""
+    terms = _parse_simple_search(search_query)
+    if terms is None:
+        return None
+    conditions: List[str] = []
+    params: List[Any] = []
+    for location, folded, exact in terms:
+        link = _SQLITE_SEARCH_LOCATIONS[location]
+        if link is None:
+            conditions.append("shelfstone_match(b.title, ?, ?)")
+        else:
+            link_table, link_col, table, value_col = link
+            conditions.append(
+                f"EXISTS (SELECT 1 FROM {link_table} sl JOIN {table} sv ON sv.id = sl.{link_col} "
+                f"WHERE sl.book = b.id AND shelfstone_match(sv.{value_col}, ?, ?))"
+            )
+        params += [folded, exact]
+    return " WHERE " + " AND ".join(conditions), params
+
+
+def _book_matches(book: Dict[str, Any], terms: List[Tuple[str, str, int]]) -> bool:
+    """Evaluates `_parse_simple_search` terms against a listed book, as the SQL does."""
+    for location, folded, exact in terms:
+        value = book.get(location)
+        values = value if isinstance(value, list) else [value]
+        if not any(_sqlite_search_match(v, folded, exact) for v in values):
+            return False
+    return True
+
+
+def _get_ro_conn(library_path: str) -> sqlite3.Connection:
+    connections = getattr(_ro_connections, "by_path", None)
+    if connections is None:
+        connections = _ro_connections.by_path = {}
+    conn = connections.get(library_path)
+    if conn is None:
+        uri = Path(library_path, "metadata.db").resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True)
+        conn.execute("PRAGMA query_only=1")
+        conn.create_function("shelfstone_match", 3, _sqlite_search_match, deterministic=True)
+        connections[library_path] = conn
+    return conn
+
+
+@contextlib.contextmanager
+def _read_snapshot(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Runs the block's queries in one read transaction, so they all see the same data."""
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def _sqlite_date(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        return value
+
+
+def _list_books_from_sqlite(
+    library_path: Optional[str],
+    search_query: Optional[str],
+    fields: Optional[List[str]],
+    limit: Optional[int],
+) -> Optional[List[Dict[str, Any]]]:
+    """Returns the listing read from metadata.db, or None if calibredb must produce it."""
+    wanted = list(fields or DEFAULT_BOOK_FIELDS)
+    if not library_path or "all" in wanted or not set(wanted) <= _SQLITE_LIST_FIELDS:
+        return None
+    search_filter = _sqlite_search_filter(search_query) if search_query else ("", [])
+    if search_filter is None:
+        return None
+    if limit is not None and limit <= 0:
+        raise ValueError("limit must be a positive integer.")
+    if not os.path.isfile(os.path.join(library_path, "metadata.db")):
+        return None # Let calibredb report the problem
+
+    where, params = search_filter
+    # Every query below embeds this once, so each takes `params`.
+    book_ids_sql = f"SELECT b.id FROM books b{where} ORDER BY b.id DESC" + (f" LIMIT {int(limit)}" if limit else "")
+    try:
+        # One read transaction for every query below. Each of them re-runs the id subquery,
+        # and outside a transaction each statement reads its own snapshot: a book calibredb
+        # added in between would turn up in a later query but not in `books`.
+        with _read_snapshot(_get_ro_conn(library_path)) as conn:
+            columns = [f for f in wanted if f in _SQLITE_BOOK_COLUMNS or f in _SQLITE_DATE_COLUMNS]
+            select = ", ".join(["id", *columns])
+            books = {}
+            for row in conn.execute(f"SELECT {select} FROM books WHERE id IN ({book_ids_sql}) ORDER BY id DESC", params):
+                book = {"id": row[0]}
+                for column, value in zip(columns, row[1:]):
+                    book[column] = _sqlite_date(value) if column in _SQLITE_DATE_COLUMNS else value
+                books[row[0]] = book
+
+            for field in wanted:
+                if field in _SQLITE_MULTI_FIELDS:
+                    link, link_col, table, value_col, order = _SQLITE_MULTI_FIELDS[field]
+                    for book in books.values():
+                        book[field] = []
+                    for book_id, value in conn.execute(
+                        f"SELECT l.book, v.{value_col} FROM {link} l JOIN {table} v ON v.id = l.{link_col} "
+                        f"WHERE l.book IN ({book_ids_sql}) ORDER BY {order}", params
+                    ):
+                        books[book_id][field].append(value)
+                elif field in _SQLITE_SINGLE_FIELDS:
+                    link, link_col, table, value_col = _SQLITE_SINGLE_FIELDS[field]
+                    for book_id, value in conn.execute(
+                        f"SELECT l.book, v.{value_col} FROM {link} l JOIN {table} v ON v.id = l.{link_col} "
+                        f"WHERE l.book IN ({book_ids_sql})", params
+                    ):
+                        if value is not None:
+                            books[book_id][field] = value
+                elif field == "comments":
+                    for book_id, text in conn.execute(
+                        f"SELECT book, text FROM comments WHERE book IN ({book_ids_sql})", params
+                    ):
+                        if text is not None:
+                            books[book_id][field] = text
+                elif field in ("identifiers", "isbn"):
+                    identifiers = {book_id: {} for book_id in books}
+                    for book_id, kind, value in conn.execute(
+                        f"SELECT book, type, val FROM identifiers WHERE book IN ({book_ids_sql})", params
+                    ):
+                        identifiers[book_id][kind] = value
+                    for book_id, book in books.items():
+                        book[field] = identifiers[book_id] if field == "identifiers" else identifiers[book_id].get("isbn", "")
+    except sqlite3.Error as e:
+        # Locked, or a schema this code does not know; calibredb can still do it.
+        print(f"Warning: Could not read {library_path} directly, falling back to calibredb: {e}")
+        return None
+    return list(books.values())
+
+
+def _require_book_id(book_id: Any) -> None:
+    if not isinstance(book_id, int) or book_id <= 0:
+        raise ValueError("Book ID must be a positive integer.")
+
+
+# Command prefixes shared by every call of an operation. Each builder makes its argv in
+# a single list display from one of these, as the calibre_cli wrappers do.
+_CALIBREDB_LIST_CMD = ("calibredb", "list", "--for-machine")
+_CALIBREDB_ADD_CMD = ("calibredb", "add")
+_CALIBREDB_REMOVE_CMD = ("calibredb", "remove_books", "--permanent", "--for-machine")
+_CALIBREDB_SET_METADATA_CMD = ("calibredb", "set_metadata", "--for-machine")
+_CALIBREDB_EXPORT_CMD = ("calibredb", "export", "--to-stdout")
+
+
+# Each operation below comes as a sync function and an `*_async` variant sharing one
+# `_build_*_command` / `_handle_*_result` pair, like the wrappers in calibre_cli.
+# The async variants go through `run_calibre_command_async`, so when the worker pool
+# is enabled the `calibredb` call is served by an already-running Calibre interpreter
+# instead of a new process.
+
+def list_books(
+    library_path: Optional[str] = None,
+    search_query: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     """
     Lists books from a Calibre library using the calibredb command-line tool.
 
+    A listing of a library given by path is read from its metadata.db directly,
+    without running calibredb, unless the search needs Calibre's query language.
+
     Args:
         library_path: Optional path to the Calibre library.
         search_query: Optional search query to filter books.
+        fields: Optional list of Calibre field names to return (the book id is always
+                included), or ["all"]. Defaults to `DEFAULT_BOOK_FIELDS`. Passed down to
+                calibredb, so unrequested fields are never produced or parsed.
+        limit: Optional maximum number of books to return.
 
     Returns:
         A list of dictionaries, where each dictionary represents a book.
+        Results are cached in memory until the library's metadata.db changes (for the
+        default library, for up to 30 seconds).
 
     Raises:
         FileNotFoundError: If calibredb command is not found.
         CalibredbError: If calibredb command returns an error or fails to parse output.
     """
-    cmd = ["calibredb", "list", "--for-machine"]
+    cmd = _build_list_books_command(library_path, search_query, fields, limit)
+    cache_key = _book_list_cache_key(library_path, search_query, fields, limit)
+    stamp = _library_stamp(library_path)
+    cached = _get_cached_books(cache_key, stamp)
+    if cached is not None:
+        return cached
+    books = _list_books_from_sqlite(library_path, search_query, fields, limit)
+    if books is None:
+        # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
+        # The output is parsed straight from bytes, skipping a decoded copy of it.
+        stdout, stderr, returncode = run_calibre_command(cmd, timeout=60, binary=True)
+        books = _handle_list_books_result(stdout, stderr, returncode)
+    _book_list_cache.put(cache_key, (stamp, books))
+    return books
+
+
+async def list_books_async(
+    library_path: Optional[str] = None,
+    search_query: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Async variant of `list_books`.
 
-    if library_path:
-        cmd.extend(["--with-library", library_path])
+    Concurrent calls that miss the cache for the same listing share one fetch.
+    """
+    cmd = _build_list_books_command(library_path, search_query, fields, limit)
+    cache_key = _book_list_cache_key(library_path, search_query, fields, limit)
+    stamp = _library_stamp(library_path)
+    cached = _get_cached_books(cache_key, stamp)
+    if cached is not None:
+        return cached
+    inflight = _inflight_listings.setdefault(asyncio.get_running_loop(), {})
+    flight_key = (cache_key, stamp)
+    fetch = inflight.get(flight_key)
+    if fetch is not None:
+        # Each caller gets its own copy, as from the cache.
+        return copy.deepcopy(await asyncio.shield(fetch))
+    fetch = inflight[flight_key] = asyncio.ensure_future(
+        _fetch_books_async(cmd, cache_key, stamp, library_path, search_query, fields, limit)
+    )
+    fetch.add_done_callback(lambda _: inflight.pop(flight_key, None))
+    # Shielded: cancelling this caller must not fail the others waiting on the fetch.
+    return await asyncio.shield(fetch)
+
+
+async def _fetch_books_async(
+    cmd: List[str],
+    cache_key: Tuple,
+    stamp: Optional[int],
+    library_path: Optional[str],
+    search_query: Optional[str],
+    fields: Optional[List[str]],
+    limit: Optional[int],
+) -> List[Dict[str, Any]]:
+    books = await asyncio.get_running_loop().run_in_executor(
+        _EXEC, _list_books_from_sqlite, library_path, search_query, fields, limit
+    )
+    if books is None:
+        stdout, stderr, returncode = await _run_calibredb_async(
+            cmd, timeout=60, library_path=library_path, binary=True
+        )
+        if len(stdout) < _ASYNC_PARSE_INLINE_LIMIT:
+            books = _handle_list_books_result(stdout, stderr, returncode)
+        else:
+            books = await asyncio.get_running_loop().run_in_executor(
+                _EXEC, _handle_list_books_result, stdout, stderr, returncode
+            )
+    _book_list_cache.put(cache_key, (stamp, books))
+    return books
 
-    # Add all fields to get comprehensive data.
-    # Users of this function can then select which fields they care about.
-    cmd.extend(["--fields", "all"])
 
-    if search_query:
-        cmd.extend(["--search", search_query])
+def list_books_multi(
+    queries: List[str],
+    library_path: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Runs several searches against one library, sharing a single listing between them.
 
-    # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
-    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60)
+    Searches made of `location:value` terms on title, authors, tags, series or
+    publisher are answered by filtering one full listing in memory. That listing is
+    itself cached by `list_books`, so paging through filtered views reuses it. Any
+    other search is passed to `list_books` on its own. An empty query matches every book.
+
+    Args:
+        queries: Search queries, in Calibre's search syntax.
+        library_path, fields: As for `list_books`.
+
+    Returns:
+        A dictionary mapping each query to the books `list_books` would return for it.
+
+    Raises:
+        FileNotFoundError: If calibredb command is not found.
+        CalibredbError: If calibredb command returns an error or fails to parse output.
+    """
+    simple, others = _split_multi_queries(queries)
+    results = {query: list_books(library_path, query, fields) for query in others}
+    if simple:
+        scan_fields = _multi_scan_fields(fields, simple)
+        books = list_books(library_path, None, scan_fields)
+        results.update(_filter_listing(books, simple, fields, scan_fields))
+    return {query: results[query] for query in queries}
 
+
+async def list_books_multi_async(
+    queries: List[str],
+    library_path: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Async variant of `list_books_multi`."""
+    simple, others = _split_multi_queries(queries)
+    listings = await asyncio.gather(*(list_books_async(library_path, query, fields) for query in others))
+    results = dict(zip(others, listings))
+    if simple:
+        scan_fields = _multi_scan_fields(fields, simple)
+        books = await list_books_async(library_path, None, scan_fields)
+        results.update(_filter_listing(books, simple, fields, scan_fields))
+    return {query: results[query] for query in queries}
+
+
+def _split_multi_queries(queries: List[str]) -> Tuple[Dict[str, List[Tuple[str, str, int]]], List[str]]:
+    """Returns the parsed searches that can be filtered in memory, and the other queries."""
+    simple: Dict[str, List[Tuple[str, str, int]]] = {}
+    others: List[str] = []
+    for query in dict.fromkeys(queries):
+        terms = _parse_simple_search(query) if query else []
+        if terms is None:
+            others.append(query)
+        else:
+            simple[query] = terms
+    return simple, others
+
+
+def _multi_scan_fields(
+    fields: Optional[List[str]], simple: Dict[str, List[Tuple[str, str, int]]]
+) -> Optional[List[str]]:
+    """The requested fields plus those the in-memory filters read."""
+    wanted = list(fields or DEFAULT_BOOK_FIELDS)
+    if "all" in wanted:
+        return fields
+    needed = [location for terms in simple.values() for location, _, _ in terms]
+    extra = [f for f in dict.fromkeys(needed) if f not in wanted]
+    # Unchanged fields keep the listing under the same cache key as a plain list_books.
+    return wanted + extra if extra else fields
+
+
+def _filter_listing(
+    books: List[Dict[str, Any]],
+    simple: Dict[str, List[Tuple[str, str, int]]],
+    fields: Optional[List[str]],
+    scan_fields: Optional[List[str]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    extra = set(scan_fields or ()) - set(fields or DEFAULT_BOOK_FIELDS)
+    return {
+        query: [
+            {k: v for k, v in book.items() if k not in extra}
+            for book in books if _book_matches(book, terms)
+        ]
+        for query, terms in simple.items()
+    }
+
+
+def iter_books(
+    library_path: Optional[str] = None,
+    search_query: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of `list_books`: yields each book as soon as calibredb has printed it.
+
+    With ijson installed the listing is parsed incrementally from the calibredb pipe,
+    so a large library is never held in memory as one string plus one list. Without
+    it, this falls back to parsing the complete output, like `list_books`.
+
+    Args:
+        library_path, search_query, fields, limit: As for `list_books`.
+
+    Yields:
+        One dictionary per book.
+
+    Raises:
+        FileNotFoundError: If calibredb command is not found.
+        CalibredbError: If calibredb command returns an error or fails to parse output.
+            Raised when the books are consumed, not when the generator is created.
+    """
+    cmd = _build_list_books_command(library_path, search_query, fields, limit)
+    if ijson is None:
+        stdout, stderr, returncode = run_calibre_command(cmd, timeout=60, binary=True)
+        yield from _handle_list_books_result(stdout, stderr, returncode)
+        return
+
+    failure_message = "calibredb list command failed."
+    books = ijson.sendable_list()
+    parser = ijson.items_coro(books, "item", use_float=True)
+    try:
+        for chunk in iter_calibre_command_chunks(cmd, timeout=60, failure_message=failure_message):
+            parser.send(chunk)
+            yield from _normalize_list_fields(books)
+            del books[:]
+        parser.close()
+        yield from _normalize_list_fields(books)
+    except CalibreCLIError as e:
+        # A non-zero exit is a calibredb error, as in list_books; a timeout (-1) or a
+        # failure to start (-2) is passed through unchanged, as run_calibre_command does.
+        if e.returncode in (-1, -2):
+            raise
+        raise CalibredbError(e.message, stdout=e.stdout, stderr=e.stderr, returncode=e.returncode) from e
+    except ValueError as e: # ijson.JSONError is a ValueError
+        raise CalibredbError(f"Failed to parse JSON output from calibredb list: {e}") from e
+
+
+def _build_list_books_command(
+    library_path: Optional[str],
+    search_query: Optional[str],
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> List[str]:
+    if limit is not None and limit <= 0:
+        raise ValueError("limit must be a positive integer.")
+    unknown = [f for f in fields or () if f != "all" and not f.startswith("*") and f not in LISTABLE_BOOK_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown book field(s): {', '.join(unknown)}. "
+            f"Available: {', '.join(sorted(LISTABLE_BOOK_FIELDS))}, all, or a custom column as *name."
+        )
+
+    return [
+        *_CALIBREDB_LIST_CMD,
+        *(("--with-library", library_path) if library_path else ()),
+        # Long fields such as comments and identifiers are only produced when asked for.
+        "--fields", ",".join(fields or DEFAULT_BOOK_FIELDS),
+        *(("--search", search_query) if search_query else ()),
+        *(("--limit", str(limit)) if limit is not None else ()),
+    ]
+
+
+def _handle_list_books_result(stdout: bytes, stderr: bytes, returncode: int) -> List[Dict[str, Any]]:
     if returncode != 0:
         error_message = f"calibredb list command failed with exit code {returncode}."
         raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
@@ -56,12 +750,32 @@ def list_books(library_path: Optional[str] = None, search_query: Optional[str] =
         return []
 
     try:
-        books_data = json.loads(stdout)
-        return books_data
-    except json.JSONDecodeError as e:
+        books_data = _parse_books_json(stdout)
+    except ValueError as e: # json/orjson and simdjson parse errors are all ValueErrors
         error_message = f"Failed to parse JSON output from calibredb list: {e}"
         # Include stdout in the error for debugging, as it contains the problematic text
         raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
+    return _normalize_list_fields(books_data)
+
+
+# Book fields that are lists, but that calibredb may print as one comma-separated string.
+_LIST_BOOK_FIELDS = ("authors", "tags", "formats", "languages")
+
+
+def _normalize_list_fields(books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turns comma-separated string values of `_LIST_BOOK_FIELDS` into lists, in place.
+
+    Done once, as listings are parsed (and before they are cached), so callers always
+    get lists.
+    """
+    for book in books:
+        for field in _LIST_BOOK_FIELDS:
+            value = book.get(field)
+            if type(value) is str:
+                parts = value.split(",") if value else []
+                # Only pay for the strip pass when there is a space to strip.
+                book[field] = [p.strip() for p in parts] if " " in value else parts
+    return books
 
 
 def add_book(
@@ -98,41 +812,83 @@ def add_book(
         CalibredbError: If calibredb command returns an error.
         ValueError: If the file_path does not exist.
     """
-    # import os # Moved to top-level
-    if not os.path.exists(file_path):
-        raise ValueError(f"Book file not found at: {file_path}")
-
-    cmd = ["calibredb", "add"]
-
-    if library_path:
-        cmd.extend(["--with-library", library_path])
-    if one_book_per_directory:
-        cmd.append("--one-book-per-directory")
-    if duplicates:
-        cmd.append("--duplicates")
-    if automerge:
-        cmd.append("--automerge")
-
-    # Metadata options
-    metadata_options = []
-    if title:
-        metadata_options.append(f"title:{title}")
-    if authors:
-        metadata_options.append(f"authors:{authors}")
-    if tags:
-        metadata_options.append(f"tags:{tags}")
-    # Add other simple metadata fields here if needed
-
-    if metadata_options:
-        cmd.extend(["--metadata", ",".join(metadata_options)])
-
-
-    # The file path should be the last argument typically, or after --
-    cmd.extend(["--", file_path])
-
+    cmd, timeout = _build_add_book_command(
+        file_path, library_path, one_book_per_directory, duplicates, automerge, authors, title, tags
+    )
     # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
-    stdout, stderr, returncode = run_calibre_command(cmd, timeout=120)
+    stdout, stderr, returncode = run_calibre_command(cmd, timeout=timeout, binary=True)
+    return _handle_add_book_result(stdout, stderr, returncode)
+
 
+async def add_book_async(
+    file_path: str,
+    library_path: Optional[str] = None,
+    one_book_per_directory: bool = False,
+    duplicates: bool = False,
+    automerge: bool = False,
+    authors: Optional[str] = None,
+    title: Optional[str] = None,
+    tags: Optional[str] = None,
+) -> List[int]:
+    """Async variant of `add_book`."""
+    cmd, timeout = _build_add_book_command(
+        file_path, library_path, one_book_per_directory, duplicates, automerge, authors, title, tags
+    )
+    stdout, stderr, returncode = await _run_calibredb_async(
+        cmd, timeout=timeout, library_path=library_path, binary=True
+    )
+    return _handle_add_book_result(stdout, stderr, returncode)
+
+
+# calibredb add copies the file into the library and reads its metadata, so large
+# books (scanned PDFs, comics) get an extra second per 2 MiB on top of the base timeout.
+_ADD_BOOK_TIMEOUT = 120
+_ADD_BOOK_BYTES_PER_EXTRA_SECOND = 2 * 1024 * 1024
+
+
+def _build_add_book_command(
+    file_path: str,
+    library_path: Optional[str],
+    one_book_per_directory: bool,
+    duplicates: bool,
+    automerge: bool,
+    authors: Optional[str],
+    title: Optional[str],
+    tags: Optional[str],
+) -> Tuple[List[str], int]:
+    """Returns the calibredb add command and its timeout, which grows with the file size."""
+    try:
+        size = os.stat(file_path).st_size
+    except FileNotFoundError:
+        raise ValueError(f"Book file not found at: {file_path}") from None
+
+    cmd = [
+        *_CALIBREDB_ADD_CMD,
+        *(("--with-library", library_path) if library_path else ()),
+        *(("--one-book-per-directory",) if one_book_per_directory else ()),
+        *(("--duplicates",) if duplicates else ()),
+        *(("--automerge",) if automerge else ()),
+        # Per-field options, so commas inside authors or tags are passed through intact.
+        *(("--title", title) if title else ()),
+        *(("--authors", authors) if authors else ()),
+        *(("--tags", tags) if tags else ()),
+        # The file path should be the last argument typically, or after --
+        "--", file_path,
+    ]
+    return cmd, _ADD_BOOK_TIMEOUT + size // _ADD_BOOK_BYTES_PER_EXTRA_SECOND
+
+
+# "Added book IDs: 1, 2, 3" (or "Added book ID: 1"), possibly after other output.
+# Matched against calibredb's raw stdout. Calibre prints "Added book ids: 1, 2"; match
+# the spelling case-insensitively.
+_ADDED_IDS_RE = re.compile(rb"Added book ids?:\s*([\d,\s]+)", re.IGNORECASE)
+_DIGITS_RE = re.compile(rb"\d+")
+
+
+def _handle_add_book_result(stdout: bytes, stderr: bytes, returncode: int) -> List[int]:
+    # A new book may belong in any cached listing, search results included, and even a
+    # failed command may have added some.
+    _book_list_cache.clear()
     if returncode != 0:
         error_message = f"calibredb add command failed with exit code {returncode}."
         raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
@@ -140,16 +896,16 @@ def add_book(
     # calibredb add typically outputs "Added book IDs: X, Y, Z" or similar.
     # Or just "Added book IDs: X" for a single book.
     # If verbose, it might print more. We need to parse the IDs.
-    output_str = stdout.strip() # Use stdout from run_calibre_command
+    output = stdout.strip() # Raw bytes; only decoded for the warning below
     added_ids: List[int] = []
 
-    if "Added book IDs:" in output_str:
-        ids_str_part = output_str.split("Added book IDs:")[1].strip()
-        added_ids = [int(id_val.strip()) for id_val in ids_str_part.split(',') if id_val.strip().isdigit()]
-    elif output_str.isdigit(): # If it just prints an ID
-        added_ids.append(int(output_str))
+    match = _ADDED_IDS_RE.search(output)
+    if match:
+        added_ids = [int(id_val) for id_val in _DIGITS_RE.findall(match.group(1))]
+    elif output.isdigit(): # If it just prints an ID
+        added_ids.append(int(output))
     else:
-        if "No books added" in output_str:
+        if b"No books added" in output:
             return [] # No books added, return empty list
 
         # Log if output is unexpected and no IDs parsed
@@ -159,7 +915,7 @@ def add_book(
         # it's an empty result for added IDs unless an error code was already raised.
         if returncode == 0: # Command succeeded but output not recognized for ID parsing
             # Consider logging this as a warning if a logger is available/configured
-            print(f"Warning: Could not parse book IDs from calibredb add output: {output_str}")
+            print(f"Warning: Could not parse book IDs from calibredb add output: {output.decode('utf-8', 'replace')}")
             # Return empty list as we couldn't confirm any IDs were added from the output.
             # This maintains the function signature but signals no specific IDs found.
             return []
@@ -190,17 +946,87 @@ def remove_book(book_id: int, library_path: Optional[str] = None) -> Dict[str, A
         CalibredbError: If calibredb command returns an error or fails to parse output.
         ValueError: If book_id is not a positive integer.
     """
-    if not isinstance(book_id, int) or book_id <= 0:
-        raise ValueError("Book ID must be a positive integer.")
+    cmd = _build_remove_books_command([book_id], library_path)
+    before = _library_stamp(library_path)
+    # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
+    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60, binary=True)
+    return _handle_remove_book_result(library_path, before, stdout, stderr, returncode)
 
-    cmd = ["calibredb", "remove_books", "--permanent", "--for-machine", str(book_id)]
 
-    if library_path:
-        cmd.extend(["--with-library", library_path])
+async def remove_book_async(book_id: int, library_path: Optional[str] = None) -> Dict[str, Any]:
+    """Async variant of `remove_book`."""
+    cmd = _build_remove_books_command([book_id], library_path)
+    before = _library_stamp(library_path)
+    stdout, stderr, returncode = await _run_calibredb_async(
+        cmd, timeout=60, library_path=library_path, binary=True
+    )
+    return _handle_remove_book_result(library_path, before, stdout, stderr, returncode)
+
+
+def remove_books_bulk(book_ids: List[int], library_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Removes several books with a single `calibredb remove_books` invocation.
+
+    Args:
+        book_ids: The IDs of the books to remove.
+        library_path: Optional path to the Calibre library.
+
+    Returns:
+        The aggregate result for all IDs, in the same shape as `remove_book`'s
+        (e.g. {"ok": true, "num_removed": 2, "removed_ids": [3, 5]}).
+
+    Raises:
+        FileNotFoundError: If calibredb command is not found.
+        CalibredbError: If calibredb command returns an error or fails to parse output.
+        ValueError: If `book_ids` is empty or any ID is not a positive integer.
+    """
+    cmd = _build_remove_books_command(book_ids, library_path)
+    before = _library_stamp(library_path)
+    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60, binary=True)
+    return _handle_remove_book_result(library_path, before, stdout, stderr, returncode)
+
+
+async def remove_books_bulk_async(book_ids: List[int], library_path: Optional[str] = None) -> Dict[str, Any]:
+    """Async variant of `remove_books_bulk`."""
+    cmd = _build_remove_books_command(book_ids, library_path)
+    before = _library_stamp(library_path)
+    stdout, stderr, returncode = await _run_calibredb_async(
+        cmd, timeout=60, library_path=library_path, binary=True
+    )
+    return _handle_remove_book_result(library_path, before, stdout, stderr, returncode)
+
+
+def _build_remove_books_command(book_ids: List[int], library_path: Optional[str]) -> List[str]:
+    if not book_ids:
+        raise ValueError("At least one book ID is required.")
+    for book_id in book_ids:
+        _require_book_id(book_id)
+
+    return [
+        *_CALIBREDB_REMOVE_CMD,
+        ",".join(map(str, book_ids)), # calibredb accepts a comma-separated list of IDs.
+        *(("--with-library", library_path) if library_path else ()),
+    ]
+
+
+def _handle_remove_book_result(
+    library_path: Optional[str], before: Optional[int], stdout: bytes, stderr: bytes, returncode: int
+) -> Dict[str, Any]:
+    try:
+        result_data = _parse_remove_books_reply(stdout, stderr, returncode)
+    except CalibredbError:
+        _book_list_cache.clear() # No telling what, if anything, was removed
+        raise
+    removed_ids = result_data.get("removed_ids") if isinstance(result_data, dict) else None
+    if isinstance(removed_ids, list):
+        # What calibredb actually removed: requested IDs that don't exist are not in it.
+        _evict_removed_books(library_path, removed_ids, before)
+    else:
+        _book_list_cache.clear() # No telling what was removed
+    return result_data
 
-    # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
-    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60)
 
+def _parse_remove_books_reply(stdout: bytes, stderr: bytes, returncode: int) -> Dict[str, Any]:
     # calibredb remove_books --for-machine should always return 0 if it runs,
     # even if the book is not found. The success/failure is in the JSON output.
     # However, if it fails for other reasons (e.g. library lock), returncode might be non-zero.
@@ -217,10 +1043,12 @@ def remove_book(book_id: int, library_path: Optional[str] = None) -> Dict[str, A
         )
 
     try:
-        result_data = json.loads(stdout)
+        result_data = _json_loads(stdout)
         return result_data
     except json.JSONDecodeError as e:
-        error_message = f"Failed to parse JSON output from calibredb remove_books: {e}. Output: {stdout}"
+        # The output is only decoded here, on the failure path.
+        output = stdout.decode("utf-8", "replace") if isinstance(stdout, bytes) else stdout
+        error_message = f"Failed to parse JSON output from calibredb remove_books: {e}. Output: {output}"
         raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
 
 
@@ -243,77 +1071,111 @@ def set_book_metadata(book_id: int, metadata: 'SetMetadataRequest', library_path
         CalibredbError: If calibredb command returns an error or fails to parse output.
         ValueError: If book_id is not positive or no metadata fields are provided.
     """
-    if not isinstance(book_id, int) or book_id <= 0:
-        raise ValueError("Book ID must be a positive integer.")
+    cmd = _build_set_book_metadata_command(book_id, metadata, library_path)
+    before = _library_stamp(library_path)
+    # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
+    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60, binary=True)
+    return _handle_set_book_metadata_result(book_id, metadata, library_path, before, stdout, stderr, returncode)
 
-    # from .models import SetMetadataRequest # Avoid circular import if type hint is string
-    # This function is type hinted with 'SetMetadataRequest', so it's fine.
 
-    args_to_set = []
-    metadata_dict = metadata.model_dump(exclude_unset=True) # Pydantic v2
+async def set_book_metadata_async(
+    book_id: int, metadata: 'SetMetadataRequest', library_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Async variant of `set_book_metadata`."""
+    cmd = _build_set_book_metadata_command(book_id, metadata, library_path)
+    before = _library_stamp(library_path)
+    stdout, stderr, returncode = await _run_calibredb_async(
+        cmd, timeout=60, library_path=library_path, binary=True
+    )
+    return _handle_set_book_metadata_result(book_id, metadata, library_path, before, stdout, stderr, returncode)
 
-    if not metadata_dict:
-        raise ValueError("No metadata fields provided to set.")
 
-    for field, value in metadata_dict.items():
-        if value is None: # Should be excluded by exclude_unset=True, but double check
-            continue
-
-        formatted_value = ""
-        if field == "authors" or field == "tags":
-            if isinstance(value, list):
-                formatted_value = ",".join(value)
-            else: # Should not happen if Pydantic model is used correctly
-                formatted_value = str(value)
-        elif field == "rating":
-            # Calibre ratings are 0-10 (0-5 stars, half points).
-            # Ensure the value is appropriate if specific validation is needed beyond Pydantic.
-            # For now, pass it as is.
-            formatted_value = str(float(value)) # Ensure it's a float representation
-        elif field == "pubdate":
-             # calibredb expects YYYY-MM-DD or a full ISO timestamp.
-             # Pydantic model has str, so pass as is. Consider date validation/formatting if stricter.
-            formatted_value = str(value)
-        elif field == "series_index":
-            formatted_value = str(float(value))
-        else:
-            formatted_value = str(value)
+def _metadata_values(metadata: 'SetMetadataRequest') -> Iterator[Tuple[str, Any]]:
+    """Yields (field, value) for each field the request sets to something other than None.
 
-        # Escape characters that might interfere with CLI argument parsing if necessary.
-        # For simple string:value, direct passing is usually fine.
-        # Complex values with spaces or special chars might need quoting by subprocess.run or manual shell escaping.
-        # However, calibredb usually handles "field:value with spaces" correctly if passed as a single arg.
-        # For now, we assume direct string concatenation is okay for calibredb's parser.
-        args_to_set.append(f"{field}:{formatted_value}")
+    Reads the set fields straight off the model rather than through
+    model_dump(exclude_unset=True), which would build a dict only to iterate it.
+    Fields come in declaration order.
+    """
+    fields_set = metadata.__pydantic_fields_set__
+    for field in type(metadata).model_fields:
+        if field in fields_set:
+            value = getattr(metadata, field)
+            if value is not None: # Explicitly set to None: nothing to send
+                yield field, value
+
+
+def _format_list_value(value: Any, separator: str = ",") -> str:
+    if isinstance(value, list):
+        return separator.join(value)
+    return str(value) # Should not happen if Pydantic model is used correctly
+
+
+# How each SetMetadataRequest field is rendered in calibredb's `--field field:value` form.
+# Fields not listed here (title, publisher, pubdate, ...) are passed through str().
+# pubdate: calibredb expects YYYY-MM-DD or a full ISO timestamp; the model has str.
+_METADATA_FIELD_FORMATTERS: Dict[str, Callable[[Any], str]] = {
+    # calibredb splits authors on "&" and tags on ",", as the Calibre GUI does, so
+    # "Doe, Jane" stays one author.
+    "authors": lambda value: _format_list_value(value, " & "),
+    "tags": _format_list_value,
+    # Calibre ratings are 0-10 (0-5 stars, half points); sent as a float representation.
+    "rating": lambda value: str(float(value)),
+    "series_index": lambda value: str(float(value)),
+}
+
+
+def _build_set_book_metadata_command(
+    book_id: int, metadata: 'SetMetadataRequest', library_path: Optional[str]
+) -> List[str]:
+    _require_book_id(book_id)
+
+    if not metadata.__pydantic_fields_set__: # Pydantic v2
+        raise ValueError("No metadata fields provided to set.")
 
+    # Each "field:value" goes in its own --field argument, spaces and all, so no quoting
+    # is needed. (A bare positional after the book ID would be read as an OPF file.)
+    args_to_set = [
+        arg
+        for field, value in _metadata_values(metadata)
+        for arg in ("--field", f"{field}:{_METADATA_FIELD_FORMATTERS.get(field, str)(value)}")
+    ]
 
     if not args_to_set:
         # This case should ideally be caught by "No metadata fields provided" earlier.
-        # If metadata_dict was populated but all values led to empty formatted_values (unlikely).
+        # Every field that was set was set to None.
         raise ValueError("No valid metadata arguments could be constructed.")
 
-    cmd = ["calibredb", "set_metadata", "--for-machine", str(book_id)] + args_to_set
-
-    if library_path:
-        cmd.extend(["--with-library", library_path])
+    return [
+        *_CALIBREDB_SET_METADATA_CMD,
+        str(book_id),
+        *args_to_set,
+        *(("--with-library", library_path) if library_path else ()),
+    ]
 
-    # FileNotFoundError and CalibreCLIError (for timeout) are handled by run_calibre_command
-    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60)
 
+def _handle_set_book_metadata_result(
+    book_id: int, metadata: 'SetMetadataRequest', library_path: Optional[str], before: Optional[int],
+    stdout: Union[str, bytes], stderr: Union[str, bytes], returncode: int
+) -> Dict[str, Any]:
+    try:
+        result_data = _parse_set_metadata_reply(book_id, stdout, stderr, returncode)
+    except CalibredbError:
+        _book_list_cache.clear() # The write may have gone through anyway
+        raise
+    _patch_cached_books(library_path, book_id, metadata, before)
+    return result_data
+
+
+def _parse_set_metadata_reply(
+    book_id: int, stdout: Union[str, bytes], stderr: Union[str, bytes], returncode: int
+) -> Dict[str, Any]:
+    # `stdout`/`stderr` are raw bytes from calibredb, or text from a batch reply.
     if returncode != 0:
-        # Check if stderr indicates "No book with id X found", even with non-zero exit.
-        # Some calibredb versions/operations might exit non-zero for this.
-        # However, the primary expectation for `set_metadata --for-machine` is exit 0
-        # and empty JSON `{}` if book not found or no changes.
-        # A non-zero exit usually means a more fundamental problem with the command execution itself.
-        if "No book with id" in stderr and f"id {book_id}" in stderr:
-            # If this specific error occurs with a non-zero exit, it's still a failure,
-            # but we might treat it as "not found" leading to {} if that's desired.
-            # However, run_calibre_command's contract implies non-zero is an execution problem.
-            # For now, let any non-zero exit be a CalibredbError indicating command failure.
-            # The specific wrappers or endpoint logic can then inspect stderr if needed.
-            pass # Let the generic error be raised below.
-
+        # The primary expectation for `set_metadata --for-machine` is exit 0 and empty
+        # JSON `{}` if book not found or no changes. A non-zero exit (even one whose
+        # stderr says "No book with id X") means the command itself failed; the endpoint
+        # can inspect stderr if needed.
         error_message = f"calibredb set_metadata command failed with exit code {returncode}."
         raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
 
@@ -324,50 +1186,149 @@ def set_book_metadata(book_id: int, metadata: 'SetMetadataRequest', library_path
         return {}
 
     try:
-        result_data = json.loads(stdout) # `stdout` should be "{}" if empty or no changes
+        result_data = _json_loads(stdout) # `stdout` should be "{}" if empty or no changes
         return result_data
     except json.JSONDecodeError as e:
-        error_message = f"Failed to parse JSON output from calibredb set_metadata: {e}. Output: '{stdout}'"
+        output = stdout.decode("utf-8", "replace") if isinstance(stdout, bytes) else stdout
+        error_message = f"Failed to parse JSON output from calibredb set_metadata: {e}. Output: '{output}'"
         raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
 
 
-if __name__ == '__main__':
-    # Example usage (for manual testing)
-    # Ensure you have a Calibre library and `calibredb` is in your PATH.
-    # You might need to specify --with-library if your default Calibre library isn't set
-    # or if you want to target a specific one.
-    print("Attempting to list books from default Calibre library...")
-    try:
-        # Test without library path (uses default Calibre library)
-        # books = list_books(search_query="language:eng")
+# Runs calibredb's entry point once per argv in `commands` inside a single Calibre
+# interpreter, so N set_metadata calls pay for one startup instead of N. Each call's
+# output is captured separately and reported as one JSON list on the last line.
+# The library is opened once for the whole batch rather than by every call, unless the
+# script runs in a Calibre worker that already keeps it open. DBCtx.db is swapped for a
+# property that memoizes per library path, and restored (and the libraries closed) at
+# the end so a worker running later batches never sees a stale database.
+# Kept as straight-line code (no named functions or comprehensions; the one lambda
+# only uses its argument) because calibre-debug exec()s it inside a function.
+_CALIBREDB_BATCH_SCRIPT = """
+import io, json, sys
+from calibre.db.cli.main import main, DBCtx
+share_dbs = (not getattr(DBCtx, 'shelfstone_library_cache', False)
+             and isinstance(getattr(DBCtx, 'db', None), property))
+if share_dbs:
+    DBCtx.batch_dbs, DBCtx.batch_open = {}, DBCtx.db.fget
+    DBCtx.db = property(lambda self: self.batch_dbs[self.library_path] if self.library_path in self.batch_dbs
+                        else self.batch_dbs.setdefault(self.library_path, self.batch_open()))
+results = []
+try:
+    for argv in commands:
+        saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+        try:
+            returncode = main(argv)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            sys.stderr.write(repr(e))
+            returncode = 1
+        finally:
+            out, err = sys.stdout.getvalue(), sys.stderr.getvalue()
+            sys.stdout, sys.stderr = saved
+        results.append({'stdout': out, 'stderr': err, 'returncode': returncode or 0})
+finally:
+    if share_dbs:
+        for db in DBCtx.batch_dbs.values():
+            db.close()
+        DBCtx.db = property(DBCtx.batch_open)
+        del DBCtx.batch_dbs, DBCtx.batch_open
+sys.stdout.write('\\n' + json.dumps(results) + '\\n')
+"""
+
+
+def set_book_metadata_bulk(
+    items: List[Tuple[int, 'SetMetadataRequest']], library_path: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Sets metadata for several books in one Calibre process.
 
-        # To test with a specific library:
-        # books = list_books(library_path="/path/to/your/calibre/library", search_query="Foundation")
+    `calibredb set_metadata` only takes a single book ID, so the per-book commands
+    are run back to back by one `calibre-debug -c` interpreter.
 
-        # For this example, let's assume there's no default library or it's empty,
-        # and we don't specify one, which might lead to an error or empty list
-        # depending on the calibredb setup.
-        # A more robust test here would involve setting up a known library.
+    Args:
+        items: (book_id, SetMetadataRequest) pairs.
+        library_path: Optional path to the Calibre library.
 
-        books = list_books() # This will likely use a default library if configured, or error if not.
-                             # For CI/testing, a known library path is better.
+    Returns:
+        One result per item, in order, each as returned by `set_book_metadata`.
 
-        if books:
-            print(f"Found {len(books)} books.")
-            print("First book details:")
-            print(json.dumps(books[0], indent=2))
-        else:
-            print("No books found or library is empty/not accessible.")
+    Raises:
+        FileNotFoundError: If calibre-debug command is not found.
+        CalibredbError: If the batch fails or any book's update fails.
+        ValueError: If `items` is empty or any item is invalid.
+    """
+    book_ids, cmd = _build_set_book_metadata_bulk_command(items, library_path)
+    before = _library_stamp(library_path)
+    stdout, stderr, returncode = run_calibre_command(cmd, timeout=60 + 10 * len(book_ids), binary=True)
+    return _handle_set_book_metadata_bulk_result(items, library_path, before, stdout, stderr, returncode)
+
+
+async def set_book_metadata_bulk_async(
+    items: List[Tuple[int, 'SetMetadataRequest']], library_path: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Async variant of `set_book_metadata_bulk`."""
+    book_ids, cmd = _build_set_book_metadata_bulk_command(items, library_path)
+    async with _library_semaphore(library_path):
+        before = _library_stamp(library_path)
+        stdout, stderr, returncode = await run_calibre_command_async(
+            cmd, timeout=60 + 10 * len(book_ids), binary=True
+        )
+    return _handle_set_book_metadata_bulk_result(items, library_path, before, stdout, stderr, returncode)
+
+
+def _build_set_book_metadata_bulk_command(
+    items: List[Tuple[int, 'SetMetadataRequest']], library_path: Optional[str]
+) -> Tuple[List[int], List[str]]:
+    if not items:
+        raise ValueError("At least one book is required.")
+    book_ids = [book_id for book_id, _ in items]
+    commands = [
+        _build_set_book_metadata_command(book_id, metadata, library_path)
+        for book_id, metadata in items
+    ]
+    script = f"commands = {commands!r}\n" + _CALIBREDB_BATCH_SCRIPT
+    return book_ids, ["calibre-debug", "-c", script]
 
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-        print("Please ensure 'calibredb' is installed and in your system's PATH.")
-    except CalibredbError as e:
-        print(f"Calibredb Error: {e}")
-        if e.stderr:
-            print(f"Calibredb Stderr: {e.stderr}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+
+def _handle_set_book_metadata_bulk_result(
+    items: List[Tuple[int, 'SetMetadataRequest']], library_path: Optional[str], before: Optional[int],
+    stdout: bytes, stderr: bytes, returncode: int
+) -> List[Dict[str, Any]]:
+    try:
+        replies = _parse_set_metadata_batch_reply(len(items), stdout, stderr, returncode)
+    except CalibredbError:
+        _book_list_cache.clear() # Some of the writes may have gone through
+        raise
+
+    return [
+        # Every patch is checked against the stamp from before the whole batch; the
+        # first one re-stamps what it keeps to the stamp after it, which the rest accept.
+        _handle_set_book_metadata_result(
+            book_id, metadata, library_path, before, reply["stdout"], reply["stderr"], reply["returncode"]
+        )
+        for (book_id, metadata), reply in zip(items, replies)
+    ]
+
+
+def _parse_set_metadata_batch_reply(count: int, stdout: bytes, stderr: bytes, returncode: int) -> List[Dict[str, Any]]:
+    if returncode != 0:
+        error_message = f"calibredb set_metadata batch failed with exit code {returncode}."
+        raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
+
+    try:
+        # Anything Calibre printed while starting up comes before the JSON line.
+        replies = _json_loads(stdout.rstrip().rpartition(b"\n")[2])
+    except json.JSONDecodeError as e:
+        error_message = f"Failed to parse JSON output from calibredb set_metadata batch: {e}."
+        raise CalibredbError(error_message, stdout=stdout, stderr=stderr, returncode=returncode)
+    if not isinstance(replies, list) or len(replies) != count:
+        raise CalibredbError(
+            "calibredb set_metadata batch returned an unexpected number of results.",
+            stdout=stdout, stderr=stderr, returncode=returncode
+        )
+    return replies
 
 
 def export_book_file(
@@ -391,71 +1352,18 @@ def export_book_file(
         CalibredbError: If calibredb export command fails (e.g., book or format not found).
         ValueError: If book_id is not a positive integer or format_extension is empty.
     """
-    if not isinstance(book_id, int) or book_id <= 0:
-        raise ValueError("Book ID must be a positive integer.")
-    if not format_extension or not isinstance(format_extension, str):
-        raise ValueError("Format extension must be a non-empty string.")
-
-    cmd = [
-        "calibredb", "export",
-        "--to-stdout",
-        "--format", format_extension.lower(),
-        str(book_id)
-    ]
-
-    if library_path:
-        cmd.extend(["--with-library", library_path])
-
-    # We need to run this command and capture binary output.
-    # The existing run_calibre_command captures text. We need a modification or a new helper.
-    # For now, let's assume run_calibre_command can be adapted or a new one is made.
-    # Let's modify the expectation for run_calibre_command for this case.
-    # It should return (stdout_bytes, stderr_text, returncode)
+    cmd = _build_export_book_command(book_id, format_extension, library_path)
 
     # To capture binary stdout, subprocess.run needs text=False and no encoding.
-    # Let's call subprocess directly here for simplicity for binary output.
-    import subprocess
     try:
         process = subprocess.run(
-            cmd,
+            # Resolved once per process, as run_calibre_command does, not a PATH walk per export.
+            [_resolve_executable(cmd[0]), *cmd[1:]],
             capture_output=True,
             check=False, # Manually check returncode
-            timeout=120  # Exporting might take time
+            timeout=_EXPORT_BOOK_TIMEOUT
         )
-
-        if process.returncode != 0:
-            # Try to decode stderr for error message
-            stderr_decoded = process.stderr.decode('utf-8', errors='replace') if process.stderr else ""
-            error_message = f"calibredb export command failed for book ID {book_id} to format {format_extension} with exit code {process.returncode}."
-            # It's useful to include stderr if available
-            if stderr_decoded:
-                error_message += f" Stderr: {stderr_decoded}"
-
-            # Specific checks for common errors
-            if "no book with id" in stderr_decoded.lower() and str(book_id) in stderr_decoded.lower():
-                 raise CalibredbError(f"Book with ID {book_id} not found.", stderr=stderr_decoded, returncode=process.returncode)
-            if f"book has no {format_extension.upper()} format" in stderr_decoded.lower():
-                 raise CalibredbError(f"Book ID {book_id} does not have a {format_extension.upper()} format available for export.", stderr=stderr_decoded, returncode=process.returncode)
-
-            raise CalibredbError(error_message, stderr=stderr_decoded, returncode=process.returncode)
-
-        if not process.stdout:
-            # This can happen if the book ID is valid but the format is not available,
-            # and calibredb export doesn't error out but just produces no output.
-            # The stderr check above for "no format" should catch this ideally.
-            # If stdout is empty and no error, it's ambiguous.
-            stderr_decoded = process.stderr.decode('utf-8', errors='replace') if process.stderr else ""
-            raise CalibredbError(
-                f"calibredb export for book ID {book_id} (format {format_extension}) produced no output, but command succeeded. Stderr: {stderr_decoded}",
-                stderr=stderr_decoded,
-                returncode=process.returncode
-            )
-
-        return process.stdout # Return raw bytes
-
     except FileNotFoundError: # For calibredb executable itself
-        # This should ideally be caught by a higher level or ensure calibredb is checked once.
-        # For now, re-raising to fit the function's contract.
         raise FileNotFoundError("calibredb command not found. Ensure Calibre is installed and in your PATH.")
     except subprocess.TimeoutExpired:
         raise CalibredbError(
@@ -467,6 +1375,106 @@ def export_book_file(
             f"An unexpected error occurred during calibredb export for book ID {book_id}: {str(e)}",
             returncode=-2 # Custom error code for other errors
         )
+    return _handle_export_book_result(book_id, format_extension, process.stdout, process.stderr, process.returncode)
+
+
+async def export_book_file_async(
+    book_id: int,
+    format_extension: str,
+    library_path: Optional[str] = None
+) -> bytes:
+    """Async variant of `export_book_file`."""
+    cmd = _build_export_book_command(book_id, format_extension, library_path)
+    # FileNotFoundError and CalibreCLIError (for timeout) are raised by run_calibre_command_async
+    stdout, stderr, returncode = await _run_calibredb_async(
+        cmd, timeout=_EXPORT_BOOK_TIMEOUT, library_path=library_path, binary=True
+    )
+    return _handle_export_book_result(book_id, format_extension, stdout, stderr, returncode)
+
+
+_EXPORT_BOOK_TIMEOUT = 120 # Exporting might take time
+
+
+def _build_export_book_command(book_id: int, format_extension: str, library_path: Optional[str]) -> List[str]:
+    _require_book_id(book_id)
+    if not format_extension or not isinstance(format_extension, str):
+        raise ValueError("Format extension must be a non-empty string.")
+
+    return [
+        *_CALIBREDB_EXPORT_CMD,
+        "--format", format_extension.lower(),
+        str(book_id),
+        *(("--with-library", library_path) if library_path else ()),
+    ]
+
+
+def _handle_export_book_result(
+    book_id: int, format_extension: str, stdout: bytes, stderr: bytes, returncode: int
+) -> bytes:
+    stderr_decoded = stderr.decode('utf-8', errors='replace') if stderr else ""
+    if returncode != 0:
+        error_message = f"calibredb export command failed for book ID {book_id} to format {format_extension} with exit code {returncode}."
+        # It's useful to include stderr if available
+        if stderr_decoded:
+            error_message += f" Stderr: {stderr_decoded}"
+
+        # Specific checks for common errors
+        if "no book with id" in stderr_decoded.lower() and str(book_id) in stderr_decoded.lower():
+            raise CalibredbError(f"Book with ID {book_id} not found.", stderr=stderr_decoded, returncode=returncode)
+        if f"book has no {format_extension.lower()} format" in stderr_decoded.lower():
+            raise CalibredbError(f"Book ID {book_id} does not have a {format_extension.upper()} format available for export.", stderr=stderr_decoded, returncode=returncode)
+
+        raise CalibredbError(error_message, stderr=stderr_decoded, returncode=returncode)
+
+    if not stdout:
+        # This can happen if the book ID is valid but the format is not available,
+        # and calibredb export doesn't error out but just produces no output.
+        raise CalibredbError(
+            f"calibredb export for book ID {book_id} (format {format_extension}) produced no output, but command succeeded. Stderr: {stderr_decoded}",
+            stderr=stderr_decoded,
+            returncode=returncode
+        )
+
+    return stdout # Return raw bytes
+
+
+if __name__ == '__main__':
+    # Example usage (for manual testing)
+    # Ensure you have a Calibre library and `calibredb` is in your PATH.
+    # You might need to specify --with-library if your default Calibre library isn't set
+    # or if you want to target a specific one.
+    print("Attempting to list books from default Calibre library...")
+    try:
+        # Test without library path (uses default Calibre library)
+        # books = list_books(search_query="language:eng")
+
+        # To test with a specific library:
+        # books = list_books(library_path="/path/to/your/calibre/library", search_query="Foundation")
+
+        # For this example, let's assume there's no default library or it's empty,
+        # and we don't specify one, which might lead to an error or empty list
+        # depending on the calibredb setup.
+        # A more robust test here would involve setting up a known library.
+
+        books = list_books() # This will likely use a default library if configured, or error if not.
+                             # For CI/testing, a known library path is better.
+
+        if books:
+            print(f"Found {len(books)} books.")
+            print("First book details:")
+            print(json.dumps(books[0], indent=2))
+        else:
+            print("No books found or library is empty/not accessible.")
+
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        print("Please ensure 'calibredb' is installed and in your system's PATH.")
+    except CalibredbError as e:
+        print(f"Calibredb Error: {e}")
+        if e.stderr:
+            print(f"Calibredb Stderr: {e.stderr}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
 
     print("\nAttempting to list books from a non-existent library (should fail gracefully)...")
     try:
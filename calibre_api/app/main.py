@@ -1,12 +1,36 @@
-from fastapi import FastAPI, HTTPException, Query, File, UploadFile, Form
-from typing import List, Optional, Any
+from fastapi import FastAPI, HTTPException, Query, File, UploadFile, Form, Body
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, List, Optional, Any
+from pydantic import TypeAdapter, ValidationError
+import asyncio
+import atexit
+import json
 import logging
 import shutil
 import tempfile
 import os
 
 from .models import Book, AddBookResponse, RemoveBookResponse, SetMetadataRequest, SetMetadataResponse
-from .crud import list_books, add_book, remove_book, set_book_metadata, CalibredbError
+from . import crud
+from .crud import list_books_async, list_books_multi_async, add_book_async, remove_book_async, set_book_metadata_async, CalibredbError
+
+# The metadata endpoints return large or nested JSON; render them with
+# orjson when it is installed. ORJSONResponse only imports orjson lazily at render time,
+# so check for it up front.
+try:
+    import orjson # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
+# Redis is optional: it is only used when SHELFSTONE_REDIS_URL is set (see below).
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:
+    aioredis = None
+    RedisError = OSError # Never raised then: app.state.redis stays unset without redis
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO)
@@ -18,70 +42,253 @@ app = FastAPI(
     version="0.1.0",
 )
 
+
+# Bytes per read/write when copying an upload, instead of shutil's default 64 KiB.
+_UPLOAD_COPY_CHUNK = 1024 * 1024
+
+
+def _copy_upload(source, path: str) -> None:
+    with open(path, "wb") as buffer:
+        # Uploads over Starlette's spool limit (1 MiB) already sit in a real temporary
+        # file; have the kernel copy those with sendfile, without passing through Python.
+        # (Checking _rolled first: fileno() on a file still in memory would force it to disk.)
+        if getattr(source, "_rolled", False) and hasattr(os, "sendfile"):
+            source.flush()
+            offset = source.tell()
+            try:
+                while True:
+                    sent = os.sendfile(buffer.fileno(), source.fileno(), offset, 64 * _UPLOAD_COPY_CHUNK)
+                    if not sent:
+                        return
+                    offset += sent
+            except OSError:
+                source.seek(offset) # sendfile unsupported here; copy the rest below
+        shutil.copyfileobj(source, buffer, _UPLOAD_COPY_CHUNK)
+
+
+# tmpfs directory for uploads that calibredb reads straight back (see _upload_temp_dir).
+_SHM_DIR = "/dev/shm"
+
+# Each upload needs a directory of its own, since the file keeps its original name.
+# Rather than a mkdir and rmtree per upload, emptied directories are kept for the next
+# one: per base directory (None for the default temporary directory) there is one root
+# made on first use and removed at exit, and up to _UPLOAD_DIR_POOL_SIZE free
+# directories in it. Taken on the event loop; returned from the threadpool.
+_UPLOAD_DIR_POOL_SIZE = 16
+_upload_dir_roots: Dict[Optional[str], str] = {}
+_free_upload_dirs: Dict[str, List[str]] = {}
+
+
+def _take_upload_dir(base: Optional[str]) -> str:
+    root = _upload_dir_roots.get(base)
+    if root is None:
+        root = _upload_dir_roots[base] = tempfile.mkdtemp(prefix="shelfstone_uploads_", dir=base)
+        _free_upload_dirs[root] = []
+        atexit.register(shutil.rmtree, root, ignore_errors=True)
+    free = _free_upload_dirs[root]
+    while free:
+        path = free.pop()
+        if os.path.isdir(path): # A temporary-file cleaner may have removed it
+            return path
+    try:
+        return tempfile.mkdtemp(dir=root)
+    except FileNotFoundError: # ...or the whole root
+        del _upload_dir_roots[base]
+        return _take_upload_dir(base)
+
+
+def _upload_temp_dir(size: Optional[int]) -> str:
+    """
+    Returns an empty temporary directory for an upload of `size` bytes: on tmpfs when it
+    has room to spare for it, so the book is written to and read back from memory rather
+    than disk; otherwise in the default temporary directory. Hand it back with
+    `_release_upload_dir`.
+
+    /dev/shm is often small (64 MiB in a default Docker container), so it is only used
+    when the upload's size is known and takes at most half of the free space.
+    """
+    if size is not None and os.path.isdir(_SHM_DIR):
+        try:
+            stats = os.statvfs(_SHM_DIR)
+            if size * 2 <= stats.f_bavail * stats.f_frsize:
+                return _take_upload_dir(_SHM_DIR)
+        except OSError:
+            pass
+    return _take_upload_dir(None)
+
+
+def _release_upload_dir(temp_dir: str, temp_file_path: str) -> None:
+    """Deletes the upload at `temp_file_path` and keeps its directory for the next one."""
+    try:
+        os.unlink(temp_file_path)
+    except FileNotFoundError:
+        pass # The upload failed before the file was created
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True) # Not a plain file; don't reuse the directory
+        return
+    free = _free_upload_dirs.get(os.path.dirname(temp_dir))
+    if free is not None and len(free) < _UPLOAD_DIR_POOL_SIZE:
+        free.append(temp_dir)
+    else:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+async def save_upload(upload: UploadFile, path: str) -> None:
+    """Writes an uploaded file to `path` from the threadpool, so a large e-book does not stall the event loop."""
+    await run_in_threadpool(_copy_upload, upload.file, path)
+
+# Number of long-lived Calibre interpreters serving conversions, polishing, metadata and
+# library (calibredb) commands (see calibre_cli.CalibreWorkerPool). 0 keeps the default of one process per command.
+CALIBRE_WORKER_POOL_SIZE = int(os.getenv("CALIBRE_WORKER_POOL_SIZE", "0"))
+# Seconds a worker may sit idle before it is stopped; a new one starts on the next command.
+CALIBRE_WORKER_IDLE_TIMEOUT = float(os.getenv("CALIBRE_WORKER_IDLE_TIMEOUT", "300"))
+
+
+@app.on_event("startup")
+async def start_calibre_workers():
+    if CALIBRE_WORKER_POOL_SIZE > 0:
+        pool = calibre_cli.enable_worker_pool(size=CALIBRE_WORKER_POOL_SIZE, idle_timeout=CALIBRE_WORKER_IDLE_TIMEOUT)
+        logger.info("Calibre worker pool enabled with %s workers.", CALIBRE_WORKER_POOL_SIZE)
+        # Started in the background: the API accepts requests while the workers load Calibre.
+        app.state.worker_warm_up = asyncio.ensure_future(pool.warm())
+
+
+@app.on_event("shutdown")
+async def stop_calibre_workers():
+    warm_up = getattr(app.state, "worker_warm_up", None)
+    if warm_up is not None:
+        warm_up.cancel()
+    await calibre_cli.disable_worker_pool()
+
+
+# Redis server (e.g. redis://localhost:6379/0) holding GET /books/ responses for every
+# API process, so several uvicorn/gunicorn workers share one warm cache. Unset (the
+# default), each process only has crud's in-memory listing cache.
+SHELFSTONE_REDIS_URL = os.getenv("SHELFSTONE_REDIS_URL")
+# Seconds a /books/ response is kept in Redis.
+SHELFSTONE_REDIS_BOOKS_TTL = int(os.getenv("SHELFSTONE_REDIS_BOOKS_TTL", "30"))
+# Counter that is part of every cached /books/ key. Library writes increment it, which
+# leaves all earlier entries unreachable (they expire with their TTL), for every process
+# at once and without a SCAN over the keys.
+_REDIS_BOOKS_VERSION_KEY = "shelfstone:books:version"
+
+
+@app.on_event("startup")
+async def connect_redis():
+    if not SHELFSTONE_REDIS_URL:
+        return
+    if aioredis is None:
+        logger.warning("SHELFSTONE_REDIS_URL is set but the redis package is not installed; /books/ responses will not be shared.")
+        return
+    app.state.redis = aioredis.from_url(SHELFSTONE_REDIS_URL)
+    logger.info("Caching /books/ responses in Redis at %s.", SHELFSTONE_REDIS_URL)
+
+
+@app.on_event("shutdown")
+async def disconnect_redis():
+    redis = getattr(app.state, "redis", None)
+    if redis is not None:
+        app.state.redis = None
+        await redis.aclose()
+
+
+async def _redis_books_key(redis, library_path: Optional[str], search: Optional[str], fields: Optional[List[str]]) -> str:
+    # The metadata.db stamp makes changes made outside the API (e.g. in the Calibre GUI)
+    # miss as well, as in crud's cache.
+    version = await redis.get(_REDIS_BOOKS_VERSION_KEY)
+    stamp = crud._library_stamp(library_path)
+    return "shelfstone:books:" + json.dumps([int(version or 0), library_path or "", stamp, search or "", fields])
+
+
+async def _invalidate_redis_books() -> None:
+    """Makes every process miss the /books/ responses cached so far; call after a library write."""
+    redis = getattr(app.state, "redis", None)
+    if redis is None:
+        return
+    try:
+        await redis.incr(_REDIS_BOOKS_VERSION_KEY)
+    except RedisError as e:
+        logger.warning("Could not invalidate the /books/ responses cached in Redis: %s", e)
+
+# Validates a whole listing in one call into pydantic-core, rather than book by book,
+# and serializes it the same way.
+_BOOK_LIST_ADAPTER = TypeAdapter(List[Book])
+
+
 @app.get("/books/", response_model=List[Book])
 async def get_books_endpoint(
     library_path: Optional[str] = Query(None, description="Path to the Calibre library. If not provided, calibredb's default will be used."),
-    search: Optional[str] = Query(None, description="Search query for calibredb (e.g., 'title:Dune author:Herbert').")
+    search: Optional[str] = Query(None, description="Search query for calibredb (e.g., 'title:Dune author:Herbert')."),
+    fields: Optional[str] = Query(None, description="Comma-separated Calibre fields to return (e.g., 'title,authors,comments'), or 'all'. Defaults to title, authors, tags, series, series_index, pubdate and rating.")
 ):
     """
     Retrieve a list of books from the Calibre library.
-    Uses `calibredb list --for-machine --fields all`.
+    Uses `calibredb list --for-machine --fields <fields>`.
     """
     try:
-        logger.info(f"Received request for books. Library path: '{library_path}', Search: '{search}'")
+        logger.info("Received request for books. Library path: '%s', Search: '%s'", library_path, search)
 
-        # Call the CRUD function to get book data
-        books_data = list_books(library_path=library_path, search_query=search)
-
-        # Validate and parse data with Pydantic models
-        # Pydantic will raise validation errors if the data doesn't match the Book model
-        # For example, if 'id' is missing or 'authors' is not a list.
-        # FastAPI handles these Pydantic validation errors automatically and returns a 422 response.
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        redis = getattr(app.state, "redis", None)
+        redis_key = None
+        if redis is not None:
+            try:
+                redis_key = await _redis_books_key(redis, library_path, search, field_list)
+                cached = await redis.get(redis_key)
+            except RedisError as e: # The cache is an optimisation: carry on without it
+                logger.warning("Redis unavailable, listing books without it: %s", e)
+                redis_key = cached = None
+            if cached is not None:
+                return Response(content=cached, media_type="application/json")
+
+        # Call the CRUD function to get book data. Searches go through list_books_multi_async:
+        # simple ones are filtered from one shared listing of the library, so different
+        # searches arriving together wait on the same calibredb run (or metadata.db query).
+        if search:
+            listings = await list_books_multi_async([search], library_path=library_path, fields=field_list)
+            books_data = listings[search]
+        else:
+            books_data = await list_books_async(library_path=library_path, search_query=search, fields=field_list)
 
-        # However, calibredb --for-machine output is a list of dicts.
-        # We need to ensure each dict can be parsed into a Book model.
+        # Validate and parse data with Pydantic models. crud has already turned list
+        # fields calibredb printed as comma-separated strings into lists.
         # If a field is missing but Optional in Pydantic, it's fine.
         # If a required field (like 'id' or 'title' if not Optional) is missing, Pydantic will error.
+        try:
+            validated_books = _BOOK_LIST_ADAPTER.validate_python(books_data)
+        except ValidationError as e:
+            # We are strict: one invalid book fails the whole request. The first error's
+            # location starts with the index of the book it is about.
+            index = e.errors()[0]["loc"][0]
+            book_dict = books_data[index] if isinstance(index, int) else {}
+            logger.error(f"Error parsing book data: {book_dict}. Error: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error processing book data from calibredb. Problematic book: {book_dict.get('title', 'Unknown title')}. Error: {str(e)}"
+            )
 
-        validated_books: List[Book] = []
-        for book_dict in books_data:
+        logger.info("Successfully retrieved and validated %s books.", len(validated_books))
+        # Already validated: returning a Response skips FastAPI validating the books again
+        # against response_model (still used for the OpenAPI schema) before encoding them.
+        # exclude_unset: each book carries only the fields calibredb listed, not the
+        # model's defaults for the ones that were not requested.
+        payload = _BOOK_LIST_ADAPTER.dump_json(validated_books, exclude_unset=True)
+        if redis_key is not None:
             try:
-                # Ensure 'authors' and 'tags' are lists if they exist and are strings
-                # (calibredb sometimes returns comma-separated strings for these)
-                # This preprocessing step might be better placed in the crud layer or a dedicated parsing function.
-                if 'authors' in book_dict and isinstance(book_dict['authors'], str):
-                    book_dict['authors'] = [a.strip() for a in book_dict['authors'].split(',')] if book_dict['authors'] else []
-
-                if 'tags' in book_dict and isinstance(book_dict['tags'], str):
-                    book_dict['tags'] = [t.strip() for t in book_dict['tags'].split(',')] if book_dict['tags'] else []
-
-                if 'formats' in book_dict and isinstance(book_dict['formats'], str):
-                     book_dict['formats'] = [f.strip() for f in book_dict['formats'].split(',')] if book_dict['formats'] else []
-
-                if 'languages' in book_dict and isinstance(book_dict['languages'], str):
-                     book_dict['languages'] = [lang.strip() for lang in book_dict['languages'].split(',')] if book_dict['languages'] else []
-
-                validated_books.append(Book(**book_dict))
-            except Exception as e: # Catch Pydantic validation errors or other issues per book
-                logger.error(f"Error parsing book data: {book_dict}. Error: {e}", exc_info=True)
-                # Optionally, skip this book or raise an error for the whole request
-                # For now, we'll be strict and raise an error if any book fails validation.
-                # This could be changed to skip problematic books and return valid ones.
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error processing book data from calibredb. Problematic book: {book_dict.get('title', 'Unknown title')}. Error: {str(e)}"
-                )
-
-        logger.info(f"Successfully retrieved and validated {len(validated_books)} books.")
-        return validated_books
+                await redis.set(redis_key, payload, ex=SHELFSTONE_REDIS_BOOKS_TTL)
+            except RedisError as e:
+                logger.warning("Could not cache /books/ response in Redis: %s", e)
+        return Response(content=payload, media_type="application/json")
 
+    except ValueError as e: # Unknown field names
+        raise HTTPException(status_code=400, detail=str(e))
     except FileNotFoundError as e:
         logger.error(f"calibredb not found: {e}", exc_info=True)
         raise HTTPException(
             status_code=503, # Service Unavailable
             detail="calibredb command not found. Ensure Calibre is installed and in your PATH."
         )
-    except CalibredbError as e:
+    except calibre_cli.CalibreCLIError as e: # CalibredbError, or a timeout from the command runner
         logger.error(f"CalibredbError: {e.args[0]}. Return code: {e.returncode}. Stderr: {e.stderr}", exc_info=True)
         detail_message = f"Error interacting with calibredb: {e.args[0]}"
         # Potentially include parts of e.stderr if it's safe and useful, or log it for internal review.
@@ -96,6 +303,63 @@ async def get_books_endpoint(
             detail=f"An unexpected server error occurred: {str(e)}"
         )
 
+@app.get("/books/stream/")
+async def stream_books_endpoint(
+    library_path: Optional[str] = Query(None, description="Path to the Calibre library. If not provided, calibredb's default will be used."),
+    search: Optional[str] = Query(None, description="Search query for calibredb (e.g., 'title:Dune author:Herbert')."),
+    fields: Optional[str] = Query(None, description="Comma-separated Calibre fields to return, or 'all'. Same defaults as GET /books/.")
+):
+    """
+    Stream books from the Calibre library as newline-delimited JSON, one book per line.
+
+    Books are sent as calibredb prints them (see `crud.iter_books`), so the first ones
+    arrive before a large listing has finished and the listing is never held in memory
+    whole. Errors before the first book get the same status codes as GET /books/; once
+    streaming has started, a failure can only end the response early.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    books = crud.iter_books(library_path=library_path, search_query=search, fields=field_list)
+    try:
+        # Pull the first book before answering, so startup errors become proper HTTP errors.
+        first = await run_in_threadpool(next, books, None)
+    except ValueError as e: # Unknown field names
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        logger.error(f"calibredb not found: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=503,
+            detail="calibredb command not found. Ensure Calibre is installed and in your PATH."
+        )
+    except calibre_cli.CalibreCLIError as e: # CalibredbError, or a timeout from the command runner
+        logger.error(f"CalibredbError: {e.args[0]}. Return code: {e.returncode}. Stderr: {e.stderr}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error interacting with calibredb: {e.args[0]}")
+    if first is not None:
+        # Validated before answering too: a listing the model can't take fails with a
+        # 500, not a 200 with an empty body.
+        try:
+            first = Book.model_validate(first)
+        except ValidationError as e:
+            logger.error(f"Error parsing book data: {first}. Error: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error processing book data from calibredb. Problematic book: {first.get('title', 'Unknown title')}. Error: {str(e)}"
+            )
+
+    def ndjson_lines():
+        if first is None:
+            return
+        try:
+            # exclude_unset, as for GET /books/: only the fields calibredb listed.
+            yield first.model_dump_json(exclude_unset=True) + "\n"
+            for book in books:
+                yield Book.model_validate(book).model_dump_json(exclude_unset=True) + "\n"
+        except Exception as e:
+            logger.error(f"Book stream ended early: {e}", exc_info=True)
+            raise
+
+    # A sync generator: Starlette iterates it in its threadpool, off the event loop.
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @app.post("/books/add/", response_model=AddBookResponse)
 async def add_book_endpoint(
     file: UploadFile = File(...),
@@ -111,38 +375,41 @@ async def add_book_endpoint(
     Add a book to the Calibre library.
     The book file is uploaded and then processed by `calibredb add`.
     """
-    # Create a temporary directory to store the uploaded file
-    temp_dir = tempfile.mkdtemp()
-    temp_file_path = os.path.join(temp_dir, file.filename)
+    # Get a temporary directory to store the uploaded file. The file keeps its name:
+    # calibredb falls back on it for the title, and reads the format from its extension.
+    temp_dir = _upload_temp_dir(file.size)
+    temp_file_path = os.path.join(temp_dir, os.path.basename(file.filename))
 
     try:
-        logger.info(f"Received request to add book: {file.filename}. Library path: '{library_path}'")
+        logger.info("Received request to add book: %s. Library path: '%s'", file.filename, library_path)
 
         # Save the uploaded file to the temporary path
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        logger.info(f"Uploaded file '{file.filename}' saved to temporary path: {temp_file_path}")
+        await save_upload(file, temp_file_path)
+        logger.info("Uploaded file '%s' saved to temporary path: %s", file.filename, temp_file_path)
 
         # Call the CRUD function to add the book
-        added_ids = add_book(
-            file_path=temp_file_path,
-            library_path=library_path,
-            one_book_per_directory=one_book_per_directory,
-            duplicates=duplicates,
-            automerge=automerge,
-            authors=authors,
-            title=title,
-            tags=tags
-        )
+        try:
+            added_ids = await add_book_async(
+                file_path=temp_file_path,
+                library_path=library_path,
+                one_book_per_directory=one_book_per_directory,
+                duplicates=duplicates,
+                automerge=automerge,
+                authors=authors,
+                title=title,
+                tags=tags
+            )
+        finally: # Even a failed write may have changed the library
+            await _invalidate_redis_books()
 
         if added_ids:
-            logger.info(f"Book(s) added successfully with ID(s): {added_ids}")
+            logger.info("Book(s) added successfully with ID(s): %s", added_ids)
             return AddBookResponse(
                 message="Book(s) added successfully.",
                 added_book_ids=added_ids
             )
         else:
-            logger.info(f"Book '{file.filename}' was not added (e.g., duplicate ignored, or other reason).")
+            logger.info("Book '%s' was not added (e.g., duplicate ignored, or other reason).", file.filename)
             return AddBookResponse(
                 message="Book was processed but no new entries were added to the library.",
                 added_book_ids=[],
@@ -165,10 +432,9 @@ async def add_book_endpoint(
         logger.error(f"An unexpected error occurred in /books/add/ endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {str(e)}")
     finally:
-        # Clean up: remove the temporary directory and its contents
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-            logger.info(f"Temporary directory '{temp_dir}' cleaned up.")
+        # Clean up: remove the uploaded file, keeping the directory for reuse
+        await run_in_threadpool(_release_upload_dir, temp_dir, temp_file_path)
+        logger.info("Temporary directory '%s' cleaned up.", temp_dir)
 
 @app.delete("/books/{book_id}/", response_model=RemoveBookResponse)
 async def remove_book_endpoint(
@@ -180,16 +446,21 @@ async def remove_book_endpoint(
     Uses `calibredb remove_books --permanent --for-machine <id>`.
     """
     try:
-        logger.info(f"Received request to remove book ID: {book_id}. Library path: '{library_path}'")
+        logger.info("Received request to remove book ID: %s. Library path: '%s'", book_id, library_path)
 
         if book_id <= 0: # Basic validation, crud layer also validates.
             raise HTTPException(status_code=400, detail="Book ID must be a positive integer.")
 
         # Call the CRUD function to remove the book
-        remove_result = remove_book(book_id=book_id, library_path=library_path)
-
-        if remove_result.get("ok") and remove_result.get("num_removed", 0) > 0 and book_id in remove_result.get("removed_ids", []):
-            logger.info(f"Book ID: {book_id} removed successfully.")
+        try:
+            remove_result = await remove_book_async(book_id=book_id, library_path=library_path)
+        finally: # Even a failed write may have changed the library
+            await _invalidate_redis_books()
+
+        ok = remove_result.get("ok")
+        removed_ids = remove_result.get("removed_ids") or () # book_id in removed_ids implies num_removed > 0
+        if ok and book_id in removed_ids:
+            logger.info("Book ID: %s removed successfully.", book_id)
             return RemoveBookResponse(
                 message=f"Book ID {book_id} removed successfully.",
                 removed_book_id=book_id
@@ -206,10 +477,10 @@ async def remove_book_endpoint(
                      raise HTTPException(status_code=404, detail=f"Book with ID {book_id} not found in the library.")
                 # Other specific errors from calibredb might warrant a 400 or 500
                 raise HTTPException(status_code=400, detail=error_detail)
-            elif not remove_result.get("ok"): # General failure if no specific error message for the ID
+            elif not ok: # General failure if no specific error message for the ID
                  logger.error(f"Calibredb 'remove_books' reported 'ok: false' for book ID {book_id} with no specific error entry. Result: {remove_result}")
                  raise HTTPException(status_code=500, detail=f"Calibredb failed to remove book ID {book_id}, reason unspecified in errors list.")
-            else: # ok: true, but book not in removed_ids or num_removed is 0.
+            else: # ok: true, but book not in removed_ids.
                 logger.warning(f"Book ID {book_id} not effectively removed despite 'ok: true'. Result: {remove_result}")
                 raise HTTPException(status_code=404, detail=f"Book with ID {book_id} not found or already removed.")
 
@@ -233,6 +504,26 @@ async def remove_book_endpoint(
 # uvicorn calibre_api.app.main:app --reload --port 6336
 # or python -m uvicorn calibre_api.app.main:app --reload --port 6336
 
+_NOT_FOUND_MARKER = "No book with id"
+
+
+def _is_book_not_found(stderr: Optional[str], book_id: int) -> bool:
+    """
+    True if calibredb's stderr says book `book_id` does not exist.
+
+    Scans stderr once for the marker and reads the id right after it, which Calibre
+    prints as "No book with id: 5" (older wording: "No book with id 5").
+    """
+    if not stderr:
+        return False
+    start = stderr.find(_NOT_FOUND_MARKER)
+    if start < 0:
+        return False
+    rest = stderr[start + len(_NOT_FOUND_MARKER):start + len(_NOT_FOUND_MARKER) + 32].lstrip(" :=\t")
+    digits = len(rest) - len(rest.lstrip("0123456789"))
+    return rest[:digits] == str(book_id)
+
+
 @app.put("/books/{book_id}/metadata/", response_model=SetMetadataResponse)
 async def set_book_metadata_endpoint(
     book_id: int,
@@ -245,22 +536,27 @@ async def set_book_metadata_endpoint(
     Only fields provided in the request body will be updated.
     """
     try:
-        logger.info(f"Received request to set metadata for book ID: {book_id}. Library path: '{library_path}'. Data: {metadata_update.model_dump(exclude_unset=True)}")
+        logger.info("Received request to set metadata for book ID: %s. Library path: '%s'", book_id, library_path)
+        if logger.isEnabledFor(logging.DEBUG): # Only build the dict when it will be logged
+            logger.debug("Metadata update for book ID %s: %s", book_id, metadata_update.model_dump(exclude_unset=True))
 
         if book_id <= 0:
             raise HTTPException(status_code=400, detail="Book ID must be a positive integer.")
 
-        if not metadata_update.model_dump(exclude_unset=True):
+        if not metadata_update.__pydantic_fields_set__: # Same test as an empty model_dump(exclude_unset=True), without building it
              raise HTTPException(status_code=400, detail="No metadata fields provided in the request.")
 
         # Call the CRUD function to set metadata
         # set_book_metadata now returns the JSON output from --for-machine
         # which is {} if book not found / no changes, or {"field": "new_value", ...} if changes made.
-        update_result = set_book_metadata(
-            book_id=book_id,
-            metadata=metadata_update,
-            library_path=library_path
-        )
+        try:
+            update_result = await set_book_metadata_async(
+                book_id=book_id,
+                metadata=metadata_update,
+                library_path=library_path
+            )
+        finally: # Even a failed write may have changed the library
+            await _invalidate_redis_books()
 
         if not update_result: # Empty dict {} means book not found or no actual changes made by calibredb
             # To differentiate, we might need to check if the book exists first,
@@ -305,7 +601,7 @@ async def set_book_metadata_endpoint(
             # This makes the API stricter: you must provide changes that *can* be applied to an *existing* book.
             raise HTTPException(status_code=404, detail=f"Book with ID {book_id} not found, or no metadata was actually changed by calibredb.")
 
-        logger.info(f"Metadata for book ID: {book_id} updated successfully. Changes: {update_result}")
+        logger.info("Metadata for book ID: %s updated successfully. Changes: %s", book_id, update_result)
         return SetMetadataResponse(
             message=f"Metadata for book ID {book_id} updated successfully.",
             book_id=book_id,
@@ -321,7 +617,7 @@ async def set_book_metadata_endpoint(
     except CalibredbError as e:
         logger.error(f"CalibredbError during set_metadata for ID {book_id}: {e.args[0]}. Stderr: {e.stderr}", exc_info=True)
         detail = f"Error using calibredb set_metadata for ID {book_id}: {e.args[0]}"
-        if e.stderr and "No book with id" in e.stderr and f"id {book_id}" in e.stderr:
+        if _is_book_not_found(e.stderr, book_id):
             raise HTTPException(status_code=404, detail=f"Book with ID {book_id} not found in the library.")
         raise HTTPException(status_code=500, detail=detail)
     except HTTPException: # Re-raise HTTPExceptions we've already crafted
@@ -355,7 +651,6 @@ from .models import (
     EbookCheckResponse # EbookCheckRequest handled by query param + file upload
 )
 import uuid # For generating unique filenames
-from fastapi.responses import StreamingResponse
 from io import BytesIO
 
 # Helper to create a unique temporary file path
@@ -370,7 +665,7 @@ async def get_calibre_version_endpoint():
     Corresponds to `calibre --version`.
     """
     try:
-        version_str = calibre_cli.get_calibre_version()
+        version_str = await calibre_cli.get_calibre_version_async()
         # The wrapper get_calibre_version already tries to parse the version number.
         # If it returns the full string, we might want to refine parsing here or in the wrapper.
         # For now, assume it's either "X.Y.Z" or "calibre X.Y.Z" or "calibre (calibre X.Y.Z)..."
@@ -422,11 +717,10 @@ async def ebook_convert_endpoint(
     temp_output_path = temp_file_path(prefix="convert_out_", suffix=f"_{output_filename}")
 
     try:
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_input_path)
         logger.info(f"Uploaded '{input_file.filename}' for conversion to '{temp_input_path}'. Target format: {request.output_format}")
 
-        converted_file_path = calibre_cli.ebook_convert(
+        converted_file_path = await calibre_cli.ebook_convert_async(
             input_file=temp_input_path,
             output_file=temp_output_path,
             options=request.options
@@ -562,7 +856,7 @@ async def ebook_convert_endpoint(
              pass # Keep the output file on the server for now. Needs a cleanup strategy.
 
 
-@app.post("/ebook/metadata/get/", response_model=EbookMetadataResponse, tags=["Calibre CLI"])
+@app.post("/ebook/metadata/get/", response_model=EbookMetadataResponse, response_class=FastJSONResponse, tags=["Calibre CLI"])
 async def get_ebook_metadata_endpoint(
     input_file: UploadFile = File(...),
     as_json: bool = Query(True, description="Return metadata as JSON. If false, returns raw OPF string.")
@@ -578,15 +872,14 @@ async def get_ebook_metadata_endpoint(
     temp_opf_for_json = None
 
     try:
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_input_path)
         logger.info(f"Uploaded '{input_file.filename}' for metadata extraction to '{temp_input_path}'. As JSON: {as_json}")
 
         # ebook_meta can output to stdout (if --to-opf not used) or to a file.
         # Our wrapper get_ebook_metadata handles this.
         # If as_json=True, it uses a temporary OPF file internally.
 
-        metadata_result = calibre_cli.get_ebook_metadata(
+        metadata_result = await calibre_cli.get_ebook_metadata_async(
             ebook_file_path=temp_input_path,
             as_json=as_json,
             # output_opf_file is handled internally by wrapper if as_json is true,
@@ -630,11 +923,10 @@ async def set_ebook_metadata_endpoint(
     temp_file_to_modify = temp_file_path(prefix="meta_set_", suffix=f"_{input_file.filename}")
 
     try:
-        with open(temp_file_to_modify, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_file_to_modify)
         logger.info(f"Uploaded '{input_file.filename}' for metadata setting to '{temp_file_to_modify}'. Options: {request.metadata_options}")
 
-        result_message = calibre_cli.set_ebook_metadata(
+        result_message = await calibre_cli.set_ebook_metadata_async(
             ebook_file_path=temp_file_to_modify,
             metadata_options=request.metadata_options
         )
@@ -755,11 +1047,10 @@ async def ebook_polish_endpoint(
 
 
     try:
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_input_path)
         logger.info(f"Uploaded '{input_file.filename}' for polishing to '{temp_input_path}'. Options: {options}")
 
-        polished_file_path = calibre_cli.ebook_polish(
+        polished_file_path = await calibre_cli.ebook_polish_async(
             ebook_file_path=temp_input_path,
             output_file_path=actual_output_for_polish,
             options=options if options else [], # Ensure it's a list
@@ -801,7 +1092,7 @@ async def ebook_polish_endpoint(
         # Proper cleanup of successfully served files via FileResponse needs BackgroundTasks.
 
 
-@app.get("/ebook/metadata/fetch/", response_model=FetchMetadataResponse, tags=["Calibre CLI"])
+@app.get("/ebook/metadata/fetch/", response_model=FetchMetadataResponse, response_class=FastJSONResponse, tags=["Calibre CLI"])
 async def fetch_ebook_metadata_endpoint(
     title: Optional[str] = Query(None),
     authors: Optional[str] = Query(None, description="Comma-separated string of author names."),
@@ -829,7 +1120,7 @@ async def fetch_ebook_metadata_endpoint(
 
     try:
         # The wrapper `fetch_ebook_metadata` handles as_json and OPF details.
-        metadata_result = calibre_cli.fetch_ebook_metadata(
+        metadata_result = await calibre_cli.fetch_ebook_metadata_async(
             title=title,
             authors=authors,
             isbn=isbn,
@@ -889,7 +1180,7 @@ async def web2disk_generate_recipe_endpoint(
     temp_recipe_path = temp_file_path(prefix="recipe_", suffix=f"_{client_recipe_filename}")
 
     try:
-        generated_recipe_filepath = calibre_cli.web2disk(
+        generated_recipe_filepath = await calibre_cli.web2disk_async(
             url=request.url,
             output_recipe_file=temp_recipe_path,
             options=request.options
@@ -936,10 +1227,9 @@ async def lrf_to_lrs_endpoint(input_file: UploadFile = File(...)):
     temp_output_path = temp_file_path(prefix="lrf2lrs_out_", suffix=f"_{output_filename}")
 
     try:
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_input_path)
 
-        converted_path = calibre_cli.lrf2lrs(temp_input_path, temp_output_path)
+        converted_path = await calibre_cli.lrf2lrs_async(temp_input_path, temp_output_path)
 
         return FileResponse(
             path=converted_path,
@@ -978,7 +1268,7 @@ async def get_book_file_endpoint(
             raise HTTPException(status_code=400, detail="Format extension must be provided.")
 
         # Call the CRUD function to get the book file bytes
-        file_bytes = crud.export_book_file(
+        file_bytes = await crud.export_book_file_async(
             book_id=book_id,
             format_extension=format_extension,
             library_path=library_path
@@ -1007,7 +1297,7 @@ async def get_book_file_endpoint(
     except FileNotFoundError as e: # For calibredb executable not found in crud
         logger.error(f"calibredb not found during export: {e}", exc_info=True)
         raise HTTPException(status_code=503, detail="calibredb command not found. Ensure Calibre is installed.")
-    except crud.CalibredbError as e: # Specific errors from calibredb export
+    except calibre_cli.CalibreCLIError as e: # CalibredbError, or a timeout from the command runner
         logger.error(f"CalibredbError during export for book ID {book_id}, format {format_extension}: {e.args[0]}. Stderr: {e.stderr}", exc_info=True)
         status_code = 500
         detail_message = f"Error exporting book: {e.args[0]}"
@@ -1035,7 +1325,7 @@ async def list_plugins_endpoint():
     Corresponds to `calibre-customize --list-plugins`.
     """
     try:
-        plugins_dict = calibre_cli.list_calibre_plugins()
+        plugins_dict = await run_in_threadpool(calibre_cli.list_calibre_plugins)
         return PluginListResponse(
             message="Successfully retrieved plugin list.",
             count=len(plugins_dict),
@@ -1059,7 +1349,8 @@ async def debug_test_build_endpoint(timeout: Optional[int] = Query(180, descript
     Corresponds to `calibre-debug --test-build`. This can take a few minutes.
     """
     try:
-        output = calibre_cli.run_calibre_debug_test_build(timeout=timeout)
+        # The build test can run for minutes; keep it off the event loop.
+        output = await run_in_threadpool(calibre_cli.run_calibre_debug_test_build, timeout=timeout)
         success_message = "Calibre debug --test-build completed."
         if "All tests passed" in output:
             success_message += " All tests passed."
@@ -1095,11 +1386,12 @@ async def send_email_endpoint(
     try:
         if attachment_file:
             temp_attachment_path = temp_file_path(prefix="smtp_attach_", suffix=f"_{attachment_file.filename}")
-            with open(temp_attachment_path, "wb") as buffer:
-                shutil.copyfileobj(attachment_file.file, buffer)
+            await save_upload(attachment_file, temp_attachment_path)
             logger.info(f"Attachment '{attachment_file.filename}' saved to '{temp_attachment_path}' for sending.")
 
-        success, message = calibre_cli.send_email_with_calibre_smtp(
+        # calibre-smtp has no async runner; keep its blocking send off the event loop.
+        success, message = await run_in_threadpool(
+            calibre_cli.send_email_with_calibre_smtp,
             recipient_email=request.recipient_email,
             subject=request.subject,
             body=request.body,
@@ -1146,11 +1438,10 @@ async def check_ebook_endpoint(
     temp_input_path = temp_file_path(prefix="check_ebook_in_", suffix=f"_{input_file.filename}")
 
     try:
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_input_path)
         logger.info(f"Uploaded '{input_file.filename}' for error checking to '{temp_input_path}'. Report format: {output_format}")
 
-        report_data = calibre_cli.check_ebook_errors(
+        report_data = await calibre_cli.check_ebook_errors_async(
             ebook_file_path=temp_input_path,
             output_format=output_format
         )
@@ -1188,10 +1479,9 @@ async def lrs_to_lrf_endpoint(input_file: UploadFile = File(...)):
     temp_output_path = temp_file_path(prefix="lrs2lrf_out_", suffix=f"_{output_filename}")
 
     try:
-        with open(temp_input_path, "wb") as buffer:
-            shutil.copyfileobj(input_file.file, buffer)
+        await save_upload(input_file, temp_input_path)
 
-        converted_path = calibre_cli.lrs2lrf(temp_input_path, temp_output_path)
+        converted_path = await calibre_cli.lrs2lrf_async(temp_input_path, temp_output_path)
 
         return FileResponse(
             path=converted_path,
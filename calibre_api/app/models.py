@@ -1,9 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union
+from typing import List, Optional, Union, Dict, Any
 
 class Book(BaseModel):
     id: int
-    title: str
+    title: Optional[str] = None # Only absent when the listing's fields leave it out
     authors: Optional[List[str]] = Field(default_factory=list)
     tags: Optional[List[str]] = Field(default_factory=list)
     publisher: Optional[str] = None
@@ -28,7 +28,9 @@ class Book(BaseModel):
         # Allows to use field names that are not valid Python identifiers
         # by defining an alias (though not strictly needed for the current fields)
         # an_example_field_with_hyphen: Optional[str] = Field(None, alias="an-example-field-with-hyphen")
-        pass
+        # Custom columns requested as `*name` come back from calibredb as `#name` keys;
+        # they are kept as they are rather than dropped.
+        extra = "allow"
 
 class AddBookResponse(BaseModel):
     message: str
@@ -42,7 +44,7 @@ class RemoveBookResponse(BaseModel):
 
 class SetMetadataRequest(BaseModel):
     title: Optional[str] = None
-    authors: Optional[List[str]] = None # Will be comma-separated for CLI
+    authors: Optional[List[str]] = None # Will be "&"-separated for CLI, so names may contain commas
     publisher: Optional[str] = None
     pubdate: Optional[str] = None # Expected format e.g., YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS
     tags: Optional[List[str]] = None # Will be comma-separated for CLI
@@ -1,14 +1,23 @@
 import pytest
+import asyncio
 import subprocess
 from unittest import mock
 import os
 import json
+import signal
+import sys
 
+from calibre_api.app import calibre_cli
 from calibre_api.app.calibre_cli import (
     run_calibre_command,
+    run_calibre_command_async,
+    run_calibre_commands_batch,
     CalibreCLIError,
     get_calibre_version,
+    get_calibre_version_async,
+    get_calibre_version_info,
     ebook_convert,
+    ebook_convert_async,
     get_ebook_metadata,
     set_ebook_metadata,
     ebook_polish,
@@ -22,30 +31,58 @@ from calibre_api.app.calibre_cli import (
     check_ebook_errors,
 )
 
-# Mock object for subprocess.CompletedProcess
-def mock_completed_process(stdout="", stderr="", returncode=0):
-    process = mock.Mock(spec=subprocess.CompletedProcess)
-    process.stdout = stdout
-    process.stderr = stderr
+@pytest.fixture(autouse=True)
+def clear_version_caches():
+    # get_calibre_version and friends memoize; keep tests independent of each other.
+    get_calibre_version.cache_clear()
+    get_calibre_version_info.cache_clear()
+    calibre_cli._version_cache = None
+    calibre_cli._metadata_cache.clear()
+    calibre_cli._check_book_cache.clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def fake_path_lookup():
+    # Pretend every tool is installed under /usr/bin so no test depends on a real Calibre install.
+    calibre_cli._resolve_executable.cache_clear()
+    with mock.patch('shutil.which', side_effect=lambda name: f"/usr/bin/{name}") as mock_which:
+        yield mock_which
+    calibre_cli._resolve_executable.cache_clear()
+
+# Stand-in for subprocess.Popen: writes the given output into the files the
+# wrapper passes as stdout/stderr, the same way a real child process would.
+def mock_popen(stdout=b"", stderr=b"", returncode=0):
+    process = mock.Mock()
     process.returncode = returncode
-    return process
+    process.wait.return_value = returncode
+
+    def fake_popen(command, stdout=None, stderr=None, **kwargs):
+        stdout.write(stdout_bytes)
+        stderr.write(stderr_bytes)
+        stdout.flush()
+        stderr.flush()
+        return process
+
+    stdout_bytes, stderr_bytes = stdout, stderr
+    return fake_popen, process
 
 # --- Tests for run_calibre_command ---
 
-@mock.patch('subprocess.run')
-def test_run_calibre_command_success(mock_subproc_run):
-    mock_subproc_run.return_value = mock_completed_process(stdout="Success output", returncode=0)
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_success(mock_popen_cls):
+    mock_popen_cls.side_effect, _ = mock_popen(stdout=b"Success output\n", returncode=0)
     stdout, stderr, retcode = run_calibre_command(['mytool', '--arg'])
     assert stdout == "Success output"
     assert stderr == ""
     assert retcode == 0
-    mock_subproc_run.assert_called_once_with(
-        ['mytool', '--arg'], capture_output=True, text=True, check=False, timeout=60
+    mock_popen_cls.assert_called_once_with(
+        ['/usr/bin/mytool', '--arg'], stdout=mock.ANY, stderr=mock.ANY, bufsize=-1,
+        close_fds=True, start_new_session=True
     )
 
-@mock.patch('subprocess.run')
-def test_run_calibre_command_failure_returncode(mock_subproc_run):
-    mock_subproc_run.return_value = mock_completed_process(stderr="Error output", returncode=1)
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_failure_returncode(mock_popen_cls):
+    mock_popen_cls.side_effect, _ = mock_popen(stderr=b"Error output", returncode=1)
     # run_calibre_command itself doesn't raise CalibreCLIError for non-zero, it returns the code.
     # Specific wrappers are expected to check the returncode.
     stdout, stderr, retcode = run_calibre_command(['mytool', '--fail'])
@@ -54,20 +91,366 @@ def test_run_calibre_command_failure_returncode(mock_subproc_run):
     assert retcode == 1
 
 
-@mock.patch('subprocess.run', side_effect=FileNotFoundError("mytool not found"))
-def test_run_calibre_command_file_not_found(mock_subproc_run):
-    with pytest.raises(FileNotFoundError, match="mytool not found"):
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_binary(mock_popen_cls):
+    mock_popen_cls.side_effect, _ = mock_popen(stdout=b'{"a": 1}\n', stderr=b"warn\n", returncode=0)
+    assert run_calibre_command(['mytool'], binary=True) == (b'{"a": 1}\n', b"warn\n", 0)
+
+@mock.patch('subprocess.Popen', side_effect=PermissionError("Permission denied"))
+def test_run_calibre_command_os_error(mock_popen_cls):
+    with pytest.raises(CalibreCLIError, match="Permission denied") as exc_info:
         run_calibre_command(['mytool'])
+    assert exc_info.value.returncode == -2
 
-@mock.patch('subprocess.run', side_effect=subprocess.TimeoutExpired(cmd=['mytool'], timeout=30))
-def test_run_calibre_command_timeout(mock_subproc_run):
-    with pytest.raises(CalibreCLIError, match="mytool command timed out."):
+@mock.patch('subprocess.Popen', side_effect=TypeError("bad argument"))
+def test_run_calibre_command_propagates_programming_errors(mock_popen_cls):
+    with pytest.raises(TypeError, match="bad argument"):
+        run_calibre_command(['mytool'])
+
+@mock.patch('subprocess.Popen', side_effect=FileNotFoundError("mytool not found"))
+def test_run_calibre_command_file_not_found(mock_popen_cls):
+    with pytest.raises(FileNotFoundError, match="mytool command not found"):
+        run_calibre_command(['mytool'])
+
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_missing_executable_fails_before_spawn(mock_popen_cls, fake_path_lookup):
+    fake_path_lookup.side_effect = lambda name: None
+    with pytest.raises(FileNotFoundError, match="mytool command not found"):
         run_calibre_command(['mytool'])
+    mock_popen_cls.assert_not_called()
+
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_resolves_executable_once(mock_popen_cls, fake_path_lookup):
+    mock_popen_cls.side_effect, _ = mock_popen()
+    run_calibre_command(['mytool', 'a'])
+    mock_popen_cls.side_effect, _ = mock_popen()
+    run_calibre_command(['mytool', 'b'])
+    fake_path_lookup.assert_called_once_with('mytool')
+
+@mock.patch('os.killpg')
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_timeout(mock_popen_cls, mock_killpg):
+    fake_popen, process = mock_popen()
+    process.pid = 4242
+    process.wait.side_effect = [subprocess.TimeoutExpired(cmd=['mytool'], timeout=0), 0, 0]
+    mock_popen_cls.side_effect = fake_popen
+    with pytest.raises(CalibreCLIError, match="mytool command timed out."):
+        run_calibre_command(['mytool'], timeout=0)
+    # Whole process group: polite TERM first, then KILL for anything left behind
+    assert mock_killpg.call_args_list == [mock.call(4242, signal.SIGTERM), mock.call(4242, signal.SIGKILL)]
+    assert mock_popen_cls.call_args.kwargs['start_new_session'] is True
+
+@mock.patch('os.killpg')
+def test_kill_tree_escalates_when_term_is_ignored(mock_killpg):
+    process = mock.Mock(pid=4242)
+    process.wait.side_effect = [subprocess.TimeoutExpired(cmd=['mytool'], timeout=2), 0]
+    calibre_cli._kill_tree(process)
+    assert mock_killpg.call_args_list == [mock.call(4242, signal.SIGTERM), mock.call(4242, signal.SIGKILL)]
+    assert process.wait.call_count == 2 # The leader is reaped after SIGKILL
+
+@mock.patch('os.killpg')
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_output_cap_kills_process(mock_popen_cls, mock_killpg):
+    fake_popen, process = mock_popen(stderr=b"far too much output")
+    process.wait.side_effect = [subprocess.TimeoutExpired(cmd=['mytool'], timeout=0.5), 0, 0]
+    mock_popen_cls.side_effect = fake_popen
+    with pytest.raises(CalibreCLIError, match="output exceeded cap of 4 bytes"):
+        run_calibre_command(['mytool'], max_output=4)
+    mock_killpg.assert_any_call(process.pid, signal.SIGTERM)
+
+@mock.patch('os.killpg')
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_uncapped_by_default(mock_popen_cls, mock_killpg):
+    fake_popen, process = mock_popen(stdout=b"x" * 64)
+    mock_popen_cls.side_effect = fake_popen
+    stdout, _, returncode = run_calibre_command(['calibredb', 'list'], timeout=60)
+    assert (stdout, returncode) == ("x" * 64, 0)
+    process.wait.assert_called_once_with(timeout=pytest.approx(60, abs=1))
+    mock_killpg.assert_not_called()
+
+def test_lazy_join_renders_only_on_demand():
+    lazy = calibre_cli._LazyJoin(['ebook-meta', 'My Book.epub'])
+    assert str(lazy) == "ebook-meta 'My Book.epub'"
+    with mock.patch('shlex.join') as mock_join, \
+            mock.patch.object(calibre_cli.logger, 'isEnabledFor', return_value=False):
+        calibre_cli.logger.info("Command: %s", calibre_cli._LazyJoin(['x']))
+    mock_join.assert_not_called()
 
 def test_run_calibre_command_empty_command_list():
     with pytest.raises(ValueError, match="Command list cannot be empty."):
         run_calibre_command([])
 
+@mock.patch('subprocess.Popen')
+def test_run_calibre_command_rejects_string_command(mock_popen_cls):
+    with pytest.raises(TypeError, match="list of arguments"):
+        run_calibre_command("web2disk https://en.wikipedia.org/wiki/EPUB")
+    mock_popen_cls.assert_not_called()
+
+# --- Tests for run_calibre_commands_batch ---
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_run_calibre_commands_batch_preserves_order(mock_run_cmd):
+    mock_run_cmd.side_effect = lambda command, timeout, binary: (command[-1], "", 0)
+    results = run_calibre_commands_batch([['mytool', 'a'], ['mytool', 'b'], ['mytool', 'c']], timeout=5)
+    assert results == [("a", "", 0), ("b", "", 0), ("c", "", 0)]
+    mock_run_cmd.assert_any_call(['mytool', 'b'], 5, False)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_run_calibre_commands_batch_errors(mock_run_cmd):
+    error = CalibreCLIError("mytool command timed out.", returncode=-1)
+
+    def fake_run(command, timeout, binary):
+        if command[-1] == 'bad':
+            raise error
+        return ("ok", "", 0)
+    mock_run_cmd.side_effect = fake_run
+
+    with pytest.raises(CalibreCLIError, match="timed out"):
+        run_calibre_commands_batch([['mytool', 'good'], ['mytool', 'bad']])
+
+    results = run_calibre_commands_batch([['mytool', 'good'], ['mytool', 'bad']], return_exceptions=True)
+    assert results == [("ok", "", 0), error]
+
+# --- Tests for run_calibre_command_async ---
+
+def mock_async_process(stdout=b"", stderr=b"", returncode=0):
+    process = mock.Mock()
+    process.communicate = mock.AsyncMock(return_value=(stdout, stderr))
+    process.wait = mock.AsyncMock(return_value=returncode)
+    process.returncode = returncode
+    return process
+
+@mock.patch('asyncio.create_subprocess_exec', new_callable=mock.AsyncMock)
+def test_run_calibre_command_async_success(mock_exec):
+    mock_exec.return_value = mock_async_process(stdout=b"Success output\n", returncode=0)
+    stdout, stderr, retcode = asyncio.run(run_calibre_command_async(['mytool', '--arg']))
+    assert (stdout, stderr, retcode) == ("Success output", "", 0)
+    mock_exec.assert_called_once_with(
+        '/usr/bin/mytool', '--arg', stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        close_fds=True, start_new_session=True
+    )
+
+@mock.patch('asyncio.create_subprocess_exec', new_callable=mock.AsyncMock)
+def test_run_calibre_command_async_failure_returncode(mock_exec):
+    mock_exec.return_value = mock_async_process(stderr=b"Error output", returncode=1)
+    stdout, stderr, retcode = asyncio.run(run_calibre_command_async(['mytool', '--fail']))
+    assert (stdout, stderr, retcode) == ("", "Error output", 1)
+
+@mock.patch('asyncio.create_subprocess_exec', new_callable=mock.AsyncMock,
+            side_effect=FileNotFoundError("mytool not found"))
+def test_run_calibre_command_async_file_not_found(mock_exec):
+    with pytest.raises(FileNotFoundError, match="mytool command not found"):
+        asyncio.run(run_calibre_command_async(['mytool']))
+
+@mock.patch('os.killpg')
+@mock.patch('asyncio.create_subprocess_exec', new_callable=mock.AsyncMock)
+def test_run_calibre_command_async_timeout_kills_process(mock_exec, mock_killpg):
+    process = mock_async_process()
+    async def hang():
+        await asyncio.sleep(10)
+    process.communicate = mock.Mock(side_effect=hang)
+    mock_exec.return_value = process
+
+    with pytest.raises(CalibreCLIError, match="mytool command timed out."):
+        asyncio.run(run_calibre_command_async(['mytool'], timeout=0.01))
+    mock_killpg.assert_any_call(process.pid, signal.SIGTERM)
+    mock_killpg.assert_called_with(process.pid, signal.SIGKILL)
+    process.wait.assert_awaited()
+
+def test_run_calibre_command_async_empty_command_list():
+    with pytest.raises(ValueError, match="Command list cannot be empty."):
+        asyncio.run(run_calibre_command_async([]))
+
+# --- Tests for CalibreWorkerPool ---
+
+def test_calibre_worker_handle_captures_output_and_exit_code():
+    from calibre_api.app import calibre_worker
+    ok = calibre_worker.handle({'argv': ['calibre-debug', '-c', "print('hello')"]})
+    assert ok == {'stdout': 'hello\n', 'stderr': '', 'returncode': 0}
+    failed = calibre_worker.handle({'argv': ['calibre-debug', '-c', "import sys; sys.exit(3)"]})
+    assert failed['returncode'] == 3
+    unsupported = calibre_worker.handle({'argv': ['web2disk', 'http://example.com', 'out.recipe']})
+    assert unsupported['returncode'] == 1
+    assert "Unsupported tool: web2disk" in unsupported['stderr']
+
+def test_calibre_worker_entry_points_see_request_argv():
+    from calibre_api.app import calibre_worker
+    fake_module = mock.Mock()
+    # Mimics Calibre's `def main(args=sys.argv)`, whose default is bound at import time.
+    fake_module.main.side_effect = lambda args=sys.argv: print(args[1:]) or 0
+    with mock.patch('importlib.import_module', return_value=fake_module):
+        response = calibre_worker.handle({'argv': ['ebook-meta', 'book.epub', '--title', 'X']})
+    assert response == {'stdout': "['book.epub', '--title', 'X']\n", 'stderr': '', 'returncode': 0}
+    assert sys.argv[1:3] != ['book.epub', '--title'] # Restored afterwards
+
+def test_calibre_worker_open_libraries_reuses_and_reopens(tmp_path):
+    from calibre_api.app import calibre_worker
+    opened = []
+    def opener(path):
+        db = mock.Mock(name=path)
+        opened.append(db)
+        return db
+    library = tmp_path / "lib"
+    library.mkdir()
+    metadata_db = library / "metadata.db"
+    metadata_db.write_bytes(b"v1")
+    libraries = calibre_worker.OpenLibraries(maxsize=1, opener=opener)
+
+    first = libraries.get(str(library))
+    assert libraries.get(str(library)) is first
+    # A write by another process is noticed and the library is reopened.
+    os.utime(metadata_db, ns=(1, 1))
+    second = libraries.get(str(library))
+    assert second is not first
+    first.close.assert_called_once()
+    # Our own writes are recorded by sync() and do not force a reopen.
+    os.utime(metadata_db, ns=(2, 2))
+    libraries.sync()
+    assert libraries.get(str(library)) is second
+    # Only `maxsize` libraries stay open.
+    libraries.get(str(tmp_path))
+    second.close.assert_called_once()
+    assert len(opened) == 3
+
+def test_calibre_worker_open_libraries_closes_idle(tmp_path):
+    from calibre_api.app import calibre_worker
+    libraries = calibre_worker.OpenLibraries(idle_timeout=0.0, opener=lambda path: mock.Mock())
+    first = libraries.get(str(tmp_path))
+    assert libraries.get(str(tmp_path)) is not first
+    first.close.assert_called_once()
+
+@pytest.fixture
+def fake_calibre_debug(tmp_path):
+    # `calibre-debug -e <script>` stand-in that runs the worker script under this interpreter.
+    executable = tmp_path / "calibre-debug"
+    executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "$2"\n')
+    executable.chmod(0o755)
+    with mock.patch('calibre_api.app.calibre_cli._resolve_executable', return_value=str(executable)):
+        yield executable
+
+def test_worker_pool_handles():
+    pool = calibre_cli.CalibreWorkerPool(size=1)
+    assert pool.handles(['ebook-meta', 'book.epub'])
+    assert pool.handles(['ebook-convert', 'a.epub', 'b.mobi'])
+    assert pool.handles(['calibre-debug', '-c', 'print(1)'])
+    assert pool.handles(['calibredb', 'list', '--for-machine'])
+    assert not pool.handles(['calibre-debug', '--test-build'])
+    assert not pool.handles(['calibredb', 'export', '--to-stdout', '--format', 'epub', '5'])
+    assert not pool.handles(['web2disk', 'http://example.com', 'out.recipe'])
+
+def test_read_reply_line_reads_past_stream_limit():
+    async def scenario():
+        stream = asyncio.StreamReader(limit=8)
+        stream.feed_data(b'{"stdout": "' + b'x' * 100 + b'"}\nnext\n')
+        stream.feed_eof()
+        return await calibre_cli._read_reply_line(stream), await calibre_cli._read_reply_line(stream)
+    first, second = asyncio.run(scenario())
+    assert first == b'{"stdout": "' + b'x' * 100 + b'"}\n'
+    assert second == b'next\n'
+
+@pytest.mark.skipif(os.name != 'posix', reason="fake calibre-debug is a shell script")
+def test_worker_pool_reuses_worker_and_replaces_it_after_timeout(fake_calibre_debug):
+    get_pid = ['calibre-debug', '-c', 'import os; print(os.getpid())']
+
+    async def scenario():
+        pool = calibre_cli.CalibreWorkerPool(size=1)
+        try:
+            first = await pool.call(get_pid)
+            second = await pool.call(get_pid)
+            with pytest.raises(CalibreCLIError, match="calibre-debug command timed out.") as exc_info:
+                await pool.call(['calibre-debug', '-c', 'import time; time.sleep(30)'], timeout=0.5)
+            third = await pool.call(get_pid)
+            return first, second, third, exc_info.value.returncode
+        finally:
+            await pool.close()
+
+    first, second, third, timeout_returncode = asyncio.run(scenario())
+    assert first == second # Served by the same long-lived interpreter
+    assert first[0].isdigit() and first[1:] == ("", 0)
+    assert third[0] != first[0] # The hung worker was killed and replaced
+    assert timeout_returncode == -1
+
+def test_worker_pool_resends_command_when_idle_worker_is_gone():
+    gone = mock.Mock(returncode=None, pid=1)
+    gone.stdin.drain = mock.AsyncMock(side_effect=BrokenPipeError("Broken pipe"))
+    gone.wait = mock.AsyncMock(return_value=-9)
+    fresh = mock.Mock(returncode=None, pid=2)
+    fresh.stdin.drain = mock.AsyncMock()
+    fresh.stdout.readuntil = mock.AsyncMock(
+        return_value=b'{"stdout": "converted\\n", "stderr": "", "returncode": 0}\n'
+    )
+
+    async def scenario():
+        pool = calibre_cli.CalibreWorkerPool(size=1)
+        spawned = iter([gone, fresh])
+
+        async def spawn():
+            process = next(spawned)
+            pool._calls[process] = 0
+            return process
+
+        with mock.patch.object(pool, '_spawn', side_effect=spawn), mock.patch('os.killpg'):
+            return await pool.call(['ebook-convert', 'in.epub', 'out.mobi'])
+
+    assert asyncio.run(scenario()) == ("converted", "", 0)
+    assert json.loads(fresh.stdin.write.call_args.args[0]) == {'argv': ['ebook-convert', 'in.epub', 'out.mobi']}
+
+@pytest.mark.skipif(os.name != 'posix', reason="fake calibre-debug is a shell script")
+def test_worker_pool_stops_idle_workers(fake_calibre_debug):
+    get_pid = ['calibre-debug', '-c', 'import os; print(os.getpid())']
+
+    async def scenario():
+        pool = calibre_cli.CalibreWorkerPool(size=1, idle_timeout=0.05)
+        try:
+            first = await pool.call(get_pid)
+            await asyncio.sleep(0.5)
+            stopped = not pool._calls
+            second = await pool.call(get_pid)
+            return first, second, stopped
+        finally:
+            await pool.close()
+
+    first, second, stopped = asyncio.run(scenario())
+    assert stopped
+    assert second[0] != first[0] # A new worker was started on demand
+
+@pytest.mark.skipif(os.name != 'posix', reason="fake calibre-debug is a shell script")
+def test_worker_pool_warm_starts_workers_ahead_of_demand(fake_calibre_debug):
+    get_pid = ['calibre-debug', '-c', 'import os; print(os.getpid())']
+
+    async def scenario():
+        pool = calibre_cli.CalibreWorkerPool(size=2)
+        pool.WARM_UP_COMMAND = ('calibre-debug', '-c', 'import json') # No calibre package here
+        try:
+            ready = await pool.warm()
+            started = set(pool._calls)
+            with mock.patch('asyncio.create_subprocess_exec') as spawn:
+                pids = await asyncio.gather(pool.call(get_pid), pool.call(get_pid))
+            return ready, started, pids, spawn.call_count
+        finally:
+            await pool.close()
+
+    ready, started, pids, spawned = asyncio.run(scenario())
+    assert ready == 2 and len(started) == 2
+    assert spawned == 0 # Both commands were served by the warmed workers
+    assert {int(pid) for pid, _, _ in pids} == {p.pid for p in started}
+
+@pytest.mark.skipif(os.name != 'posix', reason="fake calibre-debug is a shell script")
+def test_run_calibre_command_async_uses_enabled_worker_pool(fake_calibre_debug):
+    async def scenario():
+        calibre_cli.enable_worker_pool(size=1)
+        try:
+            with mock.patch('asyncio.create_subprocess_exec', wraps=asyncio.create_subprocess_exec) as spawn:
+                results = [await run_calibre_command_async(['calibre-debug', '-c', 'print(6 * 7)']) for _ in range(3)]
+            return results, spawn.call_count
+        finally:
+            await calibre_cli.disable_worker_pool()
+
+    results, spawn_count = asyncio.run(scenario())
+    assert results == [("42", "", 0)] * 3
+    assert spawn_count == 1 # One worker start, no per-command process
+    assert calibre_cli._worker_pool is None
+
 # --- Tests for get_calibre_version ---
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
@@ -89,6 +472,28 @@ def test_get_calibre_version_failure(mock_run_cmd):
     with pytest.raises(CalibreCLIError, match="Failed to get Calibre version."):
         get_calibre_version()
 
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_get_calibre_version_is_cached(mock_run_cmd):
+    mock_run_cmd.return_value = ("calibre 6.10.0", "", 0)
+    assert get_calibre_version() == "6.10.0"
+    assert get_calibre_version() == "6.10.0"
+    mock_run_cmd.assert_called_once()
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_get_calibre_version_info(mock_run_cmd):
+    mock_run_cmd.return_value = ("calibre (calibre 6.11.0)\nCopyright Kovid Goyal", "", 0)
+    assert get_calibre_version_info() == (6, 11, 0)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+def test_get_calibre_version_async_concurrent_calls_spawn_once(mock_run_cmd_async):
+    mock_run_cmd_async.return_value = ("calibre 6.10.0", "", 0)
+
+    async def call_many():
+        return await asyncio.gather(*(get_calibre_version_async() for _ in range(5)))
+
+    assert asyncio.run(call_many()) == ["6.10.0"] * 5
+    mock_run_cmd_async.assert_awaited_once()
+
 # --- Tests for ebook_convert ---
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
@@ -103,7 +508,8 @@ def test_ebook_convert_success(mock_os_exists, mock_run_cmd):
     mock_os_exists.assert_any_call("input.epub") # First check for input
     mock_os_exists.assert_any_call("output.mobi") # After command, check for output
     mock_run_cmd.assert_called_once_with(
-        ['ebook-convert', 'input.epub', 'output.mobi', '--foo', 'bar'], timeout=300
+        ['ebook-convert', 'input.epub', 'output.mobi', '--foo', 'bar'], timeout=300, binary=True,
+        max_output=calibre_cli.MAX_COMMAND_OUTPUT_BYTES
     )
 
 @mock.patch('os.path.exists', return_value=False)
@@ -129,52 +535,187 @@ def test_ebook_convert_output_file_not_created(mock_os_exists, mock_run_cmd):
         ebook_convert("input.epub", "output.mobi")
 
 
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+@mock.patch('os.path.exists', return_value=True)
+def test_ebook_convert_async_success(mock_os_exists, mock_run_cmd_async):
+    mock_run_cmd_async.return_value = ("Conversion successful", "", 0)
+    result = asyncio.run(ebook_convert_async("input.epub", "output.mobi", options=["--foo", "bar"]))
+    assert result == "output.mobi"
+    mock_run_cmd_async.assert_awaited_once_with(
+        ['ebook-convert', 'input.epub', 'output.mobi', '--foo', 'bar'], timeout=300, binary=True
+    )
+
+@mock.patch('os.path.exists', return_value=True)
+def test_ebook_convert_many_limits_concurrency_and_keeps_order(mock_os_exists):
+    running, peak = 0, 0
+
+    async def fake_run(command, timeout=60, binary=False):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # Later jobs finish first, so ordering must come from the input, not completion.
+        await asyncio.sleep(0.01 * (5 - int(command[1][3])))
+        running -= 1
+        return ("", "", 0)
+
+    conversions = [(f"in_{i}.epub", f"out_{i}.mobi", None) for i in range(5)]
+    with mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', side_effect=fake_run):
+        results = asyncio.run(calibre_cli.ebook_convert_many(conversions, max_concurrency=2))
+    assert results == [f"out_{i}.mobi" for i in range(5)]
+    assert peak == 2
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', return_value=True)
+def test_batch_ebook_convert(mock_os_exists, mock_run_cmd):
+    mock_run_cmd.side_effect = lambda command, timeout, binary: (b"", b"boom", 1) if command[1] == "b.epub" else ("", "", 0)
+    conversions = [("a.epub", "a.mobi", None), ("b.epub", "b.mobi", None), ("c.epub", "c.mobi", ["--foo"])]
+
+    results = calibre_cli.batch_ebook_convert(conversions, return_exceptions=True)
+    assert results[0] == "a.mobi" and results[2] == "c.mobi"
+    assert isinstance(results[1], CalibreCLIError)
+    mock_run_cmd.assert_any_call(['ebook-convert', 'c.epub', 'c.mobi', '--foo'], 300, True)
+
+    with pytest.raises(CalibreCLIError, match="ebook-convert failed for b.epub to b.mobi."):
+        calibre_cli.batch_ebook_convert(conversions)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+@mock.patch('os.path.exists', return_value=True)
+def test_ebook_convert_many_return_exceptions(mock_os_exists, mock_run_cmd_async):
+    mock_run_cmd_async.side_effect = [("", "", 0), ("", "boom", 1)]
+    conversions = [("a.epub", "a.mobi", None), ("b.epub", "b.mobi", ["--foo"])]
+    results = asyncio.run(calibre_cli.ebook_convert_many(conversions, return_exceptions=True))
+    assert results[0] == "a.mobi"
+    assert isinstance(results[1], CalibreCLIError)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+def test_get_calibre_version_async_success(mock_run_cmd_async):
+    mock_run_cmd_async.return_value = ("calibre (calibre 6.11.0)", "", 0)
+    assert asyncio.run(get_calibre_version_async()) == "6.11.0"
+
 # --- Tests for get_ebook_metadata ---
 # These tests become more complex due to file operations (temp OPF, reading OPF)
 # We'll mock os.path.exists, open, os.remove, and xml.etree.ElementTree
 
+# Minimal OPF as written by `ebook-meta --to-opf` / `fetch-ebook-metadata --opf`.
+SAMPLE_OPF = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="uuid_id" version="2.0">\n'
+    '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">\n'
+    '    <dc:title>{title}</dc:title>\n'
+    '    <dc:creator opf:role="aut">Author One</dc:creator>\n'
+    '    <dc:creator opf:role="aut">Author Two</dc:creator>\n'
+    '    <!-- calibre writes comments here sometimes -->\n'
+    '    <dc:language>eng</dc:language>\n'
+    '  </metadata>\n'
+    '  <guide/>\n'
+    '</package>\n'
+)
+SAMPLE_OPF_DICT = {"creator": ["Author One", "Author Two"], "language": "eng"}
+
+def test_parse_opf_to_dict():
+    opf = SAMPLE_OPF.format(title="Parsed Title").encode('utf-8')
+    assert calibre_cli._parse_opf_to_dict(opf) == {"title": "Parsed Title", **SAMPLE_OPF_DICT}
+
+def test_parse_opf_to_dict_strips_text():
+    opf = SAMPLE_OPF.format(title="\n      Padded Title  ").encode('utf-8')
+    assert calibre_cli._parse_opf_to_dict(opf)["title"] == "Padded Title"
+
+def test_parse_opf_to_dict_streams_files(tmp_path):
+    opf_file = tmp_path / "metadata.opf"
+    # Not UTF-8: the parser must pick the encoding up from the XML declaration.
+    opf_file.write_bytes(
+        SAMPLE_OPF.format(title="Caf\u00e9").replace('encoding="utf-8"', 'encoding="iso-8859-1"').encode('latin-1')
+    )
+    assert calibre_cli._parse_opf_to_dict(str(opf_file))["title"] == "Caf\u00e9"
+    with open(opf_file, 'rb') as stream:
+        assert calibre_cli._parse_opf_to_dict(stream)["title"] == "Caf\u00e9"
+
+def test_parse_opf_to_dict_without_metadata():
+    assert calibre_cli._parse_opf_to_dict(b'<package xmlns="http://www.idpf.org/2007/opf"/>') == {}
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_get_ebook_metadata_as_json_is_cached_until_file_changes(mock_run_cmd, tmp_path):
+    book = tmp_path / "book.epub"
+    book.write_bytes(b"epub bytes")
+    mock_run_cmd.return_value = (json.dumps({"title": "First"}), "", 0)
+
+    first = get_ebook_metadata(str(book), as_json=True)
+    first["title"] = "Modified by caller"
+    assert get_ebook_metadata(str(book), as_json=True) == {"title": "First"}
+    assert mock_run_cmd.call_count == 1
+
+    book.write_bytes(b"rewritten epub bytes") # New size (and mtime): the cached entry no longer applies
+    mock_run_cmd.return_value = (json.dumps({"title": "Second"}), "", 0)
+    assert get_ebook_metadata(str(book), as_json=True) == {"title": "Second"}
+    assert mock_run_cmd.call_count == 2
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_get_ebook_metadata_as_json_is_cached_by_content(mock_run_cmd, tmp_path):
+    for name in ("upload1_book.epub", "upload2_book.epub"):
+        (tmp_path / name).write_bytes(b"epub bytes")
+    mock_run_cmd.return_value = (json.dumps({"title": "Same book"}), "", 0)
+    assert get_ebook_metadata(str(tmp_path / "upload1_book.epub"), as_json=True) == {"title": "Same book"}
+    assert get_ebook_metadata(str(tmp_path / "upload2_book.epub"), as_json=True) == {"title": "Same book"}
+    assert mock_run_cmd.call_count == 1
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_get_ebook_metadata_as_json_is_cached_per_extension(mock_run_cmd, tmp_path):
+    for name in ("book.epub", "book.txt"):
+        (tmp_path / name).write_bytes(b"same bytes")
+    mock_run_cmd.side_effect = [(json.dumps({"title": "Epub"}), "", 0), (json.dumps({"title": "book"}), "", 0)]
+    assert get_ebook_metadata(str(tmp_path / "book.epub"), as_json=True) == {"title": "Epub"}
+    assert get_ebook_metadata(str(tmp_path / "book.txt"), as_json=True) == {"title": "book"}
+    assert mock_run_cmd.call_count == 2
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+def test_get_ebook_metadata_async_shares_cache(mock_run_cmd_async, tmp_path):
+    book = tmp_path / "book.epub"
+    book.write_bytes(b"epub bytes")
+    mock_run_cmd_async.return_value = (json.dumps({"title": "Cached"}), "", 0)
+    assert asyncio.run(calibre_cli.get_ebook_metadata_async(str(book), as_json=True)) == {"title": "Cached"}
+    with mock.patch('calibre_api.app.calibre_cli.run_calibre_command') as mock_run_cmd:
+        assert get_ebook_metadata(str(book), as_json=True) == {"title": "Cached"}
+        mock_run_cmd.assert_not_called()
+
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 @mock.patch('os.path.exists', return_value=True) # Assume ebook file exists
-@mock.patch('builtins.open', new_callable=mock.mock_open, read_data='<metadata/>') # Mock open for reading OPF
-@mock.patch('xml.etree.ElementTree.fromstring')
-@mock.patch('tempfile.NamedTemporaryFile')
-@mock.patch('os.remove')
-def test_get_ebook_metadata_as_json_success(
-    mock_os_remove, mock_tempfile, mock_xml_fromstring, mock_file_open, mock_os_exists, mock_run_cmd
-):
-    # Setup for temp file used when as_json=True and no output_opf_file
-    mock_tmp_file_obj = mock.Mock()
-    mock_tmp_file_obj.name = "temp.opf"
-    mock_tempfile.return_value.__enter__.return_value = mock_tmp_file_obj
-
-    mock_run_cmd.return_value = ("", "", 0) # ebook-meta --to-opf outputs nothing to stdout
-
-    # Mock XML parsing
-    mock_et_root = mock.Mock()
-    mock_metadata_node = mock.Mock()
-    mock_title_node = mock.Mock()
-    mock_title_node.tag = "{http://purl.org/dc/elements/1.1/}title"
-    mock_title_node.text = "Test Title"
-    mock_metadata_node.findall = mock.Mock(return_value=[mock_title_node]) # Simplified findall
-    mock_metadata_node.__iter__ = mock.Mock(return_value=iter([mock_title_node]))
-
-    # Correctly mock finding the metadata node
-    # ET's find method needs to be mocked on the root element that fromstring returns
-    def find_side_effect(path, ns):
-        if path == 'opf:metadata':
-            return mock_metadata_node
-        return None
-    mock_et_root.find = mock.Mock(side_effect=find_side_effect)
-    mock_xml_fromstring.return_value = mock_et_root
-
-    # Mock os.path.getsize for the temp OPF file
-    with mock.patch('os.path.getsize', return_value=100): # Non-empty file
-        result = get_ebook_metadata("book.epub", as_json=True)
-
-    assert result == {"title": "Test Title"}
-    mock_run_cmd.assert_called_once_with(['ebook-meta', 'book.epub', '--to-opf', 'temp.opf'])
-    mock_file_open.assert_called_with('temp.opf', 'r', encoding='utf-8')
-    mock_os_remove.assert_called_with('temp.opf') # Ensure temp file is cleaned up
+def test_get_ebook_metadata_as_json_success(mock_os_exists, mock_run_cmd):
+    # calibre-debug may log before the result; only the last line is the JSON payload.
+    mock_run_cmd.return_value = (
+        'Some calibre log line\n{"title": "Test Title", "authors": ["Author One", "Author Two"]}', "", 0
+    )
+
+    result = get_ebook_metadata("book.epub", as_json=True)
+
+    assert result == {"title": "Test Title", "authors": ["Author One", "Author Two"]}
+    mock_run_cmd.assert_called_once()
+    command = mock_run_cmd.call_args[0][0]
+    assert command[:2] == ['calibre-debug', '-c']
+    assert command[2].startswith("path = 'book.epub'\n")
+    assert mock_run_cmd.call_args.kwargs == {'binary': True}
+    compile(command[2], '<calibre-debug -c>', 'exec') # The generated script must be valid Python
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', return_value=True)
+def test_get_ebook_metadata_as_json_parses_raw_bytes(mock_os_exists, mock_run_cmd):
+    mock_run_cmd.return_value = (
+        b'log line\n{"title": "Caf\xc3\xa9", "authors": ["A"]}\n', b"", 0
+    )
+    assert get_ebook_metadata("book.epub", as_json=True) == {"title": "Caf\u00e9", "authors": ["A"]}
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', return_value=True)
+def test_get_ebook_metadata_as_json_invalid_output(mock_os_exists, mock_run_cmd):
+    mock_run_cmd.return_value = ("Traceback: not json", "", 0)
+    with pytest.raises(CalibreCLIError, match="Failed to parse JSON output"):
+        get_ebook_metadata("book.epub", as_json=True)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', return_value=True)
+def test_get_ebook_metadata_as_json_cli_error(mock_os_exists, mock_run_cmd):
+    mock_run_cmd.return_value = ("", "Unsupported format", 1)
+    with pytest.raises(CalibreCLIError, match="calibre-debug failed to read metadata from book.epub"):
+        get_ebook_metadata("book.epub", as_json=True)
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 @mock.patch('os.path.exists', return_value=True)
@@ -182,7 +723,7 @@ def test_get_ebook_metadata_as_opf_string_success(mock_os_exists, mock_run_cmd):
     mock_run_cmd.return_value = ("<opf_content/>", "", 0) # ebook-meta prints to stdout
     result = get_ebook_metadata("book.epub", as_json=False, output_opf_file=None)
     assert result == "<opf_content/>"
-    mock_run_cmd.assert_called_once_with(['ebook-meta', 'book.epub'])
+    mock_run_cmd.assert_called_once_with(['ebook-meta', 'book.epub'], binary=False)
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 @mock.patch('os.path.exists', return_value=True)
@@ -193,7 +734,7 @@ def test_get_ebook_metadata_to_opf_file_success(mock_os_exists, mock_run_cmd):
     result = get_ebook_metadata("book.epub", output_opf_file="meta.opf", as_json=False)
 
     assert result == "meta.opf"
-    mock_run_cmd.assert_called_once_with(['ebook-meta', 'book.epub', '--to-opf', 'meta.opf'])
+    mock_run_cmd.assert_called_once_with(['ebook-meta', 'book.epub', '--to-opf', 'meta.opf'], binary=False)
     # os.path.exists(output_opf_file) is called twice in this path, once for input, once for output.
     # Here, the second call is for "meta.opf" within the wrapper.
     mock_os_exists.assert_any_call("meta.opf")
@@ -223,8 +764,8 @@ def test_set_ebook_metadata_no_options():
 # The structure will be similar: mock os.path.exists, run_calibre_command, and other OS/file ops.
 
 # --- Tests for list_calibre_plugins ---
-@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
-def test_list_calibre_plugins_success_parsing(mock_run_cmd):
+@mock.patch('calibre_api.app.calibre_cli.iter_calibre_command_lines')
+def test_list_calibre_plugins_success_parsing(mock_lines):
     mock_output = (
         "Plugin Alpha (1.0) by Author A\n"
         "  Description for Alpha.\n"
@@ -234,8 +775,11 @@ def test_list_calibre_plugins_success_parsing(mock_run_cmd):
         "NoNamePlugin\n" # Plugin with no version/author info in this format
         "  Just a description."
     )
-    mock_run_cmd.return_value = (mock_output, "", 0)
+    mock_lines.return_value = iter(mock_output.splitlines())
     plugins = list_calibre_plugins()
+    mock_lines.assert_called_once_with(
+        ['calibre-customize', '--list-plugins'], failure_message="Failed to list Calibre plugins."
+    )
 
     assert len(plugins) == 3
     assert "Plugin Alpha" in plugins
@@ -253,19 +797,64 @@ def test_list_calibre_plugins_success_parsing(mock_run_cmd):
     assert plugins["NoNamePlugin"]["author"] is None
     assert plugins["NoNamePlugin"]["description"] == "Just a description."
 
+@mock.patch('calibre_api.app.calibre_cli.iter_calibre_command_lines')
+def test_list_calibre_plugins_author_none_and_no_description(mock_lines):
+    mock_lines.return_value = iter(["Adobe Adept Remove (0.1.0) by None", "Bare Plugin (3.0)"])
+    plugins = list_calibre_plugins()
+    assert plugins["Adobe Adept Remove"] == {
+        'name': "Adobe Adept Remove", 'version': "0.1.0", 'author': None, 'description': None
+    }
+    assert plugins["Bare Plugin"]["version"] == "3.0"
 
-@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
-def test_list_calibre_plugins_empty_output(mock_run_cmd):
-    mock_run_cmd.return_value = ("", "", 0)
+
+@mock.patch('calibre_api.app.calibre_cli.iter_calibre_command_lines')
+def test_list_calibre_plugins_empty_output(mock_lines):
+    mock_lines.return_value = iter([])
     plugins = list_calibre_plugins()
     assert plugins == {}
 
-@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
-def test_list_calibre_plugins_cli_error(mock_run_cmd):
-    mock_run_cmd.return_value = ("", "Error", 1)
+@mock.patch('calibre_api.app.calibre_cli.iter_calibre_command_lines')
+def test_list_calibre_plugins_cli_error(mock_lines):
+    def failing_lines(command, failure_message):
+        yield "Plugin Alpha (1.0) by Author A"
+        raise CalibreCLIError(failure_message, stderr="Error", returncode=1)
+    mock_lines.side_effect = failing_lines
     with pytest.raises(CalibreCLIError, match="Failed to list Calibre plugins"):
         list_calibre_plugins()
 
+# --- Tests for iter_calibre_command_lines ---
+def test_iter_calibre_command_lines_streams_stdout():
+    lines = calibre_cli.iter_calibre_command_lines(['printf', 'one\\n  two\\n\\nthree'])
+    assert next(lines) == "one"
+    assert list(lines) == ["  two", "", "three"]
+
+def test_iter_calibre_command_lines_nonzero_exit():
+    with pytest.raises(CalibreCLIError, match="Custom failure") as excinfo:
+        list(calibre_cli.iter_calibre_command_lines(['false'], failure_message="Custom failure"))
+    assert excinfo.value.returncode == 1
+
+def test_iter_calibre_command_lines_timeout():
+    with pytest.raises(CalibreCLIError, match="sleep command timed out") as excinfo:
+        list(calibre_cli.iter_calibre_command_lines(['sleep', '5'], timeout=0.2))
+    assert excinfo.value.returncode == -1
+
+def test_iter_calibre_command_lines_kills_command_when_consumer_stops():
+    with mock.patch('calibre_api.app.calibre_cli._kill_tree', wraps=calibre_cli._kill_tree) as mock_kill:
+        lines = calibre_cli.iter_calibre_command_lines(['sh', '-c', 'echo first; exec sleep 5'])
+        assert next(lines) == "first"
+        lines.close()
+    mock_kill.assert_called_once()
+    assert mock_kill.call_args[0][0].poll() is not None
+
+def test_iter_calibre_command_chunks_yields_raw_bytes():
+    chunks = list(calibre_cli.iter_calibre_command_chunks(['printf', '[1,\\n2]\\377']))
+    assert all(isinstance(chunk, bytes) and chunk for chunk in chunks)
+    assert b"".join(chunks) == b"[1,\n2]\xff"
+
+def test_iter_calibre_command_chunks_nonzero_exit():
+    with pytest.raises(CalibreCLIError, match="Custom failure"):
+        list(calibre_cli.iter_calibre_command_chunks(['false'], failure_message="Custom failure"))
+
 # --- Tests for run_calibre_debug_test_build ---
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 def test_run_calibre_debug_test_build_success(mock_run_cmd):
@@ -285,15 +874,11 @@ def test_send_email_with_calibre_smtp_success(mock_run_cmd):
     )
     assert success is True
     assert message == "Email sent successfully."
-    expected_cmd_part = ['calibre-smtp', '--encryption-method', 'tls', '--port', '587',
-                         '--relay', 'smtp.host', '--subject', 'Test',
-                         '--username', 'user', '--password', 'pass',
-                         'to@example.com', 'Body']
-    # Attachment part is tricky due to exact command formation logic with empty attachment
-    # Check if the core parts are there.
-    called_args = mock_run_cmd.call_args[0][0]
-    assert all(item in called_args for item in expected_cmd_part if item != '--attachment' and item != "")
-    assert '--attachment' not in called_args # Since attachment_path was None
+    expected_cmd = ['calibre-smtp', '--encryption-method', 'tls', '--port', '587',
+                    '--relay', 'smtp.host', '--subject', 'Test',
+                    '--username', 'user', '--password', 'pass',
+                    'to@example.com', 'Body']
+    mock_run_cmd.assert_called_once_with(expected_cmd, timeout=60)
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 def test_send_email_with_calibre_smtp_with_attachment(mock_run_cmd):
@@ -304,8 +889,7 @@ def test_send_email_with_calibre_smtp_with_attachment(mock_run_cmd):
     )
     assert success
     called_args = mock_run_cmd.call_args[0][0]
-    assert '--attachment' in called_args
-    assert 'file.zip' in called_args
+    assert called_args[:3] == ['calibre-smtp', '--attachment', 'file.zip']
 
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
@@ -333,7 +917,7 @@ def test_check_ebook_errors_json_success_no_errors(mock_os_exists, mock_run_cmd)
 
     assert report == {abs_path: []}
     mock_run_cmd.assert_called_once_with(
-        ['ebook-edit', '--check-book', '--output-format=json', 'book.epub'], timeout=180
+        ['ebook-edit', '--check-book', '--output-format=json', 'book.epub'], timeout=180, binary=True
     )
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
@@ -343,7 +927,7 @@ def test_check_ebook_errors_text_success(mock_os_exists, mock_run_cmd):
     report = check_ebook_errors("book.epub", output_format="text")
     assert report == "No errors found."
     mock_run_cmd.assert_called_once_with(
-        ['ebook-edit', '--check-book', 'book.epub'], timeout=180 # No --output-format for text
+        ['ebook-edit', '--check-book', 'book.epub'], timeout=180, binary=False # No --output-format for text
     )
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
@@ -353,6 +937,62 @@ def test_check_ebook_errors_json_parse_error(mock_os_exists, mock_run_cmd):
     with pytest.raises(CalibreCLIError, match="Failed to parse JSON output"):
         check_ebook_errors("book.epub", output_format="json")
 
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+@mock.patch('os.path.exists', return_value=True)
+def test_check_ebook_errors_async_json(mock_os_exists, mock_run_cmd_async):
+    mock_run_cmd_async.return_value = (json.dumps({"book.epub": []}), "", 0)
+    report = asyncio.run(calibre_cli.check_ebook_errors_async("book.epub", output_format="json"))
+    assert report == {"book.epub": []}
+    mock_run_cmd_async.assert_awaited_once_with(
+        ['ebook-edit', '--check-book', '--output-format=json', 'book.epub'], timeout=180, binary=True
+    )
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', return_value=True)
+def test_check_ebook_errors_json_from_bytes(mock_os_exists, mock_run_cmd):
+    report = {"book.epub": [{"level": "error", "msg": "Caf\u00e9 is not closed"}]}
+    mock_run_cmd.return_value = (json.dumps(report).encode('utf-8') + b"\n", b"", 0)
+    assert check_ebook_errors("book.epub", output_format="json") == report
+
+    mock_run_cmd.return_value = (b"", b"Traceback: \xff broken\n", 1)
+    with pytest.raises(CalibreCLIError) as exc_info:
+        check_ebook_errors("book.epub", output_format="json")
+    assert exc_info.value.stderr == "Traceback: \ufffd broken" # Decoded only for the error report
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_check_ebook_errors_is_cached_by_content(mock_run_cmd, tmp_path):
+    book = tmp_path / "book.epub"
+    book.write_bytes(b"epub bytes")
+    report = {str(book): [{"level": "error", "msg": "first"}]}
+    mock_run_cmd.return_value = (json.dumps(report).encode('utf-8'), b"", 0)
+
+    first = check_ebook_errors(str(book), output_format="json")
+    first[str(book)].clear() # Callers get their own copy
+    assert check_ebook_errors(str(book), output_format="json") == report
+    assert mock_run_cmd.call_count == 1
+
+    book.write_bytes(b"epub bytes") # Rewritten with identical contents: still a hit
+    assert check_ebook_errors(str(book), output_format="json") == report
+    assert mock_run_cmd.call_count == 1
+
+    mock_run_cmd.return_value = ("No errors found", "", 0)
+    assert check_ebook_errors(str(book), output_format="text") == "No errors found" # Cached per format
+    book.write_bytes(b"fixed epub bytes")
+    mock_run_cmd.return_value = (b'{}', b"", 0)
+    assert check_ebook_errors(str(book), output_format="json") == {}
+    assert mock_run_cmd.call_count == 3
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_check_ebook_errors_cache_hits_at_a_new_path(mock_run_cmd, tmp_path):
+    first, second = tmp_path / "upload1_book.epub", tmp_path / "upload2_book.epub"
+    first.write_bytes(b"epub bytes")
+    second.write_bytes(b"epub bytes")
+    mock_run_cmd.return_value = (json.dumps({str(first): [{"msg": f"{first}: bad link"}]}).encode('utf-8'), b"", 0)
+    check_ebook_errors(str(first), output_format="json")
+
+    assert check_ebook_errors(str(second), output_format="json") == {str(second): [{"msg": f"{second}: bad link"}]}
+    assert mock_run_cmd.call_count == 1
+
 def test_check_ebook_errors_invalid_format(mock_os_exists):
     with pytest.raises(ValueError, match="output_format must be 'text' or 'json'"):
         check_ebook_errors("book.epub", output_format="xml")
@@ -369,7 +1009,8 @@ def test_ebook_polish_success(mock_os_exists, mock_run_cmd):
     result = ebook_polish("book.epub", output_file_path="polished_book.epub", options=["--subset-fonts"])
     assert result == "polished_book.epub"
     mock_run_cmd.assert_called_once_with(
-        ['ebook-polish', 'book.epub', 'polished_book.epub', '--subset-fonts'], timeout=300
+        ['ebook-polish', 'book.epub', 'polished_book.epub', '--subset-fonts'], timeout=300, binary=True,
+        max_output=calibre_cli.MAX_COMMAND_OUTPUT_BYTES
     )
     # os.path.exists will be called for input and output
     mock_os_exists.assert_any_call("book.epub")
@@ -385,62 +1026,93 @@ def test_ebook_polish_output_not_created(mock_os_exists, mock_run_cmd):
 
 # Example for fetch_ebook_metadata
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
-@mock.patch('xml.etree.ElementTree.fromstring')
-@mock.patch('tempfile.NamedTemporaryFile')
-@mock.patch('os.remove')
-@mock.patch('builtins.open', new_callable=mock.mock_open, read_data='<metadata><dc:title>Fetched Title</dc:title></metadata>')
-@mock.patch('os.path.exists', return_value=True) # For temp OPF file
-@mock.patch('os.path.getsize', return_value=100) # For temp OPF file
-def test_fetch_ebook_metadata_as_json_success(
-    mock_os_getsize, mock_os_exists, mock_file_open, mock_os_remove, mock_tempfile, mock_xml_fromstring, mock_run_cmd
-):
-    mock_tmp_file_obj = mock.Mock()
-    mock_tmp_file_obj.name = "fetched_temp.opf"
-    mock_tempfile.return_value.__enter__.return_value = mock_tmp_file_obj
-
-    mock_run_cmd.return_value = ("", "", 0) # Command outputs to OPF file
-
-    mock_et_root = mock.Mock()
-    mock_metadata_node = mock.Mock()
-    mock_title_node = mock.Mock()
-    mock_title_node.tag = "{http://purl.org/dc/elements/1.1/}title" # Note: actual ns might vary slightly based on ET version or OPF specifics
-    mock_title_node.text = "Fetched Title"
-    mock_metadata_node.__iter__ = mock.Mock(return_value=iter([mock_title_node]))
-    def find_side_effect(path, ns):
-        if path == 'opf:metadata': return mock_metadata_node
-        return None
-    mock_et_root.find = mock.Mock(side_effect=find_side_effect)
-    mock_xml_fromstring.return_value = mock_et_root
+def test_fetch_ebook_metadata_as_json_success(mock_run_cmd):
+    # With --opf the OPF document is printed to stdout
+    mock_run_cmd.return_value = (SAMPLE_OPF.format(title="Fetched Title"), "", 0)
 
     result = fetch_ebook_metadata(title="Some Book", as_json=True)
-    assert result == {"title": "Fetched Title"}
-    mock_run_cmd.assert_called_once() # Check specific args if needed
-    args, _ = mock_run_cmd.call_args
-    assert args[0][:3] == ['fetch-ebook-metadata', '--title', 'Some Book']
-    assert '--opf' in args[0]
-    assert args[0][args[0].index('--opf') + 1] == "fetched_temp.opf"
+    assert result == {"title": "Fetched Title", **SAMPLE_OPF_DICT}
+    mock_run_cmd.assert_called_once_with(
+        ['fetch-ebook-metadata', '--title', 'Some Book', '--timeout', '60', '--opf'], timeout=70
+    )
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_fetch_ebook_metadata_to_opf_file(mock_run_cmd, tmp_path):
+    opf = SAMPLE_OPF.format(title="Fetched Title")
+    mock_run_cmd.return_value = (opf, "", 0)
+    target = tmp_path / "fetched.opf"
+
+    result = fetch_ebook_metadata(isbn="978-0618640157", output_opf_file=str(target))
+    assert result == str(target)
+    assert target.read_text(encoding='utf-8') == opf
 
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 def test_fetch_ebook_metadata_no_results(mock_run_cmd):
     mock_run_cmd.return_value = ("", "No metadata found for query", 1) # Or specific error code/stderr
-    with pytest.raises(CalibreCLIError, match="No metadata found for the given criteria."):
+    with pytest.raises(CalibreCLIError, match="No metadata found for the given criteria.") as excinfo:
         fetch_ebook_metadata(title="Unknown Book")
+    assert excinfo.value.message == "No metadata found for the given criteria."
+
+@mock.patch('asyncio.sleep', new_callable=mock.AsyncMock)
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+def test_fetch_ebook_metadata_many_retries_rate_limited_lookups(mock_run_cmd_async, mock_sleep):
+    opf = "<package/>"
+    replies = {
+        "A": [("", "HTTP Error 429: Too Many Requests", 1), (opf, "", 0)], # Succeeds on retry
+        "B": [("", "No metadata found", 1)], # Not retried
+    }
+    mock_run_cmd_async.side_effect = lambda command, timeout: replies[command[command.index('--title') + 1]].pop(0)
+    results = asyncio.run(calibre_cli.fetch_ebook_metadata_many(
+        [{"title": "A"}, {"title": "B"}], max_concurrency=1, return_exceptions=True
+    ))
+    assert results[0] == opf
+    assert isinstance(results[1], CalibreCLIError)
+    assert results[1].message == "No metadata found for the given criteria."
+    assert mock_run_cmd_async.await_count == 3
+    mock_sleep.assert_awaited_once_with(1.0)
+
+@mock.patch('time.sleep')
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_batch_fetch_ebook_metadata_gives_up_after_retries(mock_run_cmd, mock_sleep):
+    mock_run_cmd.return_value = ("", "429 Too Many Requests", 1)
+    with pytest.raises(CalibreCLIError, match="fetch-ebook-metadata command failed."):
+        calibre_cli.batch_fetch_ebook_metadata([{"isbn": "123"}], retries=2, backoff_seconds=0.5)
+    assert mock_run_cmd.call_count == 3
+    assert mock_sleep.call_args_list == [mock.call(0.5), mock.call(1.0)]
 
 # Example for web2disk
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
-@mock.patch('os.path.exists', side_effect=lambda p: True if p.endswith(".recipe") else False) # Output .recipe exists
-def test_web2disk_success(mock_os_exists, mock_run_cmd):
+def test_web2disk_success(mock_run_cmd, tmp_path):
+    recipe = tmp_path / "out.recipe"
+    recipe.write_text("class Recipe: pass") # Output .recipe exists and is non-empty
     mock_run_cmd.return_value = ("Recipe generated", "", 0)
-    result = web2disk("http://example.com", "out.recipe")
-    assert result == "out.recipe"
+    result = web2disk("http://example.com", str(recipe))
+    assert result == str(recipe)
     mock_run_cmd.assert_called_once_with(
-        ['web2disk', 'http://example.com', 'out.recipe'], timeout=300
+        ['web2disk', 'http://example.com', str(recipe)], timeout=300, binary=True,
+        max_output=calibre_cli.MAX_COMMAND_OUTPUT_BYTES
     )
 
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_web2disk_missing_or_empty_recipe(mock_run_cmd, tmp_path):
+    mock_run_cmd.return_value = ("Recipe generated", "", 0)
+    with pytest.raises(CalibreCLIError, match="was not created or is empty"):
+        web2disk("http://example.com", str(tmp_path / "missing.recipe"))
+    empty = tmp_path / "empty.recipe"
+    empty.write_text("")
+    with pytest.raises(CalibreCLIError, match="was not created or is empty"):
+        web2disk("http://example.com", str(empty))
+
 def test_web2disk_invalid_recipe_filename():
     with pytest.raises(ValueError, match="output_recipe_file must end with '.recipe'"):
         web2disk("http://example.com", "out.txt")
+    with pytest.raises(ValueError, match="output_recipe_file must end with '.recipe'"):
+        web2disk("http://example.com", "out.recipebackup")
+
+def test_build_web2disk_command_accepts_uppercase_extension():
+    command = calibre_cli._build_web2disk_command("http://example.com", "OUT.RECIPE", None)
+    assert command == ['web2disk', 'http://example.com', 'OUT.RECIPE']
 
 # Example for LRF converters (lrf2lrs, lrs2lrf)
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
@@ -449,7 +1121,7 @@ def test_lrf2lrs_success(mock_os_exists, mock_run_cmd):
     mock_run_cmd.return_value = ("", "", 0)
     result = lrf2lrs("in.lrf", "out.lrs")
     assert result == "out.lrs"
-    mock_run_cmd.assert_called_once_with(['lrf2lrs', 'in.lrf', 'out.lrs'], timeout=120)
+    mock_run_cmd.assert_called_once_with(['lrf2lrs', 'in.lrf', 'out.lrs'], timeout=120, binary=True)
 
 @mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
 @mock.patch('os.path.exists', side_effect=lambda p: True)
@@ -457,4 +1129,49 @@ def test_lrs2lrf_success(mock_os_exists, mock_run_cmd):
     mock_run_cmd.return_value = ("", "", 0)
     result = lrs2lrf("in.lrs", "out.lrf")
     assert result == "out.lrf"
-    mock_run_cmd.assert_called_once_with(['lrs2lrf', 'in.lrs', 'out.lrf'], timeout=120)
+    mock_run_cmd.assert_called_once_with(['lrs2lrf', 'in.lrs', 'out.lrf'], timeout=120, binary=True)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+def test_lrf2lrs_with_stat_skips_exists_check(mock_run_cmd, tmp_path):
+    (tmp_path / "in.lrf").write_bytes(b"LRF")
+    out = tmp_path / "out.lrs"
+    mock_run_cmd.side_effect = lambda command, **kwargs: (out.write_text("lrs"), ("", "", 0))[1]
+    with os.scandir(tmp_path) as entries:
+        entry = next(e for e in entries if e.name == "in.lrf")
+    with mock.patch('os.path.exists', wraps=os.path.exists) as mock_exists:
+        assert lrf2lrs(entry.path, str(out), input_stat=entry.stat()) == str(out)
+    assert mock.call(entry.path) not in mock_exists.call_args_list # Only the output is checked
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', side_effect=lambda p: True)
+def test_lrf2lrs_failure_decodes_output_for_error(mock_os_exists, mock_run_cmd):
+    mock_run_cmd.return_value = (b"", b"Not an LRF file \xff\n", 1)
+    with pytest.raises(CalibreCLIError, match="lrf2lrs failed for in.lrf to out.lrs.") as excinfo:
+        lrf2lrs("in.lrf", "out.lrs")
+    assert excinfo.value.stderr == "Not an LRF file \ufffd"
+    assert excinfo.value.stdout == ""
+
+def test_calibre_cli_error_decodes_output_when_read():
+    error = CalibreCLIError("failed", stdout=b"out\n", stderr=b"err \xff\n", returncode=1)
+    assert error._stderr == b"err \xff\n" # Nothing decoded until it is read
+    assert error.stderr == "err \ufffd"
+    assert error._stderr == "err \ufffd" # Decoded once
+    assert "Stdout: out" in str(error)
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command_async', new_callable=mock.AsyncMock)
+@mock.patch('os.path.exists', side_effect=lambda p: True)
+def test_lrf2lrs_and_lrs2lrf_async(mock_os_exists, mock_run_cmd_async):
+    mock_run_cmd_async.return_value = ("", "", 0)
+    assert asyncio.run(calibre_cli.lrf2lrs_async("in.lrf", "out.lrs")) == "out.lrs"
+    assert asyncio.run(calibre_cli.lrs2lrf_async("in.lrs", "out.lrf")) == "out.lrf"
+    assert mock_run_cmd_async.await_args_list == [
+        mock.call(['lrf2lrs', 'in.lrf', 'out.lrs'], timeout=120, binary=True),
+        mock.call(['lrs2lrf', 'in.lrs', 'out.lrf'], timeout=120, binary=True),
+    ]
+
+@mock.patch('calibre_api.app.calibre_cli.run_calibre_command')
+@mock.patch('os.path.exists', side_effect=lambda p: p != "missing.lrs")
+def test_lrf2lrs_output_not_created(mock_os_exists, mock_run_cmd):
+    mock_run_cmd.return_value = ("", "", 0)
+    with pytest.raises(CalibreCLIError, match="lrf2lrs completed but output file missing.lrs was not created."):
+        lrf2lrs("in.lrf", "missing.lrs")
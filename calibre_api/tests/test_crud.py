@@ -0,0 +1,631 @@
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import types
+from unittest import mock
+
+import pytest
+
+from calibre_api.app import calibre_cli, crud
+from calibre_api.app.crud import CalibredbError, list_books_async, remove_book_async
+from calibre_api.app.models import SetMetadataRequest
+
+
+@pytest.fixture(autouse=True)
+def clear_book_list_cache():
+    crud._book_list_cache.clear()
+    yield
+
+
+def test_calibredb_error_is_a_calibre_cli_error():
+    assert issubclass(CalibredbError, calibre_cli.CalibreCLIError)
+    error = CalibredbError("boom", stdout="out", stderr="err", returncode=2)
+    assert (error.message, error.stdout, error.stderr, error.returncode) == ("boom", "out", "err", 2)
+
+
+def test_list_books_async_uses_async_runner():
+    stdout = b'[{"id": 1, "title": "Dune"}]'
+    with mock.patch('calibre_api.app.crud.run_calibre_command_async',
+                    new=mock.AsyncMock(return_value=(stdout, b"", 0))) as mock_run:
+        books = asyncio.run(list_books_async(library_path="/lib", search_query="title:Dune"))
+
+    assert books == [{"id": 1, "title": "Dune"}]
+    mock_run.assert_awaited_once_with(
+        ["calibredb", "list", "--for-machine", "--with-library", "/lib",
+         "--fields", "title,authors,tags,series,series_index,pubdate,rating", "--search", "title:Dune"],
+        timeout=60, binary=True
+    )
+
+
+def test_list_books_async_parses_large_listings_off_the_event_loop():
+    stdout = json.dumps([{"id": i, "title": "x" * 100} for i in range(3000)]).encode()
+    assert len(stdout) >= crud._ASYNC_PARSE_INLINE_LIMIT
+
+    async def run():
+        with mock.patch('calibre_api.app.crud.run_calibre_command_async',
+                        new=mock.AsyncMock(return_value=(stdout, b"", 0))), \
+             mock.patch.object(asyncio.get_running_loop(), 'run_in_executor',
+                               wraps=asyncio.get_running_loop().run_in_executor) as executor:
+            books = await list_books_async(search_query="title:x")
+        return books, executor
+
+    books, executor = asyncio.run(run())
+    assert len(books) == 3000
+    assert crud._handle_list_books_result in [c.args[1] for c in executor.call_args_list]
+    assert all(c.args[0] is crud._EXEC for c in executor.call_args_list)
+
+
+def test_list_books_async_shares_concurrent_fetches():
+    started = []
+
+    async def fake_run(cmd, timeout, binary=False):
+        started.append(cmd)
+        await asyncio.sleep(0.05)
+        return b'[{"id": 1, "title": "Dune"}]', b"", 0
+
+    async def run():
+        with mock.patch('calibre_api.app.crud.run_calibre_command_async', side_effect=fake_run):
+            return await asyncio.gather(*(list_books_async(search_query="title:Dune") for _ in range(5)))
+
+    listings = asyncio.run(run())
+    assert len(started) == 1
+    assert all(books == [{"id": 1, "title": "Dune"}] for books in listings)
+    assert len({id(books[0]) for books in listings}) == 5 # Each caller got its own copy
+
+
+def test_remove_book_async_failure():
+    with mock.patch('calibre_api.app.crud.run_calibre_command_async',
+                    new=mock.AsyncMock(return_value=("", "library is locked", 1))):
+        with pytest.raises(CalibredbError) as excinfo:
+            asyncio.run(remove_book_async(7))
+
+    assert excinfo.value.returncode == 1
+    assert excinfo.value.stderr == "library is locked"
+
+
+def test_async_commands_limited_per_library():
+    running = {"/a": 0, "/b": 0}
+    peak = {"/a": 0, "/b": 0}
+
+    async def fake_run(cmd, timeout, binary=False):
+        library = cmd[cmd.index("--with-library") + 1]
+        running[library] += 1
+        peak[library] = max(peak[library], running[library])
+        await asyncio.sleep(0.01)
+        running[library] -= 1
+        return b'{"ok": true}', b"", 0
+
+    async def remove_many():
+        await asyncio.gather(*(
+            remove_book_async(book_id, library_path=library)
+            for library in ("/a", "/b") for book_id in range(1, 11)
+        ))
+
+    with mock.patch('calibre_api.app.crud.run_calibre_command_async', side_effect=fake_run):
+        asyncio.run(remove_many())
+
+    assert peak == {"/a": crud._MAX_CONCURRENT_COMMANDS_PER_LIBRARY, "/b": crud._MAX_CONCURRENT_COMMANDS_PER_LIBRARY}
+
+
+def test_remove_book_async_rejects_invalid_id():
+    with pytest.raises(ValueError):
+        asyncio.run(remove_book_async(0))
+
+
+def test_remove_books_bulk_uses_one_command():
+    stdout = b'{"ok": true, "num_removed": 3, "removed_ids": [1, 2, 3]}'
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(stdout, b"", 0)) as mock_run:
+        result = crud.remove_books_bulk([1, 2, 3], library_path="/lib")
+
+    assert result["removed_ids"] == [1, 2, 3]
+    mock_run.assert_called_once_with(
+        ["calibredb", "remove_books", "--permanent", "--for-machine", "1,2,3", "--with-library", "/lib"],
+        timeout=60, binary=True
+    )
+
+
+def test_set_book_metadata_bulk_runs_calibredb_once_per_book_in_one_process():
+    items = [(1, SetMetadataRequest(title="A")), (2, SetMetadataRequest(tags=["x", "y"]))]
+    with mock.patch('calibre_api.app.crud.run_calibre_command') as mock_run:
+        mock_run.return_value = (b"startup noise\n" + json.dumps([
+            {"stdout": '{"title": "A"}', "stderr": "", "returncode": 0},
+            {"stdout": "", "stderr": "", "returncode": 0},
+        ]).encode() + b"\n", b"", 0)
+        results = crud.set_book_metadata_bulk(items)
+
+    assert results == [{"title": "A"}, {}]
+    command = mock_run.call_args[0][0]
+    assert command[:2] == ["calibre-debug", "-c"]
+
+    # Run the generated script against a stand-in for calibredb's entry point.
+    seen, opened = [], []
+
+    class FakeDBCtx:
+        def __init__(self, library_path):
+            self.library_path = library_path
+
+        @property
+        def db(self):
+            opened.append(mock.Mock())
+            return opened[-1]
+
+    original_db = FakeDBCtx.db
+
+    def fake_main(argv):
+        seen.append(argv)
+        FakeDBCtx("/lib").db.set_field()
+        print('{"ok": 1}')
+        return 0
+    fake_module = types.ModuleType('calibre.db.cli.main')
+    fake_module.main = fake_main
+    fake_module.DBCtx = FakeDBCtx
+    output = io.StringIO()
+    with mock.patch.dict(sys.modules, {'calibre': types.ModuleType('calibre'),
+                                       'calibre.db': types.ModuleType('calibre.db'),
+                                       'calibre.db.cli': types.ModuleType('calibre.db.cli'),
+                                       'calibre.db.cli.main': fake_module}), \
+            mock.patch('sys.stdout', output):
+        exec(command[2], {}, {}) # Separate locals, as when calibre-debug runs it
+
+    assert seen == [
+        ["calibredb", "set_metadata", "--for-machine", "1", "--field", "title:A"],
+        ["calibredb", "set_metadata", "--for-machine", "2", "--field", "tags:x,y"],
+    ]
+    replies = json.loads(output.getvalue().strip())
+    assert [r["stdout"] for r in replies] == ['{"ok": 1}\n', '{"ok": 1}\n']
+    # One library open shared by both commands, closed at the end; DBCtx is restored.
+    assert len(opened) == 1 and opened[0].set_field.call_count == 2
+    opened[0].close.assert_called_once()
+    assert FakeDBCtx.db.fget is original_db.fget and not hasattr(FakeDBCtx, "batch_dbs")
+
+
+def test_set_book_metadata_bulk_raises_on_failed_book():
+    items = [(1, SetMetadataRequest(title="A"))]
+    reply = json.dumps([{"stdout": "", "stderr": "No book with id 1", "returncode": 1}]).encode()
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(reply, b"", 0)):
+        with pytest.raises(CalibredbError) as excinfo:
+            crud.set_book_metadata_bulk(items)
+
+    assert excinfo.value.stderr == "No book with id 1"
+
+
+def test_list_books_invalid_json_raises_with_decoded_output():
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b'[{"id": 1,', b"", 0)):
+        with pytest.raises(CalibredbError) as excinfo:
+            crud.list_books()
+
+    assert excinfo.value.stdout == '[{"id": 1,'
+
+
+def test_list_books_pushes_fields_and_limit_down_to_calibredb():
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"[]", b"", 0)) as mock_run:
+        assert crud.list_books(fields=["title", "authors"], limit=5) == []
+
+    mock_run.assert_called_once_with(
+        ["calibredb", "list", "--for-machine", "--fields", "title,authors", "--limit", "5"],
+        timeout=60, binary=True
+    )
+
+
+def test_list_books_turns_comma_separated_list_fields_into_lists():
+    stdout = b'[{"id": 1, "authors": "Doe, Jane ,Roe", "tags": "", "formats": "EPUB,PDF", "languages": ["eng"]}]'
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(stdout, b"", 0)):
+        books = crud.list_books()
+    assert books == [{"id": 1, "authors": ["Doe", "Jane", "Roe"], "tags": [], "formats": ["EPUB", "PDF"],
+                      "languages": ["eng"]}]
+
+
+def test_list_books_rejects_unknown_fields():
+    with mock.patch('calibre_api.app.crud.run_calibre_command') as mock_run:
+        with pytest.raises(ValueError, match="Unknown book field.*: titel"):
+            crud.list_books(fields=["titel", "authors"])
+    mock_run.assert_not_called()
+    assert crud._build_list_books_command(None, None, ["*genre", "size"])[-1] == "*genre,size"
+
+
+def test_iter_books_without_ijson_parses_whole_output():
+    with mock.patch.object(crud, 'ijson', None), \
+            mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b'[{"id": 1}, {"id": 2}]', b"", 0)):
+        assert list(crud.iter_books()) == [{"id": 1}, {"id": 2}]
+
+
+def test_iter_books_streams_chunks_through_ijson():
+    pytest.importorskip("ijson")
+    chunks = [b'[{"id": 1, "title": "A"}, {"id"', b': 2, "series_index": 1.5}]']
+    with mock.patch('calibre_api.app.crud.iter_calibre_command_chunks', return_value=iter(chunks)):
+        books = list(crud.iter_books())
+    assert books == [{"id": 1, "title": "A"}, {"id": 2, "series_index": 1.5}]
+    assert type(books[1]["series_index"]) is float
+
+
+def test_list_books_is_cached():
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b'[{"id": 1}]', b"", 0)) as mock_run:
+        first = crud.list_books(library_path="/lib")
+        first[0]["title"] = "mutated by caller"
+        assert crud.list_books(library_path="/lib") == [{"id": 1}]
+        assert mock_run.call_count == 1
+
+        crud.list_books(library_path="/lib", search_query="tag:x") # Different key
+        assert mock_run.call_count == 2
+
+
+def test_list_books_cache_follows_metadata_db_mtime(tmp_path):
+    metadata_db = tmp_path / "metadata.db"
+    metadata_db.write_bytes(b"")
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b'[{"id": 1}]', b"", 0)) as mock_run:
+        crud.list_books(library_path=str(tmp_path), search_query="tag:x")
+        crud.list_books(library_path=str(tmp_path), search_query="tag:x")
+        assert mock_run.call_count == 1
+
+        os.utime(metadata_db, ns=(0, metadata_db.stat().st_mtime_ns + 1)) # Written by someone else
+        crud.list_books(library_path=str(tmp_path), search_query="tag:x")
+        assert mock_run.call_count == 2
+
+
+def _cache_listings(listings):
+    for (library_path, search_query, fields, limit), books in listings.items():
+        crud._book_list_cache.put(
+            crud._book_list_cache_key(library_path, search_query, fields, limit),
+            (crud._library_stamp(library_path), books),
+        )
+
+
+def _cached_listing(library_path, search_query=None, fields=None, limit=None):
+    return crud._get_cached_books(
+        crud._book_list_cache_key(library_path, search_query, fields, limit), crud._library_stamp(library_path)
+    )
+
+
+def test_remove_book_evicts_book_from_cached_listings():
+    _cache_listings({
+        ("/lib", None, None, None): [{"id": 2}, {"id": 1}],
+        ("/lib", "tag:x", None, None): [{"id": 1}],
+        ("/lib", None, None, 1): [{"id": 2}], # Removed book not in it: unchanged
+        ("/lib", None, None, 2): [{"id": 2}, {"id": 1}], # Would be short a book
+        ("/other", None, None, None): [{"id": 1}],
+    })
+    reply = b'{"ok": true, "num_removed": 1, "removed_ids": [1]}'
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(reply, b"", 0)):
+        crud.remove_book(1, library_path="/lib")
+
+    assert _cached_listing("/lib") == [{"id": 2}]
+    assert _cached_listing("/lib", "tag:x") == []
+    assert _cached_listing("/lib", limit=1) == [{"id": 2}]
+    assert _cached_listing("/lib", limit=2) is None
+    assert _cached_listing("/other") == [{"id": 1}]
+
+
+def test_set_book_metadata_patches_cached_listings():
+    _cache_listings({
+        ("/lib", None, None, None): [{"id": 2, "title": "Old", "tags": []}, {"id": 1, "title": "Other"}],
+        ("/lib", None, ("title",), None): [{"id": 2, "title": "Old"}],
+        ("/lib", None, ("title", "author_sort"), None): [{"id": 2, "title": "Old", "author_sort": "X"}],
+        ("/lib", "title:Old", None, None): [{"id": 2, "title": "Old"}],
+        ("/lib", None, ("all",), None): [{"id": 2, "title": "Old"}],
+    })
+    metadata = SetMetadataRequest(title="New", authors=["A"], tags=["t"], rating=None)
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"{}", b"", 0)):
+        crud.set_book_metadata(2, metadata, library_path="/lib")
+
+    assert _cached_listing("/lib") == [
+        {"id": 2, "title": "New", "authors": ["A"], "tags": ["t"]}, {"id": 1, "title": "Other"},
+    ]
+    assert _cached_listing("/lib", fields=["title"]) == [{"id": 2, "title": "New"}]
+    assert _cached_listing("/lib", fields=["title", "author_sort"]) is None # author_sort follows authors
+    assert _cached_listing("/lib", "title:Old") is None # May no longer match
+    assert _cached_listing("/lib", fields=["all"]) is None
+
+
+def test_remove_books_evicts_only_what_calibredb_removed():
+    _cache_listings({("/lib", None, None, None): [{"id": 2}, {"id": 1}]})
+    reply = b'{"ok": false, "num_removed": 1, "removed_ids": [2], "errors": [{"id": 9, "error": "Book not found"}]}'
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(reply, b"", 0)):
+        crud.remove_books_bulk([2, 9], library_path="/lib")
+    assert _cached_listing("/lib") == [{"id": 1}]
+
+
+@pytest.mark.parametrize("write, reply", [
+    (lambda lib: crud.set_book_metadata(2, SetMetadataRequest(title="New"), library_path=lib), b"{}"),
+    (lambda lib: crud.remove_book(1, library_path=lib), b'{"ok": true, "num_removed": 1, "removed_ids": [1]}'),
+])
+def test_write_drops_cached_listings_that_were_already_stale(tmp_path, write, reply):
+    metadata_db = tmp_path / "metadata.db"
+    metadata_db.write_bytes(b"")
+    library_path = str(tmp_path)
+    _cache_listings({(library_path, None, None, None): [{"id": 2, "title": "Old"}, {"id": 1}]})
+    os.utime(metadata_db, ns=(0, metadata_db.stat().st_mtime_ns + 1)) # Written by someone else
+
+    def calibredb_writes(*args, **kwargs):
+        os.utime(metadata_db, ns=(0, metadata_db.stat().st_mtime_ns + 1))
+        return reply, b"", 0
+
+    with mock.patch('calibre_api.app.crud.run_calibre_command', side_effect=calibredb_writes):
+        write(library_path)
+    assert crud._book_list_cache.get(crud._book_list_cache_key(library_path, None, None, None)) is None
+
+
+@pytest.mark.parametrize("write", [
+    lambda: crud.set_book_metadata(2, SetMetadataRequest(title="New"), library_path="/lib"),
+    lambda: crud.remove_book(2, library_path="/lib"),
+])
+def test_failed_write_clears_cached_listings(write):
+    _cache_listings({("/lib", None, None, None): [{"id": 2, "title": "Old"}]})
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=("", "locked", 1)):
+        with pytest.raises(CalibredbError):
+            write()
+    assert _cached_listing("/lib") is None
+
+
+def test_add_book_clears_cached_listings(tmp_path):
+    book = tmp_path / "book.epub"
+    book.write_bytes(b"epub")
+    _cache_listings({("/lib", "title:Dune", None, None): [], ("/lib", None, None, None): [{"id": 1}]})
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"Added book ids: 2", b"", 0)):
+        crud.add_book(str(book), library_path="/lib")
+    assert _cached_listing("/lib", "title:Dune") is None
+    assert _cached_listing("/lib") is None
+
+
+def test_book_list_cache_entries_expire():
+    expired_at_once = calibre_cli._LRUCache(8, ttl=0.0)
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b'[]', b"", 0)) as mock_run, \
+            mock.patch.object(crud, '_book_list_cache', expired_at_once):
+        crud.list_books()
+        crud.list_books()
+    assert mock_run.call_count == 2
+
+
+def test_calibredb_runs_out_of_process():
+    reply = (b'{"ok": true, "num_removed": 1, "removed_ids": [4]}', b"", 0)
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=reply) as mock_run, \
+            mock.patch('calibre_api.app.crud.run_calibre_command_async', new_callable=mock.AsyncMock,
+                       return_value=reply) as mock_run_async:
+        result = crud.remove_book(4, library_path="/lib")
+        async_result = asyncio.run(crud.remove_book_async(4, library_path="/lib"))
+
+    cmd = ["calibredb", "remove_books", "--permanent", "--for-machine", "4", "--with-library", "/lib"]
+    mock_run.assert_called_once_with(cmd, timeout=60, binary=True)
+    mock_run_async.assert_awaited_once_with(cmd, timeout=60, binary=True)
+    assert result == async_result == {"ok": True, "num_removed": 1, "removed_ids": [4]}
+
+
+def test_list_books_all_fields_on_request():
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"[]", b"", 0)) as mock_run:
+        crud.list_books(fields=["all"])
+    assert mock_run.call_args[0][0] == ["calibredb", "list", "--for-machine", "--fields", "all"]
+
+
+@pytest.mark.parametrize("stdout, expected", [
+    (b"Added book ids: 4, 5,6", [4, 5, 6]),
+    (b"Some log line\nAdded book ID: 7", [7]),
+    (b"12", [12]),
+    (b"No books added", []),
+])
+def test_add_book_parses_added_ids(tmp_path, stdout, expected):
+    book = tmp_path / "book.epub"
+    book.write_bytes(b"epub")
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(stdout, b"", 0)):
+        assert crud.add_book(str(book)) == expected
+
+
+def test_add_book_passes_metadata_as_separate_options(tmp_path):
+    book = tmp_path / "book.epub"
+    book.write_bytes(b"epub")
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"Added book IDs: 1", b"", 0)) as mock_run:
+        crud.add_book(str(book), title="T", authors="Doe, Jane & Roe, R.", tags="sci-fi,space")
+    assert mock_run.call_args[0][0] == [
+        "calibredb", "add",
+        "--title", "T", "--authors", "Doe, Jane & Roe, R.", "--tags", "sci-fi,space",
+        "--", str(book),
+    ]
+    assert mock_run.call_args[1]["timeout"] == 120
+
+
+def test_add_book_scales_timeout_with_file_size(tmp_path):
+    book = tmp_path / "scan.pdf"
+    with open(book, "wb") as f:
+        f.truncate(100 * 1024 * 1024) # Sparse: 100 MiB without writing it
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"Added book IDs: 1", b"", 0)) as mock_run:
+        crud.add_book(str(book))
+    assert mock_run.call_args[1]["timeout"] == 120 + 50
+
+
+def test_add_book_missing_file(tmp_path):
+    with mock.patch('calibre_api.app.crud.run_calibre_command') as mock_run:
+        with pytest.raises(ValueError, match="Book file not found"):
+            crud.add_book(str(tmp_path / "missing.epub"))
+    mock_run.assert_not_called()
+
+
+def test_export_book_file_runs_resolved_calibredb():
+    completed = subprocess.CompletedProcess([], 0, stdout=b"EPUB", stderr=b"")
+    with mock.patch('calibre_api.app.crud._resolve_executable', return_value="/opt/calibre/calibredb") as resolve, \
+            mock.patch('calibre_api.app.crud.subprocess.run', return_value=completed) as mock_run:
+        assert crud.export_book_file(5, "EPUB", library_path="/lib") == b"EPUB"
+    resolve.assert_called_once_with("calibredb")
+    assert mock_run.call_args[0][0] == [
+        "/opt/calibre/calibredb", "export", "--to-stdout", "--format", "epub", "5", "--with-library", "/lib",
+    ]
+
+
+def test_export_book_file_calibredb_missing():
+    with mock.patch('calibre_api.app.crud._resolve_executable', side_effect=FileNotFoundError("missing")):
+        with pytest.raises(FileNotFoundError, match="calibredb command not found"):
+            crud.export_book_file(5, "epub")
+
+
+def test_export_book_file_async_runs_calibredb_binary():
+    run = mock.AsyncMock(return_value=(b"\xff\xfePDF", b"", 0))
+    with mock.patch('calibre_api.app.crud.run_calibre_command_async', run):
+        assert asyncio.run(crud.export_book_file_async(5, "PDF", library_path="/lib")) == b"\xff\xfePDF"
+    run.assert_awaited_once_with(
+        ["calibredb", "export", "--to-stdout", "--format", "pdf", "5", "--with-library", "/lib"],
+        timeout=120, binary=True,
+    )
+
+
+def test_export_book_file_async_missing_format():
+    stderr = b"Book has no EPUB format"
+    with mock.patch('calibre_api.app.crud.run_calibre_command_async', mock.AsyncMock(return_value=(b"", stderr, 1))):
+        with pytest.raises(CalibredbError, match="does not have a EPUB format"):
+            asyncio.run(crud.export_book_file_async(5, "epub"))
+
+
+def test_set_book_metadata_formats_fields():
+    metadata = SetMetadataRequest(authors=["Doe, Jane", "B"], rating=4, series_index=2, publisher="P")
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b'{"rating": 4}', b"", 0)) as mock_run:
+        assert crud.set_book_metadata(3, metadata) == {"rating": 4}
+    assert mock_run.call_args[0][0] == [
+        "calibredb", "set_metadata", "--for-machine", "3",
+        "--field", "authors:Doe, Jane & B", "--field", "publisher:P",
+        "--field", "series_index:2.0", "--field", "rating:4.0",
+    ]
+
+
+@pytest.mark.parametrize("metadata, message", [
+    (SetMetadataRequest(), "No metadata fields provided"),
+    (SetMetadataRequest(title=None), "No valid metadata arguments"),
+])
+def test_set_book_metadata_requires_a_value(metadata, message):
+    with pytest.raises(ValueError, match=message):
+        crud.set_book_metadata(3, metadata)
+
+
+def test_remove_book_invalid_json_raises():
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"not json", b"", 0)):
+        with pytest.raises(CalibredbError, match="Failed to parse JSON output from calibredb remove_books.*Output: not json"):
+            crud.remove_book(1)
+
+
+@pytest.fixture
+def sqlite_library(tmp_path):
+    # The parts of Calibre's metadata.db schema that the direct listing reads.
+    conn = sqlite3.connect(tmp_path / "metadata.db")
+    conn.executescript("""
+        CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, author_sort TEXT, series_index REAL,
+                            uuid TEXT, pubdate TIMESTAMP, timestamp TIMESTAMP, last_modified TIMESTAMP);
+        CREATE TABLE authors (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE books_authors_link (id INTEGER PRIMARY KEY, book INTEGER, author INTEGER);
+        CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE books_tags_link (id INTEGER PRIMARY KEY, book INTEGER, tag INTEGER);
+        CREATE TABLE series (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE books_series_link (id INTEGER PRIMARY KEY, book INTEGER, series INTEGER);
+        CREATE TABLE ratings (id INTEGER PRIMARY KEY, rating INTEGER);
+        CREATE TABLE books_ratings_link (id INTEGER PRIMARY KEY, book INTEGER, rating INTEGER);
+        CREATE TABLE identifiers (id INTEGER PRIMARY KEY, book INTEGER, type TEXT, val TEXT);
+        INSERT INTO books VALUES (1, 'Dune', 'Herbert, Frank', 1.0, 'u1', '1965-08-01 00:00:00+00:00', NULL, NULL);
+        INSERT INTO books VALUES (2, 'Good Omens', 'Pratchett, Terry', 2.0, 'u2', '1990-05-01 00:00:00+00:00', NULL, NULL);
+        INSERT INTO authors VALUES (1, 'Frank Herbert'), (2, 'Terry Pratchett'), (3, 'Neil Gaiman');
+        INSERT INTO books_authors_link VALUES (1, 1, 1), (2, 2, 3), (3, 2, 2);
+        INSERT INTO tags VALUES (1, 'SF');
+        INSERT INTO books_tags_link VALUES (1, 1, 1);
+        INSERT INTO series VALUES (1, 'Dune');
+        INSERT INTO books_series_link VALUES (1, 1, 1);
+        INSERT INTO ratings VALUES (1, 10);
+        INSERT INTO books_ratings_link VALUES (1, 1, 1);
+        INSERT INTO identifiers VALUES (1, 1, 'isbn', '9780441013593');
+    """)
+    conn.commit()
+    conn.close()
+    return str(tmp_path)
+
+
+def test_list_books_reads_metadata_db_directly(sqlite_library):
+    with mock.patch('calibre_api.app.crud.run_calibre_command') as mock_run:
+        books = crud.list_books(library_path=sqlite_library)
+        limited = crud.list_books(library_path=sqlite_library, fields=["title", "isbn"], limit=1)
+
+    mock_run.assert_not_called()
+    assert books == [
+        {"id": 2, "title": "Good Omens", "authors": ["Neil Gaiman", "Terry Pratchett"], "tags": [],
+         "series_index": 2.0, "pubdate": "1990-05-01T00:00:00+00:00"},
+        {"id": 1, "title": "Dune", "authors": ["Frank Herbert"], "tags": ["SF"], "series": "Dune",
+         "series_index": 1.0, "pubdate": "1965-08-01T00:00:00+00:00", "rating": 10},
+    ]
+    assert limited == [{"id": 2, "title": "Good Omens", "isbn": ""}]
+
+
+@pytest.mark.parametrize("limit", [None, 2])
+def test_list_books_from_metadata_db_reads_one_snapshot(sqlite_library, limit):
+    db_path = os.path.join(sqlite_library, "metadata.db")
+    with sqlite3.connect(db_path) as setup:
+        setup.execute("PRAGMA journal_mode=WAL") # Lets calibredb write while the listing reads
+    real_get_ro_conn = crud._get_ro_conn
+
+    class CalibredbAddsABookBetweenQueries:
+        def __init__(self, conn):
+            self.conn, self.added = conn, False
+
+        def execute(self, sql, *args):
+            if "books_authors_link" in sql and not self.added:
+                self.added = True
+                with sqlite3.connect(db_path) as writer:
+                    writer.execute("INSERT INTO books (id, title) VALUES (3, 'Emma')")
+                    writer.execute("INSERT INTO books_authors_link VALUES (4, 3, 1)")
+            return self.conn.execute(sql, *args)
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+    with mock.patch.object(crud, '_get_ro_conn', lambda path: CalibredbAddsABookBetweenQueries(real_get_ro_conn(path))), \
+            mock.patch('calibre_api.app.crud.run_calibre_command') as mock_run:
+        books = crud.list_books(library_path=sqlite_library, fields=["title", "authors"], limit=limit)
+
+    mock_run.assert_not_called()
+    assert books == [
+        {"id": 2, "title": "Good Omens", "authors": ["Neil Gaiman", "Terry Pratchett"]},
+        {"id": 1, "title": "Dune", "authors": ["Frank Herbert"]},
+    ]
+
+
+def test_list_books_answers_simple_searches_from_metadata_db(sqlite_library):
+    def titles(query):
+        return [b["title"] for b in crud.list_books(library_path=sqlite_library, search_query=query)]
+
+    with mock.patch('calibre_api.app.crud.run_calibre_command') as mock_run:
+        assert titles("tag:SF") == ["Dune"]
+        assert titles("authors:pratchett") == ["Good Omens"]
+        assert titles('title:"good OMENS"') == ["Good Omens"]
+        assert titles("author:=Neil") == []
+        assert titles('author:="neil gaiman" series:dune') == []
+        assert titles("title:düne") == ["Dune"]
+
+    mock_run.assert_not_called()
+
+
+def test_list_books_uses_calibredb_for_other_searches_and_unknown_fields(sqlite_library):
+    with mock.patch('calibre_api.app.crud.run_calibre_command', return_value=(b"[]", b"", 0)) as mock_run:
+        crud.list_books(library_path=sqlite_library, search_query="dune")
+        crud.list_books(library_path=sqlite_library, search_query="tag:SF or tag:Fantasy")
+        crud.list_books(library_path=sqlite_library, search_query="title:~^D")
+        crud.list_books(library_path=sqlite_library, search_query="rating:>3")
+        crud.list_books(library_path=sqlite_library, fields=["formats"])
+        crud.list_books() # Default library: its path is only known to Calibre
+    assert mock_run.call_count == 6
+
+
+def test_list_books_multi_filters_one_listing():
+    listing = [
+        {"id": 2, "title": "Good Omens", "authors": ["Neil Gaiman", "Terry Pratchett"], "series": None},
+        {"id": 1, "title": "Dune", "authors": ["Frank Herbert"], "series": "Dune"},
+    ]
+    with mock.patch('calibre_api.app.crud.run_calibre_command',
+                    return_value=(json.dumps(listing).encode(), b"", 0)) as mock_run:
+        results = crud.list_books_multi(
+            ["author:pratchett", "series:=DUNE", "", "author:pratchett", "dune"], fields=["title", "authors"]
+        )
+
+    # One listing for the simple searches (with series added for the filter), one
+    # calibredb search for the free-text query.
+    commands = [c[0][0] for c in mock_run.call_args_list]
+    assert len(commands) == 2
+    assert commands[0][-4:] == ["--fields", "title,authors", "--search", "dune"]
+    assert commands[1][-2:] == ["--fields", "title,authors,series"]
+    assert list(results) == ["author:pratchett", "series:=DUNE", "", "dune"]
+    assert results["author:pratchett"] == [{"id": 2, "title": "Good Omens", "authors": ["Neil Gaiman", "Terry Pratchett"]}]
+    assert results["series:=DUNE"] == [{"id": 1, "title": "Dune", "authors": ["Frank Herbert"]}]
+    assert [b["id"] for b in results[""]] == [2, 1]
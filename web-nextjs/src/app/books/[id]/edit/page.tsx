@@ -62,7 +62,10 @@ export default function EditBookPage({ params }: { params: { id: string } }) {
       setLoading(true);
       try {
         // Fetch existing book data to prefill the form
-        const response = await fetch(`http://localhost:6336/books/?search=ids:${id}`);
+        // `fields` lists every field the form edits; the API's default set leaves some out.
+        const response = await fetch(
+          `http://localhost:6336/books/?search=ids:${id}&fields=title,authors,publisher,pubdate,tags,series,series_index,isbn,comments,rating`
+        );
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
         const data: Book[] = await response.json();
         if (data.length > 0) {
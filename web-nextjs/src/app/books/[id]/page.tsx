@@ -63,7 +63,10 @@ export default function BookDetailsPage({ params }: BookDetailsPageProps) {
         // Example: `search=id:123`. This needs to be tested if `calibredb list` supports `id:` prefix.
         // Calibre's search syntax is powerful, `ids:123` or `id:123` might work.
         // Let's try with `search=ids:${id}` as `ids` is a common Calibre search field.
-        const response = await fetch(`http://localhost:6336/books/?search=ids:${id}`);
+        // `fields` lists everything this page shows; the API's default set leaves most of it out.
+        const response = await fetch(
+          `http://localhost:6336/books/?search=ids:${id}&fields=title,authors,tags,formats,publisher,series,series_index,isbn,comments`
+        );
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -45,7 +45,8 @@ export default function LibraryPage() {
         // The API supports a `search` query parameter.
         // For now, we fetch all and filter/sort client-side.
         // Later, we can implement server-side search by passing `searchTerm` to this URL.
-        const apiUrl = `http://localhost:6336/books/`;
+        // Without `fields` the API returns a short default set; ask for what the cards show.
+        const apiUrl = `http://localhost:6336/books/?fields=title,authors,tags,formats,publisher,series,series_index`;
         const response = await fetch(apiUrl);
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
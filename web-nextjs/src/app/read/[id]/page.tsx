@@ -32,7 +32,7 @@ export default function ReadPage({ params }: ReadPageProps) {
       setLoading(true);
       try {
         // Fetch book metadata to get title and available formats
-        const response = await fetch(`http://localhost:6336/books/?search=ids:${id}`);
+        const response = await fetch(`http://localhost:6336/books/?search=ids:${id}&fields=title,formats`);
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
         const data: Book[] = await response.json();
 